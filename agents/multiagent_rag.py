@@ -126,6 +126,14 @@ def _process_visual_proof(chunks: list[dict], visual_proof_tool, writer) -> list
     return chunks
 
 
+def _active_corpus_fingerprint() -> str:
+    """Fingerprint коллекции, по которой отвечает workflow — для SemanticCache."""
+    from src.chroma_helpers import vector_store_fingerprint
+    from src.vector_store import load_vector_store
+
+    return vector_store_fingerprint(load_vector_store())
+
+
 # --- State ---
 class RAGState(TypedDict):
     """State for the Multi-Agent RAG workflow."""
@@ -205,7 +213,7 @@ class MultiAgentRAGWorkflow:
 
         # Initialize Semantic Cache
         try:
-            self.cache = SemanticCache()
+            self.cache = SemanticCache(corpus_fingerprint=_active_corpus_fingerprint)
         except Exception as e:
             logger.warning(f"Failed to initialize SemanticCache: {e}")
             self.cache = None
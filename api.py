@@ -3,8 +3,10 @@
 Exposes the v7 RAG graph as a service so external apps (WTA, etc.) can query it.
 
 Endpoints:
-    POST /query  — ask a question, get answer + passages
-    GET  /health — liveness check
+    POST /query        — ask a question, get answer + passages
+    POST /query/stream — same, as Server-Sent Events (per-node progress)
+    POST /query/batch  — many questions, deduped, bounded concurrency
+    GET  /health       — liveness check
 
 Run:
     uvicorn api:app --host 0.0.0.0 --port 8503
@@ -12,19 +14,25 @@ Run:
 
 from __future__ import annotations
 
+import asyncio
+import json
 import time
-from contextlib import asynccontextmanager
-from typing import Any
+from contextlib import aclosing, asynccontextmanager
+from typing import Any, AsyncIterator
 
 import structlog
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 load_dotenv()
 
 logger = structlog.get_logger()
 
+# Как часто /query проверяет, не ушёл ли клиент
+DISCONNECT_POLL_SEC = 0.5
+
 # Pipeline state — initialized once on startup
 _pipeline: dict[str, Any] = {}
 
@@ -34,13 +42,15 @@ async def lifespan(app: FastAPI):
     """Load ChromaDB and initialize v7 pipeline on startup."""
     logger.info("api.startup: loading vector store and v7 pipeline")
     try:
+        from src.v7.answer_cache import with_answer_cache
         from src.v7.bridge import init_v7_from_chroma
         from src.v7.graph import build_graph
         from src.vector_store import load_vector_store
 
         vector_store = load_vector_store()
         init_v7_from_chroma(vector_store)
-        _pipeline["app"] = build_graph().compile()
+        _pipeline["embeddings"] = vector_store.embeddings
+        _pipeline["app"] = with_answer_cache(build_graph().compile(), vector_store)
         logger.info("api.startup: v7 pipeline ready")
     except Exception as exc:
         logger.error("api.startup: pipeline init failed", error=str(exc))
@@ -57,6 +67,14 @@ async def lifespan(app: FastAPI):
         logger.warning("api.startup: gosts pipeline not available", error=str(exc))
         _pipeline["gosts_ready"] = False
 
+    # FlashRank: один Ranker на процесс, общий для v7 rerank и /query/gosts
+    try:
+        from src.reranker import get_ranker
+
+        get_ranker()
+    except Exception as exc:
+        logger.warning("api.startup: FlashRank not available", error=str(exc))
+
     yield
     _pipeline.clear()
     logger.info("api.shutdown: pipeline cleared")
@@ -87,35 +105,39 @@ class QueryResponse(BaseModel):
     elapsed_sec: float
 
 
-@app.post("/query", response_model=QueryResponse)
-def query(req: QueryRequest) -> QueryResponse:
-    """Ask a question about workplace safety regulations."""
+class BatchQueryRequest(BaseModel):
+    questions: list[str]
+    max_concurrency: int | None = None
+
+
+class BatchQueryItem(BaseModel):
+    question: str
+    answer: str = ""
+    passages: list[Passage] = []
+    path: str = ""
+    elapsed_sec: float = 0.0
+    error: str | None = None
+
+
+class BatchQueryResponse(BaseModel):
+    results: list[BatchQueryItem]
+    unique_questions: int
+    elapsed_sec: float
+
+
+def _require_pipeline(req: QueryRequest):
+    """Validate the request and return the compiled v7 graph."""
     if not req.question or not req.question.strip():
         raise HTTPException(status_code=400, detail="question must not be empty")
 
     pipeline_app = _pipeline.get("app")
     if pipeline_app is None:
         raise HTTPException(status_code=503, detail="pipeline not initialized")
+    return pipeline_app
 
-    t0 = time.perf_counter()
-    try:
-        result = pipeline_app.invoke({"query": req.question.strip()})
-    except Exception as exc:
-        logger.error("api.query: pipeline error", question=req.question, error=str(exc))
-        raise HTTPException(status_code=500, detail=f"pipeline error: {exc}") from exc
-    elapsed = round(time.perf_counter() - t0, 2)
 
-    # Extract answer
-    if result.get("clarify_message"):
-        answer = result["clarify_message"]
-    elif result.get("abstain_reason"):
-        answer = f"Не могу ответить: {result['abstain_reason']}"
-    else:
-        answer = result.get("answer") or ""
-
-    # Extract passages
-    raw_passages = result.get("final_passages") or []
-    passages = [
+def _to_passages(raw_passages: list[dict]) -> list[Passage]:
+    return [
         Passage(
             text=p.get("text", ""),
             source=p.get("metadata", {}).get("source", ""),
@@ -124,18 +146,236 @@ def query(req: QueryRequest) -> QueryResponse:
         for p in raw_passages
     ]
 
-    # Infer path from state flags
-    path = _infer_path(result)
+
+def _build_response(result: dict[str, Any], elapsed: float) -> QueryResponse:
+    """Final graph state → QueryResponse."""
+    if result.get("clarify_message"):
+        answer = result["clarify_message"]
+    elif result.get("abstain_reason"):
+        answer = f"Не могу ответить: {result['abstain_reason']}"
+    else:
+        answer = result.get("answer") or ""
+
+    return QueryResponse(
+        answer=answer,
+        passages=_to_passages(result.get("final_passages") or []),
+        path=_infer_path(result),
+        elapsed_sec=elapsed,
+    )
+
+
+async def _stream_pipeline(
+    pipeline_app, question: str
+) -> AsyncIterator[tuple[str, Any]]:
+    """astream графа: ("updates", {node: update}) и ("values", full_state) по шагам.
+
+    Ноды синхронные — LangGraph гоняет их в executor, event loop свободен.
+    Закрытие генератора (aclose / cancel) останавливает граф на границе нод.
+    """
+    async with aclosing(
+        pipeline_app.astream({"query": question}, stream_mode=["updates", "values"])
+    ) as stream:
+        async for mode, chunk in stream:
+            yield mode, chunk
+
+
+async def _run_graph(pipeline_app, question: str) -> dict[str, Any]:
+    """Run the graph to completion and return the final state."""
+    result: dict[str, Any] = {}
+    async for mode, chunk in _stream_pipeline(pipeline_app, question):
+        if mode == "values":
+            result = chunk
+    return result
+
+
+async def _run_until_disconnect(request: Request, pipeline_app, question: str):
+    """Run the graph to completion; cancel it if the client goes away."""
+    task = asyncio.create_task(_run_graph(pipeline_app, question))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SEC)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                logger.info("api.query: client disconnected", question=question[:80])
+                raise HTTPException(status_code=499, detail="client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+@app.post("/query", response_model=QueryResponse)
+async def query(req: QueryRequest, request: Request) -> QueryResponse:
+    """Ask a question about workplace safety regulations."""
+    pipeline_app = _require_pipeline(req)
+
+    t0 = time.perf_counter()
+    try:
+        result = await _run_until_disconnect(
+            request, pipeline_app, req.question.strip()
+        )
+    except HTTPException:
+        raise
+    except Exception as exc:
+        logger.error("api.query: pipeline error", question=req.question, error=str(exc))
+        raise HTTPException(status_code=500, detail=f"pipeline error: {exc}") from exc
+    response = _build_response(result, round(time.perf_counter() - t0, 2))
 
     logger.info(
         "api.query: done",
         question=req.question[:80],
-        path=path,
-        passages=len(passages),
+        path=response.path,
+        passages=len(response.passages),
+        elapsed_sec=response.elapsed_sec,
+    )
+    return response
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _query_events(
+    request: Request, pipeline_app, question: str
+) -> AsyncIterator[str]:
+    """SSE-поток: status на каждую ноду, passages при появлении, answer в конце."""
+    t0 = time.perf_counter()
+    result: dict[str, Any] = {}
+    try:
+        async for mode, chunk in _stream_pipeline(pipeline_app, question):
+            if await request.is_disconnected():
+                logger.info("api.stream: client disconnected", question=question[:80])
+                return
+            if mode == "values":
+                result = chunk
+                continue
+            for node, update in chunk.items():
+                update = update or {}
+                yield _sse(
+                    "status",
+                    {"node": node, "message": update.get("status_message", "")},
+                )
+                if update.get("final_passages"):
+                    passages = _to_passages(update["final_passages"])
+                    yield _sse("passages", [p.model_dump() for p in passages])
+    except asyncio.CancelledError:
+        logger.info("api.stream: cancelled", question=question[:80])
+        raise
+    except Exception as exc:
+        logger.error("api.stream: pipeline error", question=question, error=str(exc))
+        yield _sse("error", {"detail": f"pipeline error: {exc}"})
+        return
+
+    response = _build_response(result, round(time.perf_counter() - t0, 2))
+    logger.info(
+        "api.stream: done",
+        question=question[:80],
+        path=response.path,
+        passages=len(response.passages),
+        elapsed_sec=response.elapsed_sec,
+    )
+    yield _sse("answer", response.model_dump())
+
+
+@app.post("/query/stream")
+async def query_stream(req: QueryRequest, request: Request) -> StreamingResponse:
+    """Same as /query, streamed as Server-Sent Events.
+
+    Events: ``status`` ({node, message}) after every node, ``passages``
+    when retrieval produces final passages, then ``answer`` (QueryResponse)
+    or ``error``. Client disconnect stops the graph at the next node.
+    """
+    pipeline_app = _require_pipeline(req)
+    return StreamingResponse(
+        _query_events(request, pipeline_app, req.question.strip()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _warm_query_embeddings(questions: list[str]) -> None:
+    """Один embed-вызов на весь батч: intent_gate и vector search попадут в кэш."""
+    from src.embedding_cache import CachedEmbeddings
+
+    embeddings = _pipeline.get("embeddings")
+    if not isinstance(embeddings, CachedEmbeddings):
+        return
+    try:
+        embeddings.embed_queries(questions)
+    except Exception as exc:
+        logger.warning("api.batch: embedding warm-up failed", error=str(exc))
+
+
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def query_batch(req: BatchQueryRequest) -> BatchQueryResponse:
+    """Run many questions through the v7 graph concurrently.
+
+    Identical questions (after whitespace normalization) run once. Query
+    embeddings for the whole batch are computed in one call up front, so
+    per-question graphs hit the embedding cache. A failing question is
+    reported in its item's ``error`` and does not fail the batch.
+    """
+    from config.settings import settings
+    from src.embedding_cache import normalize_query
+
+    pipeline_app = _pipeline.get("app")
+    if pipeline_app is None:
+        raise HTTPException(status_code=503, detail="pipeline not initialized")
+    if len(req.questions) > settings.API_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"at most {settings.API_BATCH_MAX_QUESTIONS} questions per batch",
+        )
+
+    keys = [normalize_query(q) for q in req.questions]
+    unique = [k for k in dict.fromkeys(keys) if k]
+    limit = min(
+        req.max_concurrency or settings.API_BATCH_MAX_CONCURRENCY,
+        settings.API_BATCH_MAX_CONCURRENCY,
+    )
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    t0 = time.perf_counter()
+    await asyncio.to_thread(_warm_query_embeddings, unique)
+
+    async def _answer(question: str) -> BatchQueryItem:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await _run_graph(pipeline_app, question)
+            except Exception as exc:
+                logger.error(
+                    "api.batch: pipeline error", question=question, error=str(exc)
+                )
+                return BatchQueryItem(
+                    question=question,
+                    elapsed_sec=round(time.perf_counter() - started, 2),
+                    error=f"pipeline error: {exc}",
+                )
+            response = _build_response(result, round(time.perf_counter() - started, 2))
+            return BatchQueryItem(question=question, **response.model_dump())
+
+    answered = dict(zip(unique, await asyncio.gather(*(_answer(q) for q in unique))))
+
+    results = [
+        (
+            answered[key].model_copy(update={"question": question})
+            if key
+            else BatchQueryItem(question=question, error="question must not be empty")
+        )
+        for question, key in zip(req.questions, keys)
+    ]
+    elapsed = round(time.perf_counter() - t0, 2)
+    logger.info(
+        "api.batch: done",
+        questions=len(req.questions),
+        unique=len(unique),
+        concurrency=limit,
         elapsed_sec=elapsed,
     )
-    return QueryResponse(
-        answer=answer, passages=passages, path=path, elapsed_sec=elapsed
+    return BatchQueryResponse(
+        results=results, unique_questions=len(unique), elapsed_sec=elapsed
     )
 
 
@@ -159,14 +399,7 @@ def query_gosts(req: QueryRequest) -> QueryResponse:
         logger.error("api.gosts: pipeline error", question=req.question, error=str(exc))
         raise HTTPException(status_code=500, detail=f"pipeline error: {exc}") from exc
 
-    passages = [
-        Passage(
-            text=p.get("text", ""),
-            source=p.get("metadata", {}).get("source", ""),
-            score=float(p.get("score", 0.0)),
-        )
-        for p in result.get("passages", [])
-    ]
+    passages = _to_passages(result.get("passages", []))
     logger.info(
         "api.gosts: done",
         question=req.question[:80],
@@ -191,6 +424,8 @@ def health() -> dict[str, str]:
 
 def _infer_path(result: dict[str, Any]) -> str:
     """Derive human-readable pipeline path from state."""
+    if result.get("answer_cache_hit"):
+        return "answer_cache → END"
     if result.get("clarify_message"):
         return "intent_gate → END (chitchat/oos)"
     if result.get("abstain_reason"):
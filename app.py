@@ -27,6 +27,7 @@ except Exception as e:
 
 # V7 Graph
 try:
+    from src.v7.answer_cache import with_answer_cache
     from src.v7.bridge import init_v7_from_chroma
     from src.v7.graph import build_graph as build_v7_graph
 
@@ -172,7 +173,7 @@ def load_resources():
 
             vector_store = load_vector_store()
             init_v7_from_chroma(vector_store)
-            v7_app = build_v7_graph().compile()
+            v7_app = with_answer_cache(build_v7_graph().compile(), vector_store)
         except Exception as e:
             logger.warning(f"Failed to init V7 Graph: {e}")
 
@@ -18,10 +18,32 @@ class Settings(BaseSettings):
     # Параметры для эмбеддингов
     EMBEDDING_PROVIDER: str = "openai"  # варианты: openai, hf_api, nomic
     EMBEDDING_MODEL_NAME: str = "text-embedding-3-small"
+    EMBEDDING_CACHE_SIZE: int = 4096  # LRU кэш query-эмбеддингов (0 = выключен)
+    EMBEDDING_CACHE_PATH: str = (
+        ""  # SQLite-tier для query-эмбеддингов; "" = только память
+    )
+    # Content-addressed векторы чанков для переиндексации; "" = выключено
+    DOC_EMBEDDING_CACHE_PATH: str = ".embedding_cache/documents.sqlite"
+    EMBEDDING_MAX_INFLIGHT: int = 4  # параллельных embed-запросов при индексации
+    EMBEDDING_WRITE_QUEUE: int = 4  # готовых батчей в очереди на запись в Chroma
+    EMBEDDING_MAX_RETRIES: int = 6  # повторов на 429
+
+    # Семантический кэш ответов (src/semantic_cache.py)
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 10_000  # 0 = без лимита
+    SEMANTIC_CACHE_TTL_SEC: float = 7 * 24 * 3600  # 0 = ответы не устаревают
+    SEMANTIC_CACHE_EVICTION: str = "lru"  # lru | lfu
+    # Как часто сверять fingerprint активной коллекции Chroma
+    SEMANTIC_CACHE_FINGERPRINT_CHECK_SEC: float = 60.0
+    # HNSW-индекс (hnswlib) вместо полного перебора, начиная с этого размера кэша
+    SEMANTIC_CACHE_ANN: bool = True
+    SEMANTIC_CACHE_ANN_MIN_ENTRIES: int = 5_000
+    SEMANTIC_CACHE_HNSW_EF: int = 64  # ef поиска: выше — точнее и медленнее
 
     # Параметры для FlashRank
     RERANKING_MODEL: str = "ms-marco-MiniLM-L-12-v2"
     FLASHRANK_CACHE_DIR: str = ".flashrank_cache"
+    # LRU (query, чанк) → cross-encoder score между запросами; 0 = выключен
+    RERANK_SCORE_CACHE_SIZE: int = 50_000
 
     # Параметры для индексации и обработки документов
     MAX_FILE_SIZE: int = MAX_FILE_SIZE
@@ -37,12 +59,17 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = "INFO"
 
     REQUEST_TIMEOUT: float = 120.0
+    API_BATCH_MAX_CONCURRENCY: int = 8  # /query/batch: графов одновременно
+    API_BATCH_MAX_QUESTIONS: int = 5000  # /query/batch: лимит на запрос
 
     CACHE_DIR: str = "document_cache"
     CACHE_EXPIRE_DAYS: int = 7
+    DOCLING_WORKERS: int = 1  # процессов Docling при индексации (1 = в текущем)
 
     CHUNK_SIZE: int = 1500
     CHUNK_OVERLAP: int = 400
+    # grouped_text → child-чанки (~400) в индекс, parent — в ParentStore
+    PARENT_CHILD_CHUNKS: bool = False
 
     SOURCE_DOCS_PATH: str = "./source_docs"
 
@@ -1,16 +1,23 @@
 # index.py
+import argparse
 import os
 import shutil
 
 from dotenv import load_dotenv
 
 from config.settings import settings
-from src.file_handler import DocumentProcessor
-from src.vector_store import create_vector_store
+from src.file_handler import DocumentProcessor, pipeline_key
+from src.incremental_index import MANIFEST_FILE, IndexManifest, sync_index
+from src.v7.config import v7_config
+from src.vector_store import open_vector_store
 from utils.logging import logger
 
 load_dotenv()
 
+# Legacy BM25Retriever pickle (final_chain) — содержит тексты чанков и
+# устаревает при любом изменении коллекции.
+BM25_CACHE = ".bm25_cache.pkl"
+
 
 def _collect_paths(root_dir: str, allowed_exts: list[str]) -> list[str]:
     paths = []
@@ -19,12 +26,19 @@ def _collect_paths(root_dir: str, allowed_exts: list[str]) -> list[str]:
             ext = os.path.splitext(name)[1].lower()
             if ext in allowed_exts:
                 paths.append(os.path.join(dirpath, name))
-    return paths
+    return sorted(paths)
 
 
-def main():
-    logger.info("Запуск процесса индексации...")
+def _manifest_key() -> str:
+    """Манифест валиден только для той же нарезки, эмбеддингов и коллекции."""
+    return (
+        f"{pipeline_key()}|{settings.EMBEDDING_PROVIDER}:"
+        f"{settings.EMBEDDING_MODEL_NAME}|{settings.CHROMA_COLLECTION_NAME}"
+    )
+
 
+def _wipe_index() -> None:
+    """Destructive reset: Chroma (вместе с манифестом) и кэши, привязанные к ней."""
     if os.path.exists(settings.CHROMA_DB_PATH):
         logger.info(f"Удаление старой базы данных из: {settings.CHROMA_DB_PATH}...")
         shutil.rmtree(settings.CHROMA_DB_PATH, ignore_errors=True)
@@ -35,10 +49,31 @@ def main():
     if os.path.exists(settings.CACHE_DIR):
         logger.info(f"Очистка Docling-cache: {settings.CACHE_DIR}")
         shutil.rmtree(settings.CACHE_DIR, ignore_errors=True)
-    bm25_cache = ".bm25_cache.pkl"
-    if os.path.exists(bm25_cache):
-        logger.info(f"Удаление BM25-cache: {bm25_cache}")
-        os.remove(bm25_cache)
+    if os.path.exists(BM25_CACHE):
+        logger.info(f"Удаление BM25-cache: {BM25_CACHE}")
+        os.remove(BM25_CACHE)
+    snapshot_dir = v7_config.bm25_snapshot_dir()
+    if snapshot_dir and os.path.exists(snapshot_dir):
+        logger.info(f"Удаление BM25 snapshot: {snapshot_dir}")
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+
+def main(full: bool = False):
+    """Синхронизировать индекс с SOURCE_DOCS_PATH.
+
+    По умолчанию инкрементально: конвертируются и эмбеддятся только новые и
+    изменённые файлы, чанки удалённых файлов удаляются. Полная пересборка —
+    при ``full=True`` или если манифеста нет / он от другой конфигурации.
+    """
+    logger.info("Запуск процесса индексации...")
+
+    manifest_path = os.path.join(settings.CHROMA_DB_PATH, MANIFEST_FILE)
+    key = _manifest_key()
+    manifest = None if full else IndexManifest.load(manifest_path, key)
+    if manifest is None:
+        logger.info("Полная переиндексация (манифест отсутствует или устарел)")
+        _wipe_index()
+        manifest = IndexManifest(key=key)
 
     # Собираем все файлы допустимых типов
     file_paths = _collect_paths(settings.SOURCE_DOCS_PATH, settings.ALLOWED_TYPES)
@@ -48,17 +83,31 @@ def main():
         )
         return
 
-    # Обработка через новый DocumentProcessor
     processor = DocumentProcessor()
-    chunks = processor.process(file_paths)
+    vector_store = open_vector_store()
+    plan = sync_index(vector_store, processor, manifest, file_paths, manifest_path)
+
+    if not plan.has_changes:
+        logger.info("Изменений нет — индекс актуален.")
+        return
+
+    if os.path.exists(BM25_CACHE):
+        logger.info(f"Удаление BM25-cache: {BM25_CACHE}")
+        os.remove(BM25_CACHE)
+
+    # BM25 snapshot по новому fingerprint — API стартует без перелемматизации
+    from src.v7.bridge import init_bm25_from_chroma
 
-    if chunks:
-        logger.info(f"Всего будет проиндексировано {len(chunks)} чанков.")
-        create_vector_store(chunks)  # твоя функция сохраняет в Chroma
-        logger.info("Индексация успешно завершена.")
-    else:
-        logger.warning("Чанки не получены. Проверьте документы/конвертацию.")
+    init_bm25_from_chroma(vector_store)
+    logger.info(
+        f"Индексация завершена: +{len(plan.added)} ~{len(plan.changed)} "
+        f"-{len(plan.removed)} файлов, {vector_store._collection.count()} чанков."
+    )
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Индексация SOURCE_DOCS_PATH")
+    parser.add_argument(
+        "--full", action="store_true", help="снести индекс и пересобрать с нуля"
+    )
+    main(full=parser.parse_args().full)
@@ -144,7 +144,8 @@ def _chunk_text(
 def main() -> None:
     from langchain_chroma import Chroma
     from src.llm_factory import get_embedding_model
-    from src.vector_store import _batches_by_tokens, _sanitize_metadata
+    from src.parent_store import get_parent_store
+    from src.vector_store import add_chunks
     from utils.logging import logger
 
     logger.info("index_gosts: старт", docs_path=GOSTS_DOCS_PATH)
@@ -196,15 +197,9 @@ def main() -> None:
     logger.info("index_gosts: всего чанков", count=len(all_chunks), errors=errors)
 
     os.makedirs(GOSTS_CHROMA_PATH, exist_ok=True)
-    embeddings = get_embedding_model()
-    is_openai = embeddings.__class__.__name__ in {
-        "OpenAIEmbeddings",
-        "AzureOpenAIEmbeddings",
-    }
-
     vs = Chroma(
         collection_name=GOSTS_COLLECTION_NAME,
-        embedding_function=embeddings,
+        embedding_function=get_embedding_model(),
         persist_directory=GOSTS_CHROMA_PATH,
     )
 
@@ -213,15 +208,8 @@ def main() -> None:
     docs = [
         Document(page_content=c["text"], metadata=c["metadata"]) for c in all_chunks
     ]
-    total, done = len(docs), 0
-    for batch in _batches_by_tokens(
-        docs, max_tokens_per_batch=280_000, hard_batch_cap=128, is_openai=is_openai
-    ):
-        texts = [d.page_content for d in batch]
-        metas = [_sanitize_metadata(d.metadata or {}) for d in batch]
-        vs.add_texts(texts=texts, metadatas=metas)
-        done += len(batch)
-        logger.info("index_gosts: embedding прогресс", done=done, total=total)
+    total = len(docs)
+    add_chunks(vs, docs, parent_store=get_parent_store(GOSTS_CHROMA_PATH))
 
     logger.info(
         "index_gosts: готово",
@@ -26,7 +26,7 @@ logger = logging.getLogger(__name__)
 # --- CONFIG ---
 DEFAULT_QUERY = "для кого проводится повторный инструктаж?"
 LLM_PROVIDER = "gemini"
-CACHE_FILE = "semantic_cache.json"
+CACHE_FILE = "semantic_cache.bin"
 # ---
 
 
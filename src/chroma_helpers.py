@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
 from typing import List, Optional
 
@@ -26,6 +27,24 @@ def chroma_results_to_documents(result: Optional[dict]) -> List[Document]:
     return docs
 
 
+def collection_fingerprint(ids: List[str]) -> str:
+    """Fingerprint содержимого коллекции: число документов + хэш их ids.
+
+    Chroma выдаёт новые ids при каждом add_texts, поэтому любая
+    переиндексация меняет fingerprint.
+    """
+    h = hashlib.sha256(str(len(ids)).encode("utf-8"))
+    for doc_id in ids:
+        h.update(b"\0")
+        h.update(doc_id.encode("utf-8"))
+    return f"{len(ids)}:{h.hexdigest()[:16]}"
+
+
+def vector_store_fingerprint(vector_store) -> str:
+    """collection_fingerprint активной коллекции (только ids, без документов)."""
+    return collection_fingerprint(vector_store.get(include=[])["ids"])
+
+
 def query_chunks_by_range(vs, source: str, start: int, end: int) -> List[Document]:
     """Query Chroma for chunks in [start, end] range for a given source.
 
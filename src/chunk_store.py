@@ -0,0 +1,149 @@
+"""Columnar cache of Docling chunks: Arrow IPC file per source file, read via mmap.
+
+Файл пишется record batch'ами по CHUNK_BATCH_ROWS строк. iter_chunks отдаёт
+Document'ы лениво, по одному batch за раз: в Python-объекты превращается
+только текущий batch, остальное лежит в mmap-страницах. read_chunks — тот же
+проход, собранный в список.
+
+Заменяет pickle списка Document в document_cache/. Повторяющиеся строки
+(parent_text, source, parent_section, type) лежат dictionary-encoded — каждое
+значение хранится один раз, даже если его несут десятки child-чанков.
+bbox и page_no — числовые колонки, а не JSON-строки в pickle.
+
+Round-trip точный: значение известного ключа, которое не ложится в свою
+колонку без потерь (другой тип, bbox не из 4 чисел), уходит в JSON-колонку
+``extra`` вместе с неизвестными ключами метаданных.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import pyarrow as pa
+from langchain_core.documents import Document
+
+CHUNK_STORE_VERSION = "chunks-arrow-v1"
+# Строк в record batch: единица ленивого чтения
+CHUNK_BATCH_ROWS = 1024
+
+_STR_KEYS = ("source", "type", "parent_section", "parent_text")
+_INT_KEYS = ("chunk_id", "page_no", "child_idx")
+_BBOX_KEY = "bbox"
+# Порядок задаёт биты колонки keys: ключ присутствовал в metadata (пусть и None)
+_KNOWN_KEYS = _STR_KEYS + _INT_KEYS + (_BBOX_KEY,)
+_BBOX_COLUMNS = ("bbox_l", "bbox_t", "bbox_r", "bbox_b")
+
+
+def _fits(key: str, value: Any) -> bool:
+    if value is None:
+        return True
+    if key in _STR_KEYS:
+        return isinstance(value, str)
+    if key in _INT_KEYS:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return _parse_bbox(value) is not None
+
+
+def _parse_bbox(value: Any) -> Optional[List[float]]:
+    """bbox-строка → 4 float, только если json.dumps восстановит её побайтно."""
+    if not isinstance(value, str):
+        return None
+    try:
+        coords = json.loads(value)
+    except ValueError:
+        return None
+    if (
+        not isinstance(coords, list)
+        or len(coords) != 4
+        or not all(isinstance(c, float) for c in coords)
+        or json.dumps(coords) != value
+    ):
+        return None
+    return coords
+
+
+def write_chunks(path: Union[str, Path], chunks: List[Document]) -> None:
+    """Атомарно записать чанки в Arrow IPC файл ``path``."""
+    columns: Dict[str, list] = {
+        name: [] for name in ("text", *_STR_KEYS, *_INT_KEYS, *_BBOX_COLUMNS)
+    }
+    keys_mask: List[int] = []
+    extra: List[Optional[str]] = []
+
+    for doc in chunks:
+        meta = doc.metadata or {}
+        columns["text"].append(doc.page_content)
+        mask = 0
+        rest = {k: v for k, v in meta.items() if k not in _KNOWN_KEYS}
+        for bit, key in enumerate(_KNOWN_KEYS):
+            present = key in meta and _fits(key, meta[key])
+            if key in meta and not present:
+                rest[key] = meta[key]
+            if present:
+                mask |= 1 << bit
+            value = meta.get(key) if present else None
+            if key == _BBOX_KEY:
+                coords = _parse_bbox(value) if value is not None else None
+                for name, c in zip(_BBOX_COLUMNS, coords or (None,) * 4):
+                    columns[name].append(c)
+            else:
+                columns[key].append(value)
+        keys_mask.append(mask)
+        extra.append(json.dumps(rest, ensure_ascii=False) if rest else None)
+
+    arrays = {"text": pa.array(columns["text"], type=pa.string())}
+    for key in _STR_KEYS:
+        arrays[key] = pa.array(columns[key], type=pa.string()).dictionary_encode()
+    for key in _INT_KEYS:
+        arrays[key] = pa.array(columns[key], type=pa.int64())
+    for name in _BBOX_COLUMNS:
+        arrays[name] = pa.array(columns[name], type=pa.float64())
+    arrays["keys"] = pa.array(keys_mask, type=pa.uint16())
+    arrays["extra"] = pa.array(extra, type=pa.string())
+
+    table = pa.table(arrays).replace_schema_metadata({"version": CHUNK_STORE_VERSION})
+    tmp = f"{path}.tmp"
+    with pa.OSFile(tmp, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=CHUNK_BATCH_ROWS)
+    os.replace(tmp, path)
+
+
+def _batch_documents(batch: pa.RecordBatch) -> Iterator[Document]:
+    cols = {name: batch.column(name).to_pylist() for name in batch.schema.names}
+    for i, text in enumerate(cols["text"]):
+        mask = cols["keys"][i]
+        meta: Dict[str, Any] = {}
+        for bit, key in enumerate(_KNOWN_KEYS):
+            if not mask & (1 << bit):
+                continue
+            if key == _BBOX_KEY:
+                coords = [cols[name][i] for name in _BBOX_COLUMNS]
+                meta[key] = None if coords[0] is None else json.dumps(coords)
+            else:
+                meta[key] = cols[key][i]
+        if cols["extra"][i]:
+            meta.update(json.loads(cols["extra"][i]))
+        yield Document(page_content=text, metadata=meta)
+
+
+def iter_chunks(path: Union[str, Path]) -> Iterator[Document]:
+    """Лениво отдать чанки из ``path`` (mmap, по record batch'ам).
+
+    ValueError на чужую версию формата — при первом next().
+    """
+    with pa.memory_map(str(path), "r") as source:
+        reader = pa.ipc.open_file(source)
+        version = (reader.schema.metadata or {}).get(b"version", b"").decode()
+        if version != CHUNK_STORE_VERSION:
+            raise ValueError(f"Unsupported chunk store version: {version!r}")
+        for i in range(reader.num_record_batches):
+            yield from _batch_documents(reader.get_batch(i))
+
+
+def read_chunks(path: Union[str, Path]) -> List[Document]:
+    """Все чанки из ``path`` списком (ValueError на чужую версию формата)."""
+    return list(iter_chunks(path))
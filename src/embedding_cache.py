@@ -0,0 +1,243 @@
+"""Process-wide cache of query embeddings.
+
+Один и тот же запрос эмбеддится несколько раз за request: domain gate в
+intent_gate, затем similarity_search в rag_simple / rag_complex.
+CachedEmbeddings оборачивает embeddings-модель провайдера и отдаёт
+повторные запросы из LRU (provider, model, normalized text) → vector,
+с опциональным дисковым tier (SQLite) между перезапусками.
+
+embed_documents (индексация) идёт мимо этого кэша. Для неё есть
+DocumentEmbeddingStore — content-addressed SQLite (provider, model, text) →
+vector: при переиндексации провайдеру уходят только новые тексты чанков.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.logging import logger
+
+
+def normalize_query(text: str) -> str:
+    """Ключ кэша: схлопнуть пробелы. Регистр не трогаем — он влияет на вектор."""
+    return " ".join(text.split())
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings-обёртка с LRU кэшем query-векторов (+ optional SQLite tier)."""
+
+    def __init__(
+        self,
+        inner,
+        provider: str,
+        model: str,
+        maxsize: int = 4096,
+        disk_path: Optional[str] = None,
+    ) -> None:
+        self.inner = inner
+        self.provider = provider
+        self.model = model
+        self.maxsize = maxsize
+        self._memory: OrderedDict[str, List[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if disk_path:
+            try:
+                self._db = sqlite3.connect(disk_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings "
+                    "(key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding disk cache disabled ({disk_path}): {e}")
+                self._db = None
+
+    # ---------- Embeddings API ----------
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Вектора для нескольких запросов; промахи уходят одним embed_documents."""
+        keys = [self._key(t) for t in texts]
+        vectors: List[Optional[List[float]]] = [self._lookup(k) for k in keys]
+
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            if len(missing) == 1:
+                fresh = [self.inner.embed_query(texts[missing[0]])]
+            else:
+                fresh = self.inner.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                vector = [float(x) for x in vector]
+                self._store(keys[i], vector)
+                vectors[i] = vector
+        return [list(v) for v in vectors]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    # ---------- cache ----------
+
+    def cache_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._memory),
+            "maxsize": self.maxsize,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _key(self, text: str) -> str:
+        raw = f"{self.provider}\0{self.model}\0{normalize_query(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vector
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+                    self._remember(key, vector)
+                    self.hits += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def _store(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?)",
+                        (key, np.asarray(vector, dtype=np.float32).tobytes()),
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Embedding disk cache write failed: {e}")
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        if self.maxsize <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+
+def embed_queries(embeddings, texts: List[str]) -> List[List[float]]:
+    """Вектора запросов через кэш, если embeddings — CachedEmbeddings."""
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.embed_queries(texts)
+    return embeddings.embed_documents(texts)
+
+
+# ---------- document embeddings (индексация) ----------
+
+
+def document_key(provider: str, model: str, text: str) -> str:
+    """Ключ вектора чанка: точный текст, без нормализации."""
+    raw = f"{provider}\0{model}\0{text}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DocumentEmbeddingStore:
+    """Content-addressed SQLite store векторов чанков: key → float32 blob."""
+
+    # SQLite ограничивает число параметров в запросе
+    _SELECT_BATCH = 500
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        keys = list(keys)
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for i in range(0, len(keys), self._SELECT_BATCH):
+                part = keys[i : i + self._SELECT_BATCH]
+                marks = ",".join("?" * len(part))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM chunk_embeddings WHERE key IN ({marks})",
+                    part,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunk_embeddings VALUES (?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes())
+                    for key, vector in items.items()
+                ],
+            )
+            self._db.commit()
+
+    def cache_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def embedding_identity(embeddings) -> Tuple[str, str]:
+    """(provider, model) векторного пространства — часть ключей кэшей."""
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.provider, embeddings.model
+    model = getattr(embeddings, "model", "")
+    return type(embeddings).__name__, model if isinstance(model, str) else ""
+
+
+def embed_documents_cached(
+    embeddings, texts: List[str], store: DocumentEmbeddingStore
+) -> List[List[float]]:
+    """embed_documents через store: провайдеру уходят только отсутствующие тексты."""
+    provider, model = embedding_identity(embeddings)
+    keys = [document_key(provider, model, t) for t in texts]
+    found = store.get_many(set(keys))
+
+    # одинаковые тексты внутри батча эмбеддятся один раз
+    missing = {k: t for k, t in zip(keys, texts) if k not in found}
+    store.hits += len(keys) - sum(1 for k in keys if k in missing)
+    store.misses += sum(1 for k in keys if k in missing)
+    if missing:
+        fresh = embeddings.embed_documents(list(missing.values()))
+        new = {k: [float(x) for x in v] for k, v in zip(missing, fresh)}
+        store.put_many(new)
+        found.update(new)
+    return [found[k] for k in keys]
@@ -3,13 +3,15 @@ from __future__ import annotations
 import hashlib
 import io
 import json
+import multiprocessing
 import os
 import pickle
 import re
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Iterable, List, Optional, Tuple, Union, Any
+from typing import Iterable, Iterator, List, Optional, Tuple, Union, Any
 
 from docling.document_converter import DocumentConverter
 from docling_core.types.doc.document import (
@@ -21,6 +23,8 @@ from langchain_core.documents import Document
 
 from config import constants
 from config.settings import settings
+from src.chunk_store import read_chunks, write_chunks
+from src.parent_store import parent_id_for
 from utils.logging import logger
 
 FileLike = Union[str, os.PathLike, io.BufferedIOBase, io.BytesIO, io.StringIO]
@@ -38,7 +42,8 @@ PIPELINE_VERSION = "v2.3-noise-clean"
 MIN_BBOX_HEIGHT = 7
 BLACKLIST_PHRASES = ["Премиальная версия", "Скачано с", "Страница"]
 MAX_CHUNK_SIZE = settings.CHUNK_SIZE
-# Parent-context chunking: parent (~1500 chars) stored as metadata on each child.
+# Parent-context chunking (settings.PARENT_CHILD_CHUNKS): each grouped_text chunk
+# (~1500 chars) becomes the parent, stored once in ParentStore by parent_id.
 # Children (~400 chars, 50-char overlap) are what gets embedded and indexed.
 CHILD_CHUNK_SIZE = 400
 CHILD_OVERLAP = 50
@@ -62,12 +67,21 @@ def _clean_noise(text: str) -> str:
     return cleaned.strip()
 
 
+def pipeline_key() -> str:
+    """Версия нарезки: PIPELINE_VERSION плюс режим parent/child."""
+    if settings.PARENT_CHILD_CHUNKS:
+        return f"{PIPELINE_VERSION}+children"
+    return PIPELINE_VERSION
+
+
 def _split_into_children(parent_text: str, parent_meta: dict) -> List[Document]:
     """Разбивает parent-чанк на child-чанки для индексации.
 
     Child-чанки (~400 chars) используются для embedding/поиска.
-    Каждый child несёт parent_text в метаданных — именно он передаётся LLM.
+    Каждый child несёт parent_id и parent_text; при записи в Chroma
+    parent_text уходит в ParentStore, LLM получает его по parent_id.
     """
+    parent_meta = {**parent_meta, "parent_id": parent_id_for(parent_text)}
     if len(parent_text) <= CHILD_CHUNK_SIZE:
         meta = {**parent_meta, "parent_text": parent_text}
         return [Document(page_content=parent_text, metadata=meta)]
@@ -89,10 +103,29 @@ def _split_into_children(parent_text: str, parent_meta: dict) -> List[Document]:
 
 @dataclass
 class CacheEntry:
+    """Legacy pickle-формат document_cache (*.pkl) — читается только для миграции."""
+
     timestamp: float
     chunks: List[Document]
 
 
+# --- Параллельная конвертация (process pool) ---
+# Docling layout analysis CPU-bound: каждый воркер держит свой DocumentConverter,
+# созданный лениво при первом файле. Воркер только конвертирует — кэш читает и
+# пишет родительский процесс, поэтому семантика document_cache не меняется.
+_worker_processor: Optional["DocumentProcessor"] = None
+
+
+def _convert_in_worker(
+    source: Union[str, bytes], display_name: str, file_hash: str
+) -> List[Document]:
+    """Entry point процесса-воркера: путь или байты файла → чанки."""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = DocumentProcessor()
+    return _worker_processor._convert_and_extract(source, display_name, file_hash)
+
+
 class DocumentProcessor:
     """
     Обработчик файлов с поддержкой извлечения координат (BBox) для визуализации.
@@ -106,12 +139,20 @@ class DocumentProcessor:
         ] = None,  # Deprecated, kept for interface compat
         chunk_size: Optional[int] = None,  # Deprecated
         chunk_overlap: Optional[int] = None,  # Deprecated
+        workers: Optional[int] = None,
     ):
         self.cache_dir = Path(settings.CACHE_DIR)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = max(1, workers or settings.DOCLING_WORKERS)
 
         # Ленивая инициализация Docling
-        self._docling = DocumentConverter()
+        self._docling_converter: Optional[DocumentConverter] = None
+
+    @property
+    def _docling(self) -> DocumentConverter:
+        if self._docling_converter is None:
+            self._docling_converter = DocumentConverter()
+        return self._docling_converter
 
     # ---------- публичные методы ----------
 
@@ -132,72 +173,143 @@ class DocumentProcessor:
 
     def process(self, files: Iterable[FileLike]) -> List[Document]:
         """Обработка файлов с кэшированием."""
+        files = list(files)
         self.validate_files(files)
 
         all_chunks: List[Document] = []
         seen_chunk_hashes: set[str] = set()
 
-        for file_obj in files:
-            try:
-                stream, display_name = self._get_stream_and_name(file_obj)
-
-                # Хэш файла для кэша
-                file_hash = self._hash_bytes_stream(stream)
-                cache_path = self._cache_path_for(file_hash)
-
-                if self._is_cache_valid(cache_path):
-                    logger.info(f"[cache] {display_name}")
-                    chunks = self._load_from_cache(cache_path)
-                else:
-                    logger.info(f"[process] {display_name}")
-                    stream.seek(0)
-                    chunks = self._convert_and_extract(stream, display_name, file_hash)
-                    self._save_to_cache(chunks, cache_path)
-
-                # Дедупликация
-                for ch in chunks:
-                    # Уникальность определяем по тексту + координатам (если есть)
-                    # Но для простоты пока по тексту, хотя разные bbox могут иметь один текст
-                    content_hash = hashlib.sha256(
-                        ch.page_content.encode("utf-8")
-                    ).hexdigest()
-                    if content_hash not in seen_chunk_hashes:
-                        all_chunks.append(ch)
-                        seen_chunk_hashes.add(content_hash)
-
-            except Exception as e:
-                logger.error(
-                    f"Failed to process '{getattr(file_obj, 'name', str(file_obj))}': {e}",
-                    exc_info=True,
-                )
-                continue
+        for _, chunks in self.iter_chunks(files):
+            # Дедупликация
+            for ch in chunks:
+                # Уникальность определяем по тексту + координатам (если есть)
+                # Но для простоты пока по тексту, хотя разные bbox могут иметь один текст
+                content_hash = hashlib.sha256(
+                    ch.page_content.encode("utf-8")
+                ).hexdigest()
+                if content_hash not in seen_chunk_hashes:
+                    all_chunks.append(ch)
+                    seen_chunk_hashes.add(content_hash)
 
         logger.info(f"Total unique chunks: {len(all_chunks)}")
         return all_chunks
 
+    def iter_chunks(
+        self, files: Iterable[FileLike]
+    ) -> Iterator[Tuple[FileLike, List[Document]]]:
+        """(file, чанки) в порядке входа; упавший файл логируется и пропускается.
+
+        При workers > 1 промахи кэша конвертируются в пуле процессов, а
+        результаты отдаются по мере готовности — но строго в порядке файлов.
+        """
+        if self.workers <= 1:
+            for file_obj in files:
+                chunks = self._process_one(file_obj)
+                if chunks is not None:
+                    yield file_obj, chunks
+            return
+
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx) as pool:
+            pending = []
+            for file_obj in files:
+                job = self._prepare(file_obj)
+                if job is None:
+                    continue
+                display_name, cache_path, source, file_hash, cached = job
+                if cached is not None:
+                    pending.append((file_obj, display_name, cache_path, cached))
+                    continue
+                logger.info(f"[process] {display_name}")
+                future = pool.submit(
+                    _convert_in_worker, source, display_name, file_hash
+                )
+                pending.append((file_obj, display_name, cache_path, future))
+
+            for file_obj, display_name, cache_path, result in pending:
+                if isinstance(result, list):
+                    yield file_obj, result
+                    continue
+                try:
+                    chunks = result.result()
+                except Exception as e:
+                    logger.error(f"Failed to process '{display_name}': {e}")
+                    continue
+                self._save_to_cache(chunks, cache_path)
+                yield file_obj, chunks
+
+    def _process_one(self, file_obj: FileLike) -> Optional[List[Document]]:
+        """Один файл в текущем процессе: кэш или Docling."""
+        job = self._prepare(file_obj)
+        if job is None:
+            return None
+        display_name, cache_path, source, file_hash, cached = job
+        if cached is not None:
+            return cached
+        logger.info(f"[process] {display_name}")
+        try:
+            chunks = self._convert_and_extract(source, display_name, file_hash)
+        except Exception as e:
+            logger.error(f"Failed to process '{display_name}': {e}", exc_info=True)
+            return None
+        self._save_to_cache(chunks, cache_path)
+        return chunks
+
+    def _prepare(self, file_obj: FileLike):
+        """Хэш + проверка кэша.
+
+        Returns (display_name, cache_path, source, file_hash, cached_chunks) или
+        None при ошибке. source — путь для файлов на диске, байты для загрузок;
+        cached_chunks is None означает промах кэша.
+        """
+        try:
+            # Путь на диске не читается в память: хэш считается потоково,
+            # а Docling получает сам путь. Байты держим только для загрузок.
+            source, display_name = self._source_and_name(file_obj)
+            if isinstance(source, str):
+                file_hash = self._hash_file(source)
+            else:
+                file_hash = hashlib.sha256(source).hexdigest()
+            cache_path = self._cache_path_for(file_hash)
+
+            cached = self._try_load_cache(cache_path)
+            if cached is not None:
+                logger.info(f"[cache] {display_name}")
+                return display_name, cache_path, None, file_hash, cached
+            return display_name, cache_path, source, file_hash, None
+        except Exception as e:
+            logger.error(
+                f"Failed to process '{getattr(file_obj, 'name', str(file_obj))}': {e}",
+                exc_info=True,
+            )
+            return None
+
     # ---------- конвертация и извлечение ----------
 
     def _convert_and_extract(
-        self, stream: io.BufferedIOBase, source_name: str, file_hash: str
+        self, source: Union[str, bytes], source_name: str, file_hash: str
     ) -> List[Document]:
-        """Конвертация через Docling и извлечение структурных чанков."""
+        """Конвертация через Docling и извлечение структурных чанков.
+
+        source — путь (передаётся Docling как есть) или байты загрузки,
+        которые Docling может прочитать только с диска — их пишем во временный файл.
+        """
+        if isinstance(source, str):
+            return self._convert_path(source, source_name)
+
         import tempfile
 
-        # Docling требует файл на диске
         suffix = self._suffix_from_name(source_name)
         with tempfile.NamedTemporaryFile(delete=True, suffix=suffix) as tmp:
-            stream.seek(0)
-            tmp.write(stream.read())
+            tmp.write(source)
             tmp.flush()
+            return self._convert_path(tmp.name, source_name)
 
-            # Конвертация
-            try:
-                res = self._docling.convert(tmp.name)
-            except Exception as e:
-                logger.error(f"Docling conversion failed for {source_name}: {e}")
-                return []
-
-            return self._process_docling_document(res.document, source_name)
+    def _convert_path(self, path: str, source_name: str) -> List[Document]:
+        # Ошибка Docling пробрасывается: iter_chunks пропускает файл, пустой
+        # результат не кэшируется, а sync_index оставляет старые чанки.
+        res = self._docling.convert(path)
+        return self._process_docling_document(res.document, source_name)
 
     def _process_docling_document(self, doc: Any, source: str) -> List[Document]:
         """
@@ -245,7 +357,10 @@ class DocumentProcessor:
                 meta["page_no"] = current_chunk_page
 
             # Контент БЕЗ заголовка (чистый текст)
-            chunks.append(Document(page_content=full_text, metadata=meta))
+            if settings.PARENT_CHILD_CHUNKS:
+                chunks.extend(_split_into_children(full_text, meta))
+            else:
+                chunks.append(Document(page_content=full_text, metadata=meta))
 
             # Сброс
             current_chunk_text = []
@@ -391,22 +506,48 @@ class DocumentProcessor:
             return "list_item"
         return "text"
 
-    # ---------- кэш и утилиты (без изменений логики) ----------
+    # ---------- кэш и утилиты ----------
 
     def _cache_path_for(self, file_hash: str) -> Path:
         key = hashlib.sha256(
-            f"{file_hash}:{PIPELINE_VERSION}".encode("utf-8")
+            f"{file_hash}:{pipeline_key()}".encode("utf-8")
         ).hexdigest()
-        return self.cache_dir / f"{key}.pkl"
+        return self.cache_dir / f"{key}.arrow"
 
     def _save_to_cache(self, chunks: List[Document], cache_path: Path) -> None:
-        data = CacheEntry(timestamp=datetime.now().timestamp(), chunks=chunks)
-        with open(cache_path, "wb") as f:
-            pickle.dump(data, f)
+        # Кэш best-effort: не удалось записать — файл всё равно обработан
+        try:
+            write_chunks(cache_path, chunks)
+        except Exception as e:
+            logger.warning(f"Chunk cache write failed ({cache_path.name}): {e}")
 
     def _load_from_cache(self, cache_path: Path) -> List[Document]:
-        with open(cache_path, "rb") as f:
-            data: CacheEntry = pickle.load(f)
+        return read_chunks(cache_path)
+
+    def _try_load_cache(self, cache_path: Path) -> Optional[List[Document]]:
+        """Чанки из кэша или None; legacy .pkl того же ключа мигрирует в Arrow."""
+        if self._is_cache_valid(cache_path):
+            try:
+                return self._load_from_cache(cache_path)
+            except Exception as e:
+                logger.warning(f"Chunk cache unreadable ({cache_path.name}): {e}")
+                return None
+
+        legacy_path = cache_path.with_suffix(".pkl")
+        if not self._is_cache_valid(legacy_path):
+            return None
+        try:
+            with open(legacy_path, "rb") as f:
+                data: CacheEntry = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Legacy cache unreadable ({legacy_path.name}): {e}")
+            return None
+        self._save_to_cache(data.chunks, cache_path)
+        if cache_path.exists():
+            # сохраняем возраст записи для CACHE_EXPIRE_DAYS
+            mtime = legacy_path.stat().st_mtime
+            os.utime(cache_path, (mtime, mtime))
+            legacy_path.unlink()
         return data.chunks
 
     def _is_cache_valid(self, cache_path: Path) -> bool:
@@ -430,28 +571,23 @@ class DocumentProcessor:
             return None
         return None
 
-    def _get_stream_and_name(self, f: FileLike) -> Tuple[io.BytesIO, str]:
+    def _source_and_name(self, f: FileLike) -> Tuple[Union[str, bytes], str]:
+        """Путь для файлов на диске, байты для in-memory загрузок."""
         if isinstance(f, (str, os.PathLike)):
-            p = Path(f)
-            with open(p, "rb") as fh:
-                data = fh.read()
-            return io.BytesIO(data), p.name
+            path = os.fspath(f)
+            return path, Path(path).name
         if hasattr(f, "read"):
             raw = f.read()
             if isinstance(raw, str):
                 raw = raw.encode("utf-8")
-            return io.BytesIO(raw), getattr(f, "name", "uploaded_file")
+            return raw, getattr(f, "name", "uploaded_file")
         raise TypeError(f"Unsupported file type: {type(f)}")
 
-    def _hash_bytes_stream(self, stream: io.BytesIO) -> str:
-        stream.seek(0)
+    def _hash_file(self, path: str) -> str:
         h = hashlib.sha256()
-        while True:
-            chunk = stream.read(1024 * 1024)
-            if not chunk:
-                break
-            h.update(chunk)
-        stream.seek(0)
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(1024 * 1024), b""):
+                h.update(block)
         return h.hexdigest()
 
     def _suffix_from_name(self, name: str) -> str:
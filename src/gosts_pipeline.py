@@ -67,21 +67,12 @@ def _rerank(
     query: str, passages: list[dict[str, Any]], top_n: int = RERANK_TOP_N
 ) -> list[dict[str, Any]]:
     try:
-        from flashrank import Ranker, RerankRequest
+        from src.reranker import rank
 
-        ranker = Ranker(
-            model_name="ms-marco-MiniLM-L-12-v2", cache_dir=".flashrank_cache"
-        )
-        rerank_req = RerankRequest(
-            query=query,
-            passages=[{"id": i, "text": p["text"]} for i, p in enumerate(passages)],
-        )
-        results = ranker.rerank(rerank_req)
-        reranked = []
-        for r in results[:top_n]:
-            orig = passages[r["id"]]
-            reranked.append({**orig, "score": orig["vector_score"]})
-        return reranked
+        ranked = rank(query, [p["text"] for p in passages], top_n)
+        return [
+            {**passages[i], "score": passages[i]["vector_score"]} for i, _ in ranked
+        ]
     except Exception as exc:
         logger.warning(
             "gosts_pipeline: rerank failed, using vector order", error=str(exc)
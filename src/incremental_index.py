@@ -0,0 +1,206 @@
+"""Incremental indexing: manifest «файл → хэш + chunk ids».
+
+index.py раньше сносил Chroma и переиндексировал всю библиотеку. Теперь
+манифест (рядом с Chroma) помнит для каждого файла sha256, size/mtime и
+ids его чанков; sync_index конвертирует и эмбеддит только новые и
+изменённые файлы и удаляет чанки исчезнувших.
+
+Chunk ids детерминированы (ключ манифеста + путь + хэш файла + порядковый
+номер): изменение файла, PIPELINE_VERSION или модели эмбеддингов меняет ids —
+а значит и fingerprint коллекции, по которому инвалидируются BM25 snapshot,
+VectorMirror и answer cache.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.vector_store import add_chunks
+from src.v7.domain_gate import embedding_sum, update_centroid_state
+from utils.logging import logger
+
+MANIFEST_FILE = "index_manifest.json"
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class FileEntry:
+    sha256: str
+    size: int
+    mtime_ns: int
+    chunk_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class IndexManifest:
+    """Состояние индекса: ключ совместимости + записи по файлам."""
+
+    key: str
+    files: Dict[str, FileEntry] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str, key: str) -> Optional["IndexManifest"]:
+        """Манифест из ``path``; None если его нет, он битый или от другого key."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Index manifest unreadable ({path}): {e}")
+            return None
+        if raw.get("version") != MANIFEST_VERSION or raw.get("key") != key:
+            logger.info("Index manifest from another pipeline/embedding — ignored")
+            return None
+        files = {p: FileEntry(**entry) for p, entry in raw.get("files", {}).items()}
+        return cls(key=key, files=files)
+
+    def save(self, path: str) -> None:
+        payload = {
+            "version": MANIFEST_VERSION,
+            "key": self.key,
+            "files": {p: asdict(e) for p, e in self.files.items()},
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+@dataclass
+class IndexPlan:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    # stat + хэш для added/changed (chunk_ids заполняются при индексации)
+    entries: Dict[str, FileEntry] = field(default_factory=dict)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_ids_for(path: str, file_hash: str, count: int, key: str = "") -> List[str]:
+    """Детерминированные ids чанков файла (одинаковые файлы по разным путям не конфликтуют).
+
+    ``key`` — ключ манифеста (нарезка + эмбеддинги): после пересборки с другим
+    PIPELINE_VERSION или моделью у неизменённых файлов будут новые ids.
+    """
+    seed = f"{key}\0{path}\0{file_hash}"
+    prefix = hashlib.sha256(seed.encode("utf-8")).hexdigest()[:16]
+    return [f"{prefix}-{i:05d}" for i in range(count)]
+
+
+def plan_changes(manifest: IndexManifest, paths: List[str]) -> IndexPlan:
+    """Сравнить файлы на диске с манифестом.
+
+    Совпавшие size и mtime считаются неизменными без чтения файла; иначе
+    решает sha256 (touch без правки обновляет только stat в манифесте).
+    """
+    plan = IndexPlan()
+    for path in paths:
+        st = os.stat(path)
+        old = manifest.files.get(path)
+        if old and old.size == st.st_size and old.mtime_ns == st.st_mtime_ns:
+            plan.unchanged.append(path)
+            continue
+        digest = file_sha256(path)
+        if old and old.sha256 == digest:
+            old.size, old.mtime_ns = st.st_size, st.st_mtime_ns
+            plan.unchanged.append(path)
+            continue
+        plan.entries[path] = FileEntry(
+            sha256=digest, size=st.st_size, mtime_ns=st.st_mtime_ns
+        )
+        (plan.changed if old else plan.added).append(path)
+
+    on_disk = set(paths)
+    plan.removed = [p for p in manifest.files if p not in on_disk]
+    return plan
+
+
+def _dedupe(chunks: list) -> list:
+    seen: set[str] = set()
+    unique = []
+    for ch in chunks:
+        content_hash = hashlib.sha256(ch.page_content.encode("utf-8")).hexdigest()
+        if content_hash not in seen:
+            seen.add(content_hash)
+            unique.append(ch)
+    return unique
+
+
+def sync_index(
+    vector_store,
+    processor,
+    manifest: IndexManifest,
+    paths: List[str],
+    manifest_path: str,
+) -> IndexPlan:
+    """Привести коллекцию к файлам ``paths``; манифест сохраняется после каждого файла.
+
+    Старые чанки изменённого файла удаляются только после успешной
+    конвертации новой версии — упавший файл остаётся в индексе как был и
+    будет повторён при следующем запуске. Centroid state domain gate
+    обновляется на дельту эмбеддингов.
+    """
+    plan = plan_changes(manifest, paths)
+    logger.info(
+        f"Index plan: +{len(plan.added)} ~{len(plan.changed)} "
+        f"-{len(plan.removed)} ={len(plan.unchanged)}"
+    )
+    collection = vector_store._collection
+    delta_total: Optional[np.ndarray] = None
+    delta_count = 0
+
+    def _account(ids: List[str], sign: int) -> None:
+        nonlocal delta_total, delta_count
+        total, count = embedding_sum(collection, ids)
+        if count:
+            delta_total = (
+                sign * total if delta_total is None else delta_total + sign * total
+            )
+            delta_count += sign * count
+
+    def _drop(ids: List[str]) -> None:
+        if ids:
+            _account(ids, -1)
+            vector_store.delete(ids=ids)
+
+    for path in plan.removed:
+        logger.info(f"[remove] {path}")
+        _drop(manifest.files.pop(path).chunk_ids)
+        manifest.save(manifest_path)
+
+    for path, chunks in processor.iter_chunks(plan.added + plan.changed):
+        entry = plan.entries[path]
+        chunks = _dedupe(chunks)
+        entry.chunk_ids = chunk_ids_for(path, entry.sha256, len(chunks), manifest.key)
+        old = manifest.files.get(path)
+        if old is not None:
+            _drop(old.chunk_ids)
+        if chunks:
+            add_chunks(vector_store, chunks, ids=entry.chunk_ids)
+            _account(entry.chunk_ids, +1)
+        manifest.files[path] = entry
+        manifest.save(manifest_path)
+
+    manifest.save(manifest_path)
+    if plan.has_changes:
+        update_centroid_state(collection, delta_total, delta_count)
+    return plan
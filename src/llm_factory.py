@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 
 from dotenv import load_dotenv
 from huggingface_hub import InferenceClient
@@ -6,6 +7,7 @@ from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 from config.settings import settings
+from src.embedding_cache import CachedEmbeddings
 
 load_dotenv()
 
@@ -183,6 +185,18 @@ _EMBEDDING_PROVIDERS = {
 }
 
 
+@lru_cache(maxsize=None)
+def _cached_embedding_model(provider: str, model: str) -> CachedEmbeddings:
+    """Один клиент на (provider, model) на процесс, с кэшем query-векторов."""
+    return CachedEmbeddings(
+        _EMBEDDING_PROVIDERS[provider](),
+        provider=provider,
+        model=model,
+        maxsize=settings.EMBEDDING_CACHE_SIZE,
+        disk_path=settings.EMBEDDING_CACHE_PATH or None,
+    )
+
+
 def get_embedding_model():
     provider = (settings.EMBEDDING_PROVIDER or "").lower()
     factory = _EMBEDDING_PROVIDERS.get(provider)
@@ -191,4 +205,4 @@ def get_embedding_model():
         raise ValueError(
             f"Unknown EMBEDDING_PROVIDER={provider}. Available: {available}"
         )
-    return factory()
+    return _cached_embedding_model(provider, settings.EMBEDDING_MODEL_NAME or "")
@@ -0,0 +1,128 @@
+"""Parent store: parent_id → parent_text вне метаданных Chroma.
+
+Child-чанки несут в Chroma только ``parent_id`` (sha256 от текста родителя),
+а сам ~1500-символьный parent лежит здесь один раз. Так коллекция не хранит
+и не отдаёт в ``vector_store.get()`` по копии родителя на каждого child;
+тексты родителей подтягиваются одним батчем на этапе генерации.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from config.settings import settings
+from utils.logging import logger
+
+PARENT_STORE_FILE = "parents.sqlite"
+
+
+def parent_id_for(text: str) -> str:
+    """Content-addressed id родителя: одинаковый текст → один и тот же id."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class ParentStore:
+    """SQLite key-value store parent_id → parent_text."""
+
+    # SQLite ограничивает число параметров в запросе
+    _SELECT_BATCH = 500
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS parents "
+            "(parent_id TEXT PRIMARY KEY, text TEXT NOT NULL)"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def get_many(self, parent_ids: Iterable[str]) -> Dict[str, str]:
+        ids = list(parent_ids)
+        found: Dict[str, str] = {}
+        with self._lock:
+            for i in range(0, len(ids), self._SELECT_BATCH):
+                part = ids[i : i + self._SELECT_BATCH]
+                marks = ",".join("?" * len(part))
+                rows = self._db.execute(
+                    f"SELECT parent_id, text FROM parents WHERE parent_id IN ({marks})",
+                    part,
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def put_many(self, items: Dict[str, str]) -> None:
+        if not items:
+            return
+        with self._lock:
+            # content-addressed: существующая запись уже содержит тот же текст
+            self._db.executemany(
+                "INSERT OR IGNORE INTO parents VALUES (?, ?)", list(items.items())
+            )
+            self._db.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM parents").fetchone()[0]
+
+
+@lru_cache(maxsize=None)
+def _parent_store(path: str) -> ParentStore:
+    return ParentStore(path)
+
+
+def get_parent_store(db_path: Optional[str] = None) -> Optional[ParentStore]:
+    """Store в каталоге коллекции (по умолчанию CHROMA_DB_PATH) — сносится вместе с индексом.
+
+    None, если каталога коллекции нет: без индекса нет и родителей.
+    """
+    db_path = db_path or settings.CHROMA_DB_PATH
+    if not os.path.isdir(db_path):
+        return None
+    path = os.path.join(db_path, PARENT_STORE_FILE)
+    try:
+        return _parent_store(path)
+    except Exception as e:
+        logger.warning(f"Parent store unavailable ({path}): {e}")
+        return None
+
+
+def expand_to_parents(passages: List[dict], store: Optional[ParentStore]) -> List[dict]:
+    """Заменить текст child-пассажей текстом родителя (один батч-запрос).
+
+    Несколько child одного родителя схлопываются в первое (лучшее по рангу)
+    вхождение; пассажи без parent_id или с неизвестным id остаются как есть.
+    Порядок сохраняется.
+    """
+    wanted = {
+        (p.get("metadata") or {}).get("parent_id")
+        for p in passages
+        if (p.get("metadata") or {}).get("parent_id")
+    }
+    if not wanted or store is None:
+        return passages
+    try:
+        parents = store.get_many(wanted)
+    except Exception as e:
+        logger.warning(f"Parent resolution failed: {e}")
+        return passages
+
+    out: List[dict] = []
+    seen: set = set()
+    for p in passages:
+        pid = (p.get("metadata") or {}).get("parent_id")
+        if pid not in parents:
+            out.append(p)
+            continue
+        if pid in seen:
+            continue
+        seen.add(pid)
+        out.append({**p, "text": parents[pid]})
+    return out
@@ -0,0 +1,246 @@
+"""Process-wide FlashRank rankers and batched cross-encoder scoring.
+
+``flashrank.Ranker`` грузит ONNX-модель и токенизатор с диска при создании,
+поэтому на процесс держится один экземпляр на (model_name, cache_dir):
+``get_ranker`` создаёт его под локом, дальше все запросы (v7 rerank, /query/gosts)
+делят одну ONNX-сессию — ``InferenceSession.run`` потокобезопасен.
+
+``score_batch`` скорит несколько пар (query, passages) за один ``session.run``:
+все пары query–passage токенизируются одним ``encode_batch``. Для моделей без
+ONNX-сессии (listwise LLM-ранкеры FlashRank) — по ``Ranker.rerank`` на запрос.
+
+Scores кэшируются в bounded LRU (модель, query, чанк) → score: rag_simple
+(evidence assess) и rag_complex скорят одни и те же чанки для одного
+active_query, и повторные вопросы тоже попадают в кэш. Чанк адресуется
+digest'ом текста — score зависит только от пары текстов, а chunk_id в
+метаданных уникален лишь внутри файла и переиспользуется после переиндексации.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from src.embedding_cache import normalize_query
+from utils.logging import logger
+
+# Пар query–passage в одном session.run: батч паддится до самой длинной пары
+MAX_PAIRS_PER_RUN = 128
+
+_rankers: Dict[Tuple[str, str], object] = {}
+_lock = threading.Lock()
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class ScoreCache:
+    """Bounded LRU (model key, query digest, chunk digest) → score."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._scores: OrderedDict[tuple, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def get_many(self, keys: Sequence[tuple]) -> List[Optional[float]]:
+        if self.max_size <= 0:
+            self.misses += len(keys)
+            return [None] * len(keys)
+        out: List[Optional[float]] = []
+        with self._lock:
+            for key in keys:
+                score = self._scores.get(key)
+                if score is None:
+                    self.misses += 1
+                else:
+                    self._scores.move_to_end(key)
+                    self.hits += 1
+                out.append(score)
+        return out
+
+    def put_many(self, items: Sequence[Tuple[tuple, float]]) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            for key, score in items:
+                self._scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.max_size:
+                self._scores.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scores.clear()
+            self.hits = self.misses = 0
+
+
+_score_cache = ScoreCache(settings.RERANK_SCORE_CACHE_SIZE)
+
+
+def _resolve(model_name: Optional[str], cache_dir: Optional[str]) -> Tuple[str, str]:
+    return (
+        model_name or settings.RERANKING_MODEL,
+        cache_dir or settings.FLASHRANK_CACHE_DIR,
+    )
+
+
+def get_ranker(model_name: Optional[str] = None, cache_dir: Optional[str] = None):
+    """Shared ``flashrank.Ranker`` (загружается один раз на процесс)."""
+    key = _resolve(model_name, cache_dir)
+    ranker = _rankers.get(key)
+    if ranker is not None:
+        return ranker
+    with _lock:
+        ranker = _rankers.get(key)
+        if ranker is None:
+            from flashrank import Ranker
+
+            t0 = time.perf_counter()
+            ranker = Ranker(model_name=key[0], cache_dir=key[1])
+            _rankers[key] = ranker
+            logger.info(f"FlashRank {key[0]} loaded in {time.perf_counter() - t0:.2f}s")
+    return ranker
+
+
+def clear_rankers() -> None:
+    """Забыть загруженные модели и их scores (тесты, смена RERANKING_MODEL)."""
+    with _lock:
+        _rankers.clear()
+    _score_cache.clear()
+
+
+def _logits_to_scores(logits: np.ndarray) -> np.ndarray:
+    # та же нормировка, что в Ranker.rerank для pairwise-моделей
+    if logits.shape[1] == 1:
+        return 1.0 / (1.0 + np.exp(-logits.flatten()))
+    exp_logits = np.exp(logits)
+    return exp_logits[:, 1] / np.sum(exp_logits, axis=1)
+
+
+def _session_inputs(session) -> Optional[set]:
+    """Имена входов ONNX-графа; None, если сессия их не отдаёт."""
+    try:
+        return {i.name for i in session.get_inputs()}
+    except Exception:
+        return None
+
+
+def _run_pairs(ranker, pairs: List[List[str]]) -> np.ndarray:
+    encoded = ranker.tokenizer.encode_batch(pairs)
+    onnx_input = {
+        "input_ids": np.array([e.ids for e in encoded], dtype=np.int64),
+        "attention_mask": np.array([e.attention_mask for e in encoded], dtype=np.int64),
+    }
+    # token_type_ids есть не у всех графов (T5-модели FlashRank): по входам
+    # сессии, иначе как Ranker.rerank — только если не все нули
+    token_type_ids = np.array([e.type_ids for e in encoded], dtype=np.int64)
+    inputs = _session_inputs(ranker.session)
+    if inputs is not None:
+        use_type_ids = "token_type_ids" in inputs
+    else:
+        use_type_ids = bool(np.any(token_type_ids))
+    if use_type_ids:
+        onnx_input["token_type_ids"] = token_type_ids
+    logits = ranker.session.run(None, onnx_input)[0]
+    return _logits_to_scores(np.asarray(logits))
+
+
+def _rerank_scores(ranker, query: str, texts: Sequence[str]) -> List[float]:
+    from flashrank import RerankRequest
+
+    request = RerankRequest(
+        query=query, passages=[{"id": i, "text": t} for i, t in enumerate(texts)]
+    )
+    scores = [0.0] * len(texts)
+    for r in ranker.rerank(request):
+        scores[r["id"]] = float(r["score"])
+    return scores
+
+
+def _score_uncached(
+    ranker, requests: Sequence[Tuple[str, Sequence[str]]]
+) -> List[List[float]]:
+    if getattr(ranker, "session", None) is None or not hasattr(ranker, "tokenizer"):
+        return [_rerank_scores(ranker, q, texts) for q, texts in requests]
+
+    pairs = [[query, text] for query, texts in requests for text in texts]
+    flat: List[float] = []
+    for i in range(0, len(pairs), MAX_PAIRS_PER_RUN):
+        flat.extend(_run_pairs(ranker, pairs[i : i + MAX_PAIRS_PER_RUN]).tolist())
+
+    out: List[List[float]] = []
+    pos = 0
+    for _, texts in requests:
+        out.append(flat[pos : pos + len(texts)])
+        pos += len(texts)
+    return out
+
+
+def score_batch(
+    requests: Sequence[Tuple[str, Sequence[str]]],
+    model_name: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+) -> List[List[float]]:
+    """Cross-encoder scores для нескольких (query, texts) — по списку на запрос.
+
+    Пары, которых нет в score-кэше, идут в ONNX одним прогоном (чанками по
+    MAX_PAIRS_PER_RUN); порядок scores совпадает с порядком texts.
+    """
+    model_key = _resolve(model_name, cache_dir)
+    keys = []
+    for query, texts in requests:
+        query_key = _digest(normalize_query(query))
+        keys.append([(model_key, query_key, _digest(t)) for t in texts])
+    scores = [_score_cache.get_many(request_keys) for request_keys in keys]
+
+    # только промахи, без повторов одного текста внутри запроса
+    pending: List[Tuple[str, List[str]]] = []
+    slots: List[Tuple[int, Dict[bytes, List[int]]]] = []
+    for n, (query, texts) in enumerate(requests):
+        missing: Dict[bytes, List[int]] = {}
+        for i, score in enumerate(scores[n]):
+            if score is None:
+                missing.setdefault(keys[n][i][2], []).append(i)
+        if missing:
+            pending.append((query, [texts[pos[0]] for pos in missing.values()]))
+            slots.append((n, missing))
+    if not pending:
+        return scores
+
+    fresh = _score_uncached(get_ranker(*model_key), pending)
+    computed: List[Tuple[tuple, float]] = []
+    for (n, missing), new_scores in zip(slots, fresh):
+        for positions, score in zip(missing.values(), new_scores):
+            score = float(score)
+            for i in positions:
+                scores[n][i] = score
+            computed.append((keys[n][positions[0]], score))
+    _score_cache.put_many(computed)
+    return scores
+
+
+def rank(
+    query: str,
+    texts: Sequence[str],
+    top_n: Optional[int] = None,
+    model_name: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+) -> List[Tuple[int, float]]:
+    """(индекс в texts, score) по убыванию score — как порядок Ranker.rerank."""
+    if not texts:
+        return []
+    (scores,) = score_batch([(query, texts)], model_name, cache_dir)
+    order = sorted(range(len(texts)), key=lambda i: scores[i], reverse=True)
+    return [(i, scores[i]) for i in order[:top_n]]
@@ -3,123 +3,805 @@ from __future__ import annotations
 import json
 import logging
 import os
-from typing import List, Optional
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: no inter-process locking, single process only
+    fcntl = None
+
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# ─── Persistence format ───
+# Append-only binary log: file header, then records
+#   <op:u8><entry_id:u64><payload_len:u32><payload>
+# ADD payload = <meta_len:u32><meta JSON utf-8><float32 unit vector>,
+# DEL payload is empty. Dead records (deleted entries) are dropped by compact(),
+# which rewrites the log atomically once they outnumber the live entries.
+#
+# Several processes (uvicorn --workers N) may share one log: every write runs
+# under an flock on <cache>.lock and first replays what other processes
+# appended, or reloads the log if another process compacted (replaced) it.
+_LOG_MAGIC = b"SEMCACHE1\n"
+_RECORD = struct.Struct("<BQI")
+_META_LEN = struct.Struct("<I")
+_OP_ADD = 1
+_OP_DEL = 2
+
+_INITIAL_CAPACITY = 64
+_COMPACT_MIN_DEAD = 256
+
+# Columns of the per-row stats array
+_CREATED, _LAST_USED, _HITS = 0, 1, 2
+_EVICTION_POLICIES = ("lru", "lfu")
+
+# ─── ANN index ───
+# HNSW graph persisted next to the log as <cache>.hnsw (+ .hnsw.json with the
+# live labels). Labels are entry ids, which survive swap-remove and compaction.
+_HNSW_M = 16
+_HNSW_EF_CONSTRUCTION = 200
+# ANN candidates re-scored exactly against the matrix
+_ANN_CANDIDATES = 8
+
+
+class _HnswIndex:
+    """Incremental hnswlib index over unit vectors (inner product = cosine)."""
+
+    def __init__(self, index, dim: int, labels: Set[int], ef: int) -> None:
+        self._index = index
+        self.dim = dim
+        self.labels = labels
+        self._ef = ef
+        index.set_ef(ef)
+
+    @classmethod
+    def create(cls, dim: int, capacity: int, ef: int) -> "_HnswIndex":
+        index = hnswlib.Index(space="ip", dim=dim)
+        index.init_index(
+            max_elements=max(capacity, _INITIAL_CAPACITY),
+            ef_construction=_HNSW_EF_CONSTRUCTION,
+            M=_HNSW_M,
+        )
+        return cls(index, dim, set(), ef)
+
+    @classmethod
+    def load(cls, path: str, dim: int, ef: int) -> "_HnswIndex":
+        with open(f"{path}.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("dim") != dim:
+            raise ValueError(f"dimension {meta.get('dim')} != {dim}")
+        index = hnswlib.Index(space="ip", dim=dim)
+        index.load_index(path)
+        return cls(index, dim, {int(label) for label in meta["labels"]}, ef)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def deleted(self) -> int:
+        return self._index.get_current_count() - len(self.labels)
+
+    def add(self, vectors: np.ndarray, labels: Sequence[int]) -> None:
+        needed = self._index.get_current_count() + len(labels)
+        capacity = self._index.get_max_elements()
+        if needed > capacity:
+            self._index.resize_index(max(needed, 2 * capacity))
+        self._index.add_items(vectors, np.asarray(labels, dtype=np.int64))
+        self.labels.update(int(label) for label in labels)
+
+    def remove(self, label: int) -> None:
+        if label not in self.labels:
+            return
+        self.labels.discard(label)
+        try:
+            self._index.mark_deleted(label)
+        except RuntimeError:
+            pass  # already deleted in a saved index that lagged behind the log
+
+    def search(self, vec: np.ndarray, k: int) -> List[int]:
+        k = min(k, len(self.labels))
+        if k <= 0:
+            return []
+        self._index.set_ef(max(self._ef, k))
+        labels, _ = self._index.knn_query(vec, k=k)
+        return [int(label) for label in labels[0]]
+
+    def save(self, path: str) -> None:
+        """Atomic-ish save: graph and label list are replaced together."""
+        tmp = f"{path}.tmp"
+        self._index.save_index(tmp)
+        with open(f"{tmp}.json", "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "labels": sorted(self.labels)}, f)
+        os.replace(tmp, path)
+        os.replace(f"{tmp}.json", f"{path}.json")
+
 
 class SemanticCache:
+    """Answer cache keyed by query similarity.
+
+    Bounded by ``max_entries`` (LRU/LFU eviction), entries expire after
+    ``ttl_sec``, and every entry is stamped with the corpus fingerprint it was
+    produced against: once ``corpus_fingerprint()`` (re-read in a background
+    thread every SEMANTIC_CACHE_FINGERPRINT_CHECK_SEC) reports a different
+    collection, older entries are dropped. Limits default to the
+    SEMANTIC_CACHE_* settings; 0 disables a limit. Hit counts and access
+    times live in memory only — after a restart LRU order follows insertion.
+
+    Queries are embedded by ``encoder`` when given (``model_name`` then only
+    identifies the vector space), otherwise by a local SentenceTransformer.
+    Answers may be any JSON-serializable value; an exact query match is
+    served without embedding the query.
+
+    Similarity lookup is an exact matvec over all entries. Once the cache
+    holds ``ann_min_entries`` entries and hnswlib is installed, an HNSW index
+    proposes candidates instead (re-scored exactly, so the threshold keeps
+    its meaning); it is updated on every add/delete and saved on
+    compact()/close(). Without hnswlib the exact search is used.
+
+    The log may be shared by several processes: writes are serialized by an
+    flock and replay other processes' records first, so an entry added by
+    one worker is visible to another after that worker's next write.
+    Without fcntl (Windows) the cache is single-process only.
+    """
+
     def __init__(
         self,
         threshold: float = 0.93,
         model_name: str = "paraphrase-multilingual-MiniLM-L12-v2",
-        cache_file: str = "semantic_cache.json",
+        cache_file: str = "semantic_cache.bin",
+        max_entries: Optional[int] = None,
+        ttl_sec: Optional[float] = None,
+        eviction: Optional[str] = None,
+        corpus_fingerprint: Optional[Callable[[], Optional[str]]] = None,
+        encoder: Optional[Callable[[str], Sequence[float]]] = None,
+        ann: Optional[bool] = None,
+        ann_min_entries: Optional[int] = None,
     ):
         self.threshold = threshold
         self.model_name = model_name
         self.cache_file = cache_file
+        self.max_entries = (
+            settings.SEMANTIC_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        )
+        self.ttl_sec = settings.SEMANTIC_CACHE_TTL_SEC if ttl_sec is None else ttl_sec
+        self.eviction = (eviction or settings.SEMANTIC_CACHE_EVICTION).lower()
+        if self.eviction not in _EVICTION_POLICIES:
+            raise ValueError(
+                f"Unknown eviction policy {self.eviction!r}, "
+                f"expected one of {_EVICTION_POLICIES}"
+            )
+        self.corpus_fingerprint = corpus_fingerprint
+        self.ann = settings.SEMANTIC_CACHE_ANN if ann is None else ann
+        self.ann_min_entries = (
+            settings.SEMANTIC_CACHE_ANN_MIN_ENTRIES
+            if ann_min_entries is None
+            else ann_min_entries
+        )
+        self._ann_path = os.path.splitext(cache_file)[0] + ".hnsw"
 
-        # Initialize storage
-        self.sentences: List[str] = []
-        self.embeddings: List[List[float]] = []  # Store as lists for JSON serialization
-        self.answers: List[str] = []
+        # Row i of the matrix is the unit vector of self._queries[i];
+        # rows [size:capacity) are preallocated headroom.
+        self._matrix: Optional[np.ndarray] = None
+        self._stats = np.zeros((_INITIAL_CAPACITY, 3), np.float64)
+        self._size = 0
+        self._queries: List[str] = []
+        self._answers: List[Any] = []
+        self._entry_ids: List[int] = []
+        self._corpus: List[Optional[str]] = []
+        self._row_of: Dict[str, int] = {}
+        self._row_of_id: Dict[int, int] = {}
+        self._next_id = 0
+        self._dead = 0
+        self._log = None
+        # (inode, bytes) of the log as last read/written by this process
+        self._log_ino: Optional[int] = None
+        self._log_pos = 0
+        self._lock_file = None
+        self._flock_depth = 0
+        self._lock = threading.RLock()
+        self._active_corpus: Optional[str] = None
+        self._corpus_checked_at: Optional[float] = None
+        self._corpus_checking = threading.Lock()
+        self._ann: Optional[_HnswIndex] = None
+        self._ann_dirty = False
+        self.evictions = 0
 
         # Load model
         # Note: In tests this is mocked. In prod, this loads the model.
+        self.model = None
+        if encoder is None:
+            try:
+                self.model = SentenceTransformer(self.model_name)
+            except Exception as e:
+                logger.warning("Failed to load SentenceTransformer model: %s", e)
+        self._encoder = encoder or (self.model.encode if self.model else None)
+
+        # Load cache from disk (_locked replays the log)
+        with self._locked():
+            if self._log_ino is None:
+                self._migrate_legacy_json()
+        self._refresh_corpus()
+        with self._locked():
+            self._purge_expired()
+            self._enforce_max_entries(0)
+            self._compact_if_needed()
+            self._sync_ann()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def sentences(self) -> List[str]:
+        return list(self._queries)
+
+    @property
+    def answers(self) -> List[Any]:
+        return list(self._answers)
+
+    # ─── Matrix ───
+
+    def _encode(self, text: str) -> Optional[np.ndarray]:
+        vec = np.asarray(self._encoder(text), dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vec))
+        if norm == 0.0 or not np.isfinite(norm):
+            return None
+        return vec / norm
+
+    def _append_row(
+        self,
+        entry_id: int,
+        query: str,
+        answer: Any,
+        vec,
+        created: float,
+        corpus: Optional[str],
+    ) -> bool:
+        if self._matrix is None:
+            self._matrix = np.zeros((_INITIAL_CAPACITY, vec.shape[0]), np.float32)
+        elif vec.shape[0] != self._matrix.shape[1]:
+            return False
+        if self._size == self._matrix.shape[0]:
+            # amortized O(1) insert: capacity doubles
+            grown = np.zeros((self._size * 2, self._matrix.shape[1]), np.float32)
+            grown[: self._size] = self._matrix[: self._size]
+            self._matrix = grown
+            stats = np.zeros((self._size * 2, 3), np.float64)
+            stats[: self._size] = self._stats[: self._size]
+            self._stats = stats
+        row = self._size
+        self._matrix[row] = vec
+        self._stats[row] = (created, created, 0.0)
+        self._queries.append(query)
+        self._answers.append(answer)
+        self._entry_ids.append(entry_id)
+        self._corpus.append(corpus)
+        self._row_of[query] = row
+        self._row_of_id[entry_id] = row
+        self._size += 1
+        if self._ann is not None:
+            self._ann.add(vec[np.newaxis], [entry_id])
+            self._ann_dirty = True
+        return True
+
+    def _remove_row(self, row: int) -> None:
+        """Swap-remove: the last row takes the freed slot, rows stay dense."""
+        last = self._size - 1
+        columns = (self._queries, self._answers, self._entry_ids, self._corpus)
+        del self._row_of[self._queries[row]]
+        del self._row_of_id[self._entry_ids[row]]
+        if self._ann is not None:
+            self._ann.remove(self._entry_ids[row])
+            self._ann_dirty = True
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._stats[row] = self._stats[last]
+            for seq in columns:
+                seq[row] = seq[last]
+            self._row_of[self._queries[row]] = row
+            self._row_of_id[self._entry_ids[row]] = row
+        for seq in columns:
+            seq.pop()
+        self._size = last
+
+    def _delete_rows(self, rows) -> None:
+        """Remove rows and log DEL records (descending order keeps swap-remove valid)."""
+        for row in sorted((int(r) for r in rows), reverse=True):
+            entry_id = self._entry_ids[row]
+            self._remove_row(row)
+            self._append_record(_RECORD.pack(_OP_DEL, entry_id, 0))
+            self._dead += 2  # the ADD and its DEL
+
+    # ─── ANN ───
+
+    def _sync_ann(self) -> None:
+        """Load or build the ANN index once the cache outgrows exact search."""
+        if self._ann is not None or not self.ann or hnswlib is None:
+            return
+        if self._size < max(self.ann_min_entries, 1):
+            return
         try:
-            self.model = SentenceTransformer(self.model_name)
+            self._ann = self._load_ann() or self._build_ann()
         except Exception as e:
-            logger.warning("Failed to load SentenceTransformer model: %s", e)
-            self.model = None
+            # don't retry on every add; exact search keeps working
+            logger.warning("Semantic cache: ANN index disabled: %s", e)
+            self.ann = False
+            self._ann = None
 
-        # Load cache from disk
-        self._load()
+    def _build_ann(self) -> _HnswIndex:
+        index = _HnswIndex.create(
+            self._matrix.shape[1], 2 * self._size, settings.SEMANTIC_CACHE_HNSW_EF
+        )
+        index.add(self._matrix[: self._size], self._entry_ids)
+        self._ann_dirty = True
+        logger.info("Semantic cache: built ANN index over %d entries", self._size)
+        return index
 
-    def _load(self):
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    self.sentences = data.get("sentences", [])
-                    self.embeddings = data.get("embeddings", [])
-                    self.answers = data.get("answers", [])
-            except Exception as e:
-                logger.error("Failed to load cache: %s", e)
+    def _load_ann(self) -> Optional[_HnswIndex]:
+        """Saved index, reconciled with the log (entries added/deleted since save)."""
+        if not os.path.exists(self._ann_path):
+            return None
+        try:
+            index = _HnswIndex.load(
+                self._ann_path, self._matrix.shape[1], settings.SEMANTIC_CACHE_HNSW_EF
+            )
+        except Exception as e:
+            logger.warning("Semantic cache: rebuilding ANN index (%s)", e)
+            return None
+        live = set(self._entry_ids)
+        stale = index.labels - live
+        missing = sorted(self._row_of_id[i] for i in live - index.labels)
+        for label in stale:
+            index.remove(label)
+        if missing:
+            index.add(self._matrix[missing], [self._entry_ids[r] for r in missing])
+        self._ann_dirty = bool(stale or missing)
+        return index
 
-    def save(self):
-        """Save cache to disk."""
-        data = {
-            "sentences": self.sentences,
-            "embeddings": self.embeddings,
-            "answers": self.answers,
-        }
+    def _save_ann(self) -> None:
+        if self._ann is None or not self._ann_dirty:
+            return
         try:
-            with open(self.cache_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self._ann.save(self._ann_path)
+            self._ann_dirty = False
         except Exception as e:
-            logger.error("Failed to save cache: %s", e)
+            logger.error("Failed to save ANN index: %s", e)
 
-    def get(self, query: str) -> Optional[str]:
-        if not self.sentences or not self.model:
+    def _candidate_rows(self, query_vec: np.ndarray) -> Optional[np.ndarray]:
+        """Rows proposed by the ANN index; None = scan the whole matrix."""
+        if self._ann is None or self._size < self.ann_min_entries:
             return None
-
         try:
-            # Encode query
-            query_embedding = self.model.encode(query)
+            labels = self._ann.search(query_vec, _ANN_CANDIDATES)
+        except Exception as e:
+            logger.warning("Semantic cache: ANN search failed, exact scan: %s", e)
+            return None
+        rows = [self._row_of_id[label] for label in labels if label in self._row_of_id]
+        return np.asarray(rows, dtype=np.intp)
 
-            # Compute cosine similarities
-            # Convert list of lists to numpy array for efficient computation
-            cache_embeddings = np.array(self.embeddings)
+    # ─── Bounds ───
 
-            if len(cache_embeddings) == 0:
-                return None
+    def _maybe_refresh_corpus(self) -> None:
+        """Start a throttled corpus check in the background; never blocks lookups.
 
-            norm_query = np.linalg.norm(query_embedding)
-            if norm_query == 0:
-                return None
+        corpus_fingerprint() may scan the whole collection, so it runs in its own
+        thread (as VectorMirror._maybe_refresh does); until it finishes, lookups
+        are served from the entries of the previous fingerprint.
+        """
+        if self.corpus_fingerprint is None or self._corpus_checking.locked():
+            return
+        now = time.monotonic()
+        if (
+            self._corpus_checked_at is not None
+            and now - self._corpus_checked_at
+            < settings.SEMANTIC_CACHE_FINGERPRINT_CHECK_SEC
+        ):
+            return
+        self._corpus_checked_at = now
+        threading.Thread(
+            target=self._refresh_corpus, name="semantic-cache-corpus", daemon=True
+        ).start()
 
-            norm_cache = np.linalg.norm(cache_embeddings, axis=1)
-            # Avoid division by zero
-            norm_cache[norm_cache == 0] = 1e-9
+    def _refresh_corpus(self) -> None:
+        """Re-read the corpus fingerprint (outside the lock) and drop stale entries."""
+        if self.corpus_fingerprint is None:
+            return
+        with self._corpus_checking:
+            self._corpus_checked_at = time.monotonic()
+            try:
+                fingerprint = self.corpus_fingerprint()
+            except Exception as e:
+                logger.warning("Semantic cache: corpus fingerprint unavailable: %s", e)
+                return
+            if not fingerprint:
+                return
+            with self._locked():
+                if fingerprint == self._active_corpus:
+                    return
+                self._active_corpus = fingerprint
+                stale = [r for r in range(self._size) if self._corpus[r] != fingerprint]
+                if stale:
+                    logger.info(
+                        "Semantic cache: corpus changed, dropping %d entries",
+                        len(stale),
+                    )
+                    self._delete_rows(stale)
 
-            dot_products = np.dot(cache_embeddings, query_embedding)
-            similarities = dot_products / (norm_cache * norm_query)
+    def _purge_expired(self) -> None:
+        if self.ttl_sec <= 0 or not self._size:
+            return
+        cutoff = time.time() - self.ttl_sec
+        expired = np.nonzero(self._stats[: self._size, _CREATED] < cutoff)[0]
+        if len(expired):
+            self._delete_rows(expired)
 
-            # Find best match
-            best_idx = np.argmax(similarities)
-            best_score = similarities[best_idx]
+    def _enforce_max_entries(self, incoming: int) -> None:
+        """Evict until ``incoming`` new entries fit under max_entries."""
+        if self.max_entries <= 0:
+            return
+        excess = self._size + incoming - self.max_entries
+        if excess <= 0:
+            return
+        stats = self._stats[: self._size]
+        if self.eviction == "lfu":
+            # least hits first, least recently used among equals
+            order = np.lexsort((stats[:, _LAST_USED], stats[:, _HITS]))
+        else:
+            order = np.argsort(stats[:, _LAST_USED], kind="stable")
+        self._delete_rows(order[:excess])
+        self.evictions += int(excess)
 
-            if best_score >= self.threshold:
-                return self.answers[best_idx]
+    # ─── Log ───
 
-        except Exception as e:
-            logger.error("Error in semantic cache get: %s", e)
-            return None
+    @contextmanager
+    def _locked(self):
+        """Thread lock + flock on <cache>.lock for log writes.
 
-        return None
+        On the outermost entry the in-memory state is first caught up with
+        the log (records appended by other processes, or a compaction).
+        """
+        with self._lock:
+            outer = self._flock_depth == 0
+            if outer:
+                self._acquire_file_lock()
+            self._flock_depth += 1
+            try:
+                if outer:
+                    self._catch_up()
+                yield
+            finally:
+                self._flock_depth -= 1
+                if outer:
+                    self._release_file_lock()
+
+    def _acquire_file_lock(self) -> None:
+        if fcntl is None:
+            return
+        try:
+            if self._lock_file is None:
+                os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+                self._lock_file = open(f"{self.cache_file}.lock", "a+b")
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        except OSError as e:
+            logger.warning("Semantic cache: file lock unavailable: %s", e)
+
+    def _release_file_lock(self) -> None:
+        if fcntl is not None and self._lock_file is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _catch_up(self) -> None:
+        """Replay records other processes appended; reload if the log was replaced."""
+        try:
+            st = os.stat(self.cache_file)
+        except FileNotFoundError:
+            if self._log_ino is not None:
+                logger.info("Semantic cache: log %s removed, clearing", self.cache_file)
+                self._reset()
+            return
+        except OSError as e:
+            logger.error("Failed to stat cache log: %s", e)
+            return
+        if st.st_ino == self._log_ino and st.st_size == self._log_pos:
+            return
+        if st.st_ino != self._log_ino or st.st_size < self._log_pos:
+            if self._log_ino is not None:
+                logger.info(
+                    "Semantic cache: log replaced by another process, reloading"
+                )
+            self._reset()
+            self._load()
+            return
+        try:
+            with open(self.cache_file, "rb") as f:
+                f.seek(self._log_pos)
+                data = f.read()
+        except OSError as e:
+            logger.error("Failed to read cache log: %s", e)
+            return
+        size = self._size
+        end, records = self._replay_records(data, 0)
+        self._log_pos += end
+        self._dead += records - (self._size - size)
+
+    def _reset(self) -> None:
+        """Forget the in-memory state (the log is re-read by _load)."""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        self._matrix = None
+        self._stats = np.zeros((_INITIAL_CAPACITY, 3), np.float64)
+        self._size = 0
+        for seq in (self._queries, self._answers, self._entry_ids, self._corpus):
+            seq.clear()
+        self._row_of.clear()
+        self._row_of_id.clear()
+        self._dead = 0
+        self._log_ino = None
+        self._log_pos = 0
+        self._ann = None
+        self._ann_dirty = False
+
+    def _replay_records(self, data: bytes, pos: int) -> tuple[int, int]:
+        """Apply complete records from ``data[pos:]``; (end offset, record count)."""
+        records = 0
+        while pos + _RECORD.size <= len(data):
+            op, entry_id, length = _RECORD.unpack_from(data, pos)
+            body_start = pos + _RECORD.size
+            if body_start + length > len(data):
+                break  # torn tail from an interrupted write
+            body = data[body_start : body_start + length]
+            pos = body_start + length
+            records += 1
+            self._next_id = max(self._next_id, entry_id + 1)
+            if op == _OP_ADD:
+                self._replay_add(entry_id, body)
+            elif op == _OP_DEL:
+                self._replay_del(entry_id)
+        return pos, records
+
+    def _load(self):
+        try:
+            with open(self.cache_file, "rb") as f:
+                ino = os.fstat(f.fileno()).st_ino
+                data = f.read()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.error("Failed to load cache: %s", e)
+            return
+        if not data.startswith(_LOG_MAGIC):
+            logger.error("Failed to load cache: unknown format in %s", self.cache_file)
+            self._log_ino, self._log_pos = ino, len(data)
+            return
 
-    def add(self, query: str, answer: str) -> None:
-        if not self.model:
+        good_end, records = self._replay_records(data, len(_LOG_MAGIC))
+        if good_end < len(data):
+            # only a crashed writer leaves a torn tail: writes hold the file lock
+            logger.warning("Semantic cache log truncated at byte %d", good_end)
+            with open(self.cache_file, "r+b") as f:
+                f.truncate(good_end)
+        self._dead = records - self._size
+        self._log_ino = ino
+        self._log_pos = good_end
+
+    def _replay_add(self, entry_id: int, body: bytes) -> None:
+        (meta_len,) = _META_LEN.unpack_from(body)
+        meta = json.loads(body[_META_LEN.size : _META_LEN.size + meta_len])
+        vec = np.frombuffer(body, np.float32, offset=_META_LEN.size + meta_len)
+        query = meta["query"]
+        if meta.get("model") != self.model_name:
             return
+        if query in self._row_of:
+            self._remove_row(self._row_of[query])
+        self._append_row(
+            entry_id,
+            query,
+            meta["answer"],
+            vec,
+            float(meta.get("created", time.time())),
+            meta.get("corpus"),
+        )
+
+    def _replay_del(self, entry_id: int) -> None:
+        row = self._row_of_id.get(entry_id)
+        if row is not None:
+            self._remove_row(row)
 
-        # Check if already exists (exact match)
-        if query in self.sentences:
+    def _migrate_legacy_json(self) -> None:
+        """One-time import of the old indent=2 JSON cache (sentences/embeddings/answers)."""
+        legacy = os.path.splitext(self.cache_file)[0] + ".json"
+        if legacy == self.cache_file or not os.path.exists(legacy):
             return
+        try:
+            with open(legacy, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            rows = zip(
+                data.get("sentences", []),
+                data.get("embeddings", []),
+                data.get("answers", []),
+            )
+            now = time.time()
+            for query, embedding, answer in rows:
+                vec = np.asarray(embedding, dtype=np.float32)
+                norm = float(np.linalg.norm(vec))
+                if norm == 0.0 or query in self._row_of:
+                    continue
+                # legacy entries carry no corpus stamp: the first fingerprint
+                # check treats them as stale
+                self._append_row(self._next_id, query, answer, vec / norm, now, None)
+                self._next_id += 1
+            self.compact()
+            os.remove(legacy)
+            logger.info(
+                "Semantic cache migrated from %s (%d entries)", legacy, self._size
+            )
+        except Exception as e:
+            logger.error("Failed to migrate legacy cache %s: %s", legacy, e)
+
+    def _encode_add(self, row: int) -> bytes:
+        meta = json.dumps(
+            {
+                "query": self._queries[row],
+                "answer": self._answers[row],
+                "model": self.model_name,
+                "created": float(self._stats[row, _CREATED]),
+                "corpus": self._corpus[row],
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        body = _META_LEN.pack(len(meta)) + meta + self._matrix[row].tobytes()
+        return _RECORD.pack(_OP_ADD, self._entry_ids[row], len(body)) + body
+
+    def _append_record(self, record: bytes) -> None:
+        """Append under _locked(): the log's tail is then known to be ours."""
+        if self._log is None:
+            new = not os.path.exists(self.cache_file)
+            self._log = open(self.cache_file, "ab")
+            if new:
+                self._log.write(_LOG_MAGIC)
+                self._log_pos = len(_LOG_MAGIC)
+            self._log_ino = os.fstat(self._log.fileno()).st_ino
+        self._log.write(record)
+        self._log.flush()
+        self._log_pos += len(record)
+
+    def _compact_if_needed(self) -> None:
+        if self._dead > max(_COMPACT_MIN_DEAD, self._size):
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrite the log with live entries only (atomic replace).
+
+        Other processes notice the new inode on their next write and reload.
+        """
+        with self._locked():
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            tmp = f"{self.cache_file}.tmp-{os.getpid()}"
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(_LOG_MAGIC)
+                    for row in range(self._size):
+                        f.write(self._encode_add(row))
+                os.replace(tmp, self.cache_file)
+                st = os.stat(self.cache_file)
+                self._log_ino, self._log_pos = st.st_ino, st.st_size
+                self._dead = 0
+            except Exception as e:
+                logger.error("Failed to compact cache: %s", e)
+            if self._ann is not None and self._ann.deleted > len(self._ann):
+                # hnswlib only marks deletions: reclaim the slots with a rebuild
+                self._ann = self._build_ann()
+            self._save_ann()
+
+    def save(self):
+        """Persist a compacted snapshot of the cache (inserts are already durable)."""
+        self.compact()
+
+    def close(self) -> None:
+        with self._locked():
+            self._save_ann()
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    # ─── Public API ───
+
+    def _touch(self, row: int, now: float) -> Any:
+        self._stats[row, _LAST_USED] = now
+        self._stats[row, _HITS] += 1
+        return self._answers[row]
+
+    def _is_expired(self, row: int, now: float) -> bool:
+        return self.ttl_sec > 0 and self._stats[row, _CREATED] < now - self.ttl_sec
+
+    def get(self, query: str) -> Optional[Any]:
+        if not self._size or not self._encoder:
+            return None
 
         try:
-            embedding = self.model.encode(query)
+            self._maybe_refresh_corpus()
+            with self._lock:
+                # exact-match fast path: no embedding call
+                row = self._row_of.get(query)
+                now = time.time()
+                if row is not None and not self._is_expired(row, now):
+                    return self._touch(row, now)
+
+            query_vec = self._encode(query)
+            if query_vec is None:
+                return None
+            with self._lock:
+                if not self._size or query_vec.shape[0] != self._matrix.shape[1]:
+                    return None
+                rows = self._candidate_rows(query_vec)
+                if rows is None:
+                    # rows are unit vectors: one matvec gives all cosine similarities
+                    similarities = self._matrix[: self._size] @ query_vec
+                    created = self._stats[: self._size, _CREATED]
+                elif len(rows):
+                    similarities = self._matrix[rows] @ query_vec
+                    created = self._stats[rows, _CREATED]
+                else:
+                    return None
+                now = time.time()
+                if self.ttl_sec > 0:
+                    similarities[created < now - self.ttl_sec] = -np.inf
+                best_idx = int(np.argmax(similarities))
+                if similarities[best_idx] >= self.threshold:
+                    row = best_idx if rows is None else int(rows[best_idx])
+                    return self._touch(row, now)
+        except Exception as e:
+            logger.error("Error in semantic cache get: %s", e)
+            return None
 
-            # Ensure embedding is a list
-            if isinstance(embedding, np.ndarray):
-                embedding = embedding.tolist()
+        return None
 
-            self.sentences.append(query)
-            self.embeddings.append(embedding)
-            self.answers.append(answer)
+    def add(self, query: str, answer: Any) -> None:
+        if not self._encoder:
+            return
 
-            self.save()
+        try:
+            vec = self._encode(query)
+            if vec is None:
+                return
+            self._maybe_refresh_corpus()
+            with self._locked():
+                # stale/expired duplicates are dropped first and then replaced
+                self._purge_expired()
+                # Check if already exists (exact match)
+                if query in self._row_of:
+                    return
+                self._enforce_max_entries(1)
+                if not self._append_row(
+                    self._next_id, query, answer, vec, time.time(), self._active_corpus
+                ):
+                    logger.error("Semantic cache: embedding dimension mismatch")
+                    return
+                self._next_id += 1
+                self._append_record(self._encode_add(self._size - 1))
+                self._compact_if_needed()
+                self._sync_ann()
         except Exception as e:
             logger.error("Error adding to semantic cache: %s", e)
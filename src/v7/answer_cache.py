@@ -0,0 +1,180 @@
+"""V7 answer cache — SemanticCache in front of the compiled graph.
+
+CachedGraph wraps a compiled v7 graph and exposes the same invoke / ainvoke /
+astream surface. A request is answered from cache when its normalized query
+matches a stored one exactly (no embedding call) or by cosine similarity of
+query embeddings above ANSWER_CACHE_THRESHOLD. Only synthesised answers are
+stored — clarify and abstain results, and degraded answers (raw passages after
+an LLM failure, see generate_answer.FallbackAnswer), always go through the graph.
+
+Entries are stamped with the Chroma collection fingerprint, so a re-index
+invalidates them (see SemanticCache).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Any, AsyncIterator, Optional
+
+from src.chroma_helpers import vector_store_fingerprint
+from src.embedding_cache import embedding_identity, normalize_query
+from src.semantic_cache import SemanticCache
+from src.v7.config import v7_config
+
+logger = logging.getLogger(__name__)
+
+CACHE_NODE = "answer_cache"
+CACHE_STATUS = "Ответ найден в кэше"
+
+
+def _cache_key(state: dict) -> Optional[str]:
+    """Normalized query, or None when the request is not cacheable (filters etc.)."""
+    if set(state) != {"query"} or not isinstance(state["query"], str):
+        return None
+    return normalize_query(state["query"]) or None
+
+
+def _cacheable_payload(result: dict) -> Optional[dict]:
+    if result.get("clarify_message") or result.get("abstain_reason"):
+        return None
+    if not result.get("answer") or result.get("answer_degraded"):
+        return None
+    return {
+        "answer": result["answer"],
+        "final_passages": [
+            {
+                "text": p.get("text", ""),
+                "metadata": dict(p.get("metadata") or {}),
+                "score": float(p.get("score", 0.0)),
+            }
+            for p in result.get("final_passages") or []
+        ],
+        "final_score": float(result.get("final_score", 0.0) or 0.0),
+    }
+
+
+class CachedGraph:
+    """Compiled v7 graph behind a semantic answer cache."""
+
+    def __init__(self, graph, cache: SemanticCache) -> None:
+        self.graph = graph
+        self.cache = cache
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.graph, name)
+
+    # ─── Cache ───
+
+    def lookup(self, state: dict) -> Optional[dict]:
+        """Final state from cache, or None on a miss."""
+        key = _cache_key(state)
+        if key is None:
+            return None
+        payload = self.cache.get(key)
+        if not isinstance(payload, dict):
+            return None
+        logger.info("answer_cache: hit for %r", key[:80])
+        return {
+            **state,
+            **payload,
+            "answer_cache_hit": True,
+            "status_message": CACHE_STATUS,
+        }
+
+    def store(self, state: dict, result: dict) -> None:
+        key = _cache_key(state)
+        payload = _cacheable_payload(result) if key else None
+        if payload is not None:
+            self.cache.add(key, payload)
+
+    # ─── Graph surface ───
+
+    def invoke(self, state: dict, *args, **kwargs) -> dict:
+        hit = self.lookup(state)
+        if hit is not None:
+            return hit
+        result = self.graph.invoke(state, *args, **kwargs)
+        self.store(state, result)
+        return result
+
+    async def ainvoke(self, state: dict, *args, **kwargs) -> dict:
+        hit = await asyncio.to_thread(self.lookup, state)
+        if hit is not None:
+            return hit
+        result = await self.graph.ainvoke(state, *args, **kwargs)
+        await asyncio.to_thread(self.store, state, result)
+        return result
+
+    async def astream(
+        self, state: dict, *args, stream_mode="values", **kwargs
+    ) -> AsyncIterator[Any]:
+        """astream графа; на попадании — одна синтетическая нода answer_cache.
+
+        Для сохранения нужен финальный state, поэтому "values" запрашивается
+        у графа всегда, а наружу отдаются только режимы, которые просил caller.
+        """
+        modes = [stream_mode] if isinstance(stream_mode, str) else list(stream_mode)
+        as_tuples = not isinstance(stream_mode, str)
+
+        def _emit(mode: str, chunk: Any) -> Any:
+            return (mode, chunk) if as_tuples else chunk
+
+        hit = await asyncio.to_thread(self.lookup, state)
+        if hit is not None:
+            update = {
+                "status_message": CACHE_STATUS,
+                "final_passages": hit["final_passages"],
+                "answer": hit["answer"],
+            }
+            if "updates" in modes:
+                yield _emit("updates", {CACHE_NODE: update})
+            if "values" in modes:
+                yield _emit("values", hit)
+            return
+
+        inner_modes = modes if "values" in modes else [*modes, "values"]
+        final: Optional[dict] = None
+        stream = self.graph.astream(state, *args, stream_mode=inner_modes, **kwargs)
+        try:
+            async for mode, chunk in stream:
+                if mode == "values":
+                    final = chunk
+                if mode in modes:
+                    yield _emit(mode, chunk)
+        finally:
+            await stream.aclose()
+        # сюда доходим только при штатном завершении графа
+        if final is not None:
+            await asyncio.to_thread(self.store, state, final)
+
+
+def make_answer_cache(vector_store) -> Optional[SemanticCache]:
+    """SemanticCache on the pipeline's query embeddings (None = disabled)."""
+    path = v7_config.ANSWER_CACHE_PATH
+    if not path:
+        return None
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    embeddings = vector_store.embeddings
+    provider, model = embedding_identity(embeddings)
+    return SemanticCache(
+        threshold=v7_config.ANSWER_CACHE_THRESHOLD,
+        model_name=f"{provider}:{model}",
+        cache_file=path,
+        corpus_fingerprint=lambda: vector_store_fingerprint(vector_store),
+        encoder=embeddings.embed_query,
+    )
+
+
+def with_answer_cache(graph, vector_store):
+    """Wrap a compiled graph with the answer cache; the bare graph if disabled."""
+    try:
+        cache = make_answer_cache(vector_store)
+    except Exception as exc:
+        logger.warning("answer_cache: disabled (%s)", exc)
+        return graph
+    if cache is None:
+        return graph
+    logger.info("answer_cache: %d cached answers loaded", len(cache))
+    return CachedGraph(graph, cache)
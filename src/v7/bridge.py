@@ -2,7 +2,8 @@
 
 Responsibilities:
 1. Wrap ChromaDB's similarity_search_with_score -> v7 dict format
-2. Build BM25 corpus from ChromaDB docs
+   (plus a batched multi-query variant for V8 multi-query expand)
+2. Build BM25 corpus from ChromaDB docs (snapshot-cached postings)
 3. Inject search functions into rag_simple / rag_complex nodes
 4. Inject FlashRank reranker into rag_complex
 5. Inject LLM-backed verify, rewrite, and generate functions
@@ -17,18 +18,25 @@ from typing import Callable, List
 from langchain_core.messages import HumanMessage
 from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 
+from src.chroma_helpers import collection_fingerprint
+from src.embedding_cache import embed_queries
 from src.llm_factory import get_gemini_llm
+from src.parent_store import ParentStore, expand_to_parents, get_parent_store
 from src.parsers import extract_text, parse_json_from_response
-from src.v7.nlp_core import init_bm25_index
+from src.v7.config import v7_config
+from src.v7.hard_gates import validate_filters
+from src.v7.nlp_core import BM25_SNAPSHOT_VERSION, init_bm25_index
 from src.v7.nodes import generate_answer as generate_answer_mod
 from src.v7.nodes import llm_verifier as llm_verifier_mod
 from src.v7.nodes import rag_complex as rag_complex_mod
 from src.v7.nodes import rag_simple as rag_simple_mod
 from src.v7.nodes import rewriter as rewriter_mod
 from src.v7.nodes import visual_enrichment as visual_enrichment_mod
+from src.v7.nodes.generate_answer import FallbackAnswer
 from src.v7.nodes.llm_verifier import VERIFIER_SYSTEM_PROMPT
 from src.v7.nodes.utils import extract_doc_identifiers
 from src.v7.state_types import VerificationResult
+from src.v7.vector_mirror import load_vector_mirror
 
 logger = logging.getLogger(__name__)
 
@@ -62,42 +70,111 @@ def make_rerank_fn(
 
     Signature: fn(query, passages, top_k) -> passages (reranked, top_k items).
     Passages must have 'text' key; score is updated with FlashRank score.
+    The ranker comes from the process-wide registry (src.reranker), so the
+    model is loaded once and shared with /query/gosts.
     """
-    from flashrank import Ranker, RerankRequest
+    from src.reranker import get_ranker, rank
 
-    ranker = Ranker(model_name=model_name, cache_dir=cache_dir)
+    get_ranker(model_name, cache_dir)  # load now: fail at init, not per query
 
     def _rerank(query: str, passages: List[dict], top_k: int) -> List[dict]:
         if not passages:
             return passages
-        rerank_request = RerankRequest(
-            query=query,
-            passages=[
-                {"id": i, "text": p.get("text", "")} for i, p in enumerate(passages)
-            ],
+        ranked = rank(
+            query,
+            [p.get("text", "") for p in passages],
+            top_k,
+            model_name=model_name,
+            cache_dir=cache_dir,
         )
-        results = ranker.rerank(rerank_request)
-        # results: list of dicts with 'id', 'score', 'text'
-        reranked = []
-        for r in results[:top_k]:
-            orig = passages[r["id"]]
-            reranked.append(
-                {
-                    **orig,
-                    "vector_score": orig.get("score", 0.0),
-                    "score": round(float(r["score"]), 4),
-                }
-            )
-        return reranked
+        return [
+            {
+                **passages[i],
+                "vector_score": passages[i].get("score", 0.0),
+                "score": round(float(score), 4),
+            }
+            for i, score in ranked
+        ]
 
     return _rerank
 
 
-def make_vector_search_fn(vector_store) -> Callable[..., List[dict]]:
+_WHERE_SCALARS = (str, int, float, bool)
+
+# filters_to_where: фильтр, который не пропускает ни одного чанка (пустой список
+# значений) — поиск сразу возвращает [], как BM25 bitmaps и VectorMirror
+MATCH_NOTHING = object()
+
+
+def _in_clause(key: str, values: list) -> dict:
+    """``$in`` per value type: Chroma rejects empty and mixed-type operand lists."""
+    groups: dict[type, list] = {}
+    for v in values:
+        groups.setdefault(type(v), []).append(v)
+    clauses = [
+        {key: {"$in": sorted(set(group), key=str)}}
+        for _, group in sorted(groups.items(), key=lambda item: item[0].__name__)
+    ]
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def filters_to_where(filters: dict | None):
+    """Translate v7 filters into a Chroma ``where`` clause.
+
+    Keys go through the ALLOWED_FILTER_KEYS whitelist (validate_filters);
+    a scalar value becomes ``$eq``, a list/tuple/set ``$in`` (split into
+    ``$or`` by value type), None means "no filter". Several keys are combined
+    with ``$and``. An empty list matches nothing: MATCH_NOTHING is returned
+    and the caller skips the query. Same semantics as BM25Index filter bitmaps.
+    """
+    clauses = []
+    for key, value in sorted((validate_filters(filters) or {}).items()):
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            values = [v for v in value if isinstance(v, _WHERE_SCALARS)]
+            if not values:
+                return MATCH_NOTHING
+            clauses.append(_in_clause(key, values))
+        elif isinstance(value, _WHERE_SCALARS):
+            clauses.append({key: {"$eq": value}})
+        else:
+            logger.warning("filters_to_where: unsupported value for %r dropped", key)
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _distance_to_passage(
+    text: str, metadata: dict | None, distance: float, chunk_id: str | None = None
+) -> dict:
+    # ChromaDB returns L2 distance (0..inf). Convert to similarity (0..1).
+    similarity = 1.0 / (1.0 + distance)
+    passage = {
+        "text": text,
+        "metadata": dict(metadata or {}),
+        "score": round(similarity, 4),
+    }
+    if chunk_id:
+        # Chroma id — stable identity for RRF fusion (nlp_core.passage_key)
+        passage["id"] = chunk_id
+    return passage
+
+
+def _mirror_hits_to_passages(hits) -> List[dict]:
+    return [
+        _distance_to_passage(text, meta, distance, chunk_id)
+        for chunk_id, text, meta, distance in hits
+    ]
+
+
+def make_vector_search_fn(vector_store, mirror=None) -> Callable[..., List[dict]]:
     """Create a v7-compatible vector search function from ChromaDB store.
 
     v7 interface: fn(query, filters=None, top_k=12, **kwargs) -> list[dict]
-    Each dict has: text, metadata, score.
+    Each dict has: text, metadata, score. Filters are pushed down into Chroma
+    as a ``where`` clause (filters_to_where). With a VectorMirror the search
+    runs in-process; Chroma is the fallback if the mirror fails.
     """
 
     def _search(
@@ -106,21 +183,94 @@ def make_vector_search_fn(vector_store) -> Callable[..., List[dict]]:
         top_k: int = 12,
         **kwargs,
     ) -> List[dict]:
-        docs_and_scores = vector_store.similarity_search_with_score(query, k=top_k)
+        where = filters_to_where(filters)
+        if where is MATCH_NOTHING:
+            return []
+        if mirror is not None:
+            try:
+                vector = vector_store.embeddings.embed_query(query)
+                (hits,) = mirror.query([vector], top_k, validate_filters(filters))
+                return _mirror_hits_to_passages(hits)
+            except Exception as exc:
+                logger.warning("vector mirror search failed, using Chroma: %s", exc)
+        if where is None:
+            docs_and_scores = vector_store.similarity_search_with_score(query, k=top_k)
+        else:
+            docs_and_scores = vector_store.similarity_search_with_score(
+                query, k=top_k, filter=where
+            )
+        return [
+            _distance_to_passage(
+                doc.page_content, doc.metadata, distance, getattr(doc, "id", None)
+            )
+            for doc, distance in docs_and_scores
+        ]
+
+    return _search
+
+
+def make_batch_vector_search_fn(
+    vector_store, mirror=None
+) -> Callable[..., List[List[dict]]]:
+    """Create a multi-query vector search for V8 multi-query expand.
+
+    Signature: fn(queries, filters=None, top_k=12) -> one result list per query.
+    All queries are embedded in a single call (cached queries are skipped) and
+    sent to Chroma as one collection.query(query_embeddings=[...]) round-trip.
+    Assumes embed_documents and embed_query produce the same vectors (true
+    for the OpenAI, hf_api and local providers in llm_factory). Filters are
+    pushed down as a Chroma ``where`` clause; with a VectorMirror all queries
+    are one in-process matmul.
+    """
+
+    def _batch_search(
+        queries: List[str],
+        filters: dict | None = None,
+        top_k: int = 12,
+        **kwargs,
+    ) -> List[List[dict]]:
+        if not queries:
+            return []
+        where = filters_to_where(filters)
+        if where is MATCH_NOTHING:
+            return [[] for _ in queries]
+        embeddings = embed_queries(vector_store.embeddings, list(queries))
+        if mirror is not None:
+            try:
+                return [
+                    _mirror_hits_to_passages(hits)
+                    for hits in mirror.query(
+                        embeddings, top_k, validate_filters(filters)
+                    )
+                ]
+            except Exception as exc:
+                logger.warning("vector mirror search failed, using Chroma: %s", exc)
+        query_kwargs = {}
+        if where is not None:
+            query_kwargs["where"] = where
+        raw = vector_store._collection.query(
+            query_embeddings=embeddings,
+            n_results=top_k,
+            include=["documents", "metadatas", "distances"],
+            **query_kwargs,
+        )
+        all_ids = raw.get("ids") or [[] for _ in raw["documents"]]
         results = []
-        for doc, distance in docs_and_scores:
-            # ChromaDB returns L2 distance (0..inf). Convert to similarity (0..1).
-            similarity = 1.0 / (1.0 + distance)
+        for docs, metas, distances, ids in zip(
+            raw["documents"], raw["metadatas"], raw["distances"], all_ids
+        ):
+            ids = ids or [None] * len(docs)
             results.append(
-                {
-                    "text": doc.page_content,
-                    "metadata": dict(doc.metadata),
-                    "score": round(similarity, 4),
-                }
+                [
+                    _distance_to_passage(doc, meta, distance, chunk_id)
+                    for doc, meta, distance, chunk_id in zip(
+                        docs, metas, distances, ids
+                    )
+                ]
             )
         return results
 
-    return _search
+    return _batch_search
 
 
 def make_section_fetch_fn(
@@ -155,14 +305,18 @@ def make_section_fetch_fn(
                 limit=max_section_chunks,
             )
             extra = []
-            for doc, meta in zip(results["documents"], results["metadatas"]):
-                extra.append(
-                    {
-                        "text": doc,
-                        "metadata": dict(meta),
-                        "score": 0.0,  # no vector score for fetched chunks
-                    }
-                )
+            ids = results.get("ids") or [None] * len(results["documents"])
+            for doc, meta, chunk_id in zip(
+                results["documents"], results["metadatas"], ids
+            ):
+                passage = {
+                    "text": doc,
+                    "metadata": dict(meta),
+                    "score": 0.0,  # no vector score for fetched chunks
+                }
+                if chunk_id:
+                    passage["id"] = chunk_id
+                extra.append(passage)
             return extra
         except Exception as exc:
             logger.warning("section_fetch failed: %s", exc)
@@ -331,11 +485,15 @@ def _is_retryable(exc: BaseException) -> bool:
     )
 
 
-def make_generate_fn(llm) -> Callable[[str, str, List[dict]], str]:
+def make_generate_fn(
+    llm, parent_store: ParentStore | None = None
+) -> Callable[[str, str, List[dict]], str]:
     """Create an LLM-backed answer generation function for v7 generate_answer node.
 
     Signature: fn(query, active_query, passages) -> answer_text.
     Retries up to 3 times on Gemini 503/rate-limit before falling back to stub.
+    With parent_store, child passages carrying parent_id are resolved to their
+    parent text in one batched lookup before the prompt is built.
     """
 
     @retry(
@@ -371,7 +529,7 @@ def make_generate_fn(llm) -> Callable[[str, str, List[dict]], str]:
             return ""
         # final_passages is already capped at 24 upstream (merge_all_passages);
         # re-truncating below that drops answer-bearing passages that ranked low.
-        top_passages = passages[:24]
+        top_passages = expand_to_parents(passages[:24], parent_store)
         passages_text = "\n\n".join(
             f"[{i + 1}] ({_score_label(p.get('score', 0.0))}) [Источник: {_short_source(p)}]\n{p.get('text', '')}"
             for i, p in enumerate(top_passages)
@@ -389,15 +547,46 @@ def make_generate_fn(llm) -> Callable[[str, str, List[dict]], str]:
             logger.warning(
                 "LLM generate failed after retries: %s, falling back to stub", exc
             )
-            return "\n\n".join(p.get("text", "") for p in passages[:10])
+            return FallbackAnswer(
+                "\n\n".join(p.get("text", "") for p in top_passages[:10])
+            )
 
     return _generate
 
 
+def init_bm25_from_chroma(vector_store) -> None:
+    """Build the BM25 index from the full ChromaDB corpus.
+
+    Lemmatized postings are reused from the on-disk snapshot while the
+    collection fingerprint is unchanged; otherwise the snapshot is rebuilt.
+    index.py calls this after an incremental sync so the API starts warm.
+    """
+    all_data = vector_store.get(include=["metadatas", "documents"])
+    ids = all_data.get("ids")
+    corpus = [
+        {"text": doc, "metadata": meta}
+        for doc, meta in zip(all_data["documents"], all_data["metadatas"])
+    ]
+    if ids and len(ids) == len(corpus):
+        # Chroma id — тот же ключ, что у vector-результатов, для слияния в RRF
+        for passage, chunk_id in zip(corpus, ids):
+            passage["id"] = chunk_id
+    fingerprint = (
+        f"{collection_fingerprint(ids)}:{BM25_SNAPSHOT_VERSION}"
+        if ids and len(ids) == len(corpus)
+        else None
+    )
+    init_bm25_index(
+        corpus,
+        snapshot_dir=v7_config.bm25_snapshot_dir() or None,
+        fingerprint=fingerprint,
+    )
+
+
 def init_v7_from_chroma(vector_store, llm_provider: str | None = "gemini") -> None:
     """Initialize v7 pipeline from existing ChromaDB vector store.
 
-    1. Creates vector search wrapper
+    1. Creates vector search wrapper (in-process VectorMirror if V7_VECTOR_MIRROR)
     2. Injects it into rag_simple and rag_complex nodes
     3. Builds BM25 index from full corpus
     4. Injects FlashRank reranker into rag_complex
@@ -405,17 +594,15 @@ def init_v7_from_chroma(vector_store, llm_provider: str | None = "gemini") -> No
     """
     from config.settings import settings
 
-    search_fn = make_vector_search_fn(vector_store)
+    mirror = load_vector_mirror(vector_store)
+    search_fn = make_vector_search_fn(vector_store, mirror)
     rag_simple_mod.set_vector_search(search_fn)
     rag_complex_mod.set_vector_search(search_fn)
+    rag_simple_mod.set_batch_vector_search(
+        make_batch_vector_search_fn(vector_store, mirror)
+    )
 
-    # Build BM25 corpus from ChromaDB
-    all_data = vector_store.get(include=["metadatas", "documents"])
-    corpus = [
-        {"text": doc, "metadata": meta}
-        for doc, meta in zip(all_data["documents"], all_data["metadatas"])
-    ]
-    init_bm25_index(corpus)
+    init_bm25_from_chroma(vector_store)
 
     # Inject section-aware expander for complex path
     try:
@@ -452,7 +639,9 @@ def init_v7_from_chroma(vector_store, llm_provider: str | None = "gemini") -> No
             rewriter_mod.set_rewrite_fn(make_rewrite_fn(rewriter_llm))
 
             generator_llm = get_gemini_llm(thinking_budget=4096)
-            generate_answer_mod.set_generate_fn(make_generate_fn(generator_llm))
+            generate_answer_mod.set_generate_fn(
+                make_generate_fn(generator_llm, parent_store=get_parent_store())
+            )
 
             expander_llm = get_gemini_llm(thinking_budget=0)
             rag_simple_mod.set_expand_fn(make_expand_fn(expander_llm))
@@ -7,8 +7,12 @@ Env vars use V7_ prefix (e.g. V7_HARD_GATE_THRESHOLD=0.80).
 
 from __future__ import annotations
 
+import os
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from config.settings import settings
+
 
 class V7Config(BaseSettings):
     model_config = SettingsConfigDict(
@@ -45,9 +49,20 @@ class V7Config(BaseSettings):
 
     # ── Retrieval engine ──────────────────────────────────────────────────
     RRF_K: int = 60
+    RRF_VECTOR_WEIGHT: float = 1.0  # вклад каждого vector-списка в RRF
+    RRF_BM25_WEIGHT: float = 1.0  # вклад каждого BM25-списка в RRF
     MMR_LAMBDA: float = 0.7
     BM25_TOP_K: int = 20
     SEMANTIC_TOP_K: int = 20
+    RETRIEVAL_MAX_WORKERS: int = 8  # thread pool for parallel vector/BM25 fan-out
+    LEMMA_CACHE_SIZE: int = 100_000  # LRU word→lemma (pymorphy3) entries
+    KEYWORD_CACHE_SIZE: int = 50_000  # LRU text→keyword set (chunks + queries)
+    # On-disk BM25 postings (mmap), keyed by collection fingerprint; "" = disabled.
+    # Relative path — inside CHROMA_DB_PATH (see bm25_snapshot_dir)
+    BM25_SNAPSHOT_DIR: str = "bm25_snapshot"
+    # In-process копия коллекции для dense retrieval (vector_mirror.py)
+    VECTOR_MIRROR: bool = False
+    VECTOR_MIRROR_CHECK_SEC: float = 60.0  # как часто сверять fingerprint коллекции
 
     # ── Keyword overlap (dual) ────────────────────────────────────────────
     MIN_KEYWORD_OVERLAP_ORIGINAL: float = 0.10  # drift detection, even looser
@@ -78,8 +93,26 @@ class V7Config(BaseSettings):
     V8_ENABLE_MULTI_QUERY: bool = False
     V8_EXPAND_N: int = 3  # number of query reformulations to generate
 
+    # ── Answer cache (semantic cache in front of the compiled graph) ──────
+    # Binary log of cached final answers + passages; "" = disabled.
+    # Shared by all uvicorn workers: writes are flock-serialized (SemanticCache)
+    ANSWER_CACHE_PATH: str = ".answer_cache/v7.bin"
+    # Cosine similarity of query embeddings to reuse an answer. Conservative:
+    # a paraphrase hit must not return an answer to a different question.
+    ANSWER_CACHE_THRESHOLD: float = 0.95
+
     # ── Domain Gate ───────────────────────────────────────────────────────
     DOMAIN_GATE_THRESHOLD: float = 0.0  # cosine similarity floor; 0.0 = disabled
 
+    def bm25_snapshot_dir(self) -> str:
+        """BM25_SNAPSHOT_DIR, relative paths anchored at CHROMA_DB_PATH ("" = off).
+
+        Снапшот живёт рядом с коллекцией, от которой он построен, а не в cwd
+        процесса: index.py и API, запущенные из разных каталогов, видят один.
+        """
+        if not self.BM25_SNAPSHOT_DIR:
+            return ""
+        return os.path.join(settings.CHROMA_DB_PATH, self.BM25_SNAPSHOT_DIR)
+
 
 v7_config = V7Config()
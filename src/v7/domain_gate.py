@@ -1,26 +1,106 @@
-"""Domain gate: corpus-centroid cosine similarity filter."""
+"""Domain gate: corpus-centroid cosine similarity filter.
+
+Индексатор хранит рядом с Chroma running-сумму эмбеддингов и их число
+(CENTROID_STATE_FILE) и обновляет её на дельту добавленных/удалённых
+чанков — тогда старт не вычитывает все эмбеддинги коллекции.
+"""
 
 from __future__ import annotations
 
-import numpy as np
+import os
 from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple
 
+import numpy as np
+
+from config.settings import settings
 from src.vector_store import load_vector_store
 from utils.logging import logger
 
+CENTROID_STATE_FILE = "domain_centroid.npz"
+
+
+def _centroid_state_path() -> Path:
+    return Path(settings.CHROMA_DB_PATH) / CENTROID_STATE_FILE
+
+
+def load_centroid_state() -> Optional[Tuple[np.ndarray, int]]:
+    """(sum of embeddings, count) из CENTROID_STATE_FILE или None."""
+    path = _centroid_state_path()
+    if not path.exists():
+        return None
+    try:
+        with np.load(path) as data:
+            return data["total"].astype(np.float64), int(data["count"])
+    except (OSError, KeyError, ValueError) as exc:
+        logger.warning(f"Domain gate: centroid state unreadable ({path}): {exc}")
+        return None
+
+
+def save_centroid_state(total: np.ndarray, count: int) -> None:
+    path = _centroid_state_path()
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez(tmp, total=np.asarray(total, dtype=np.float64), count=count)
+    os.replace(tmp, path)
+
+
+def embedding_sum(collection, ids: Optional[list] = None) -> Tuple[np.ndarray, int]:
+    """Сумма и число эмбеддингов (всех или чанков ``ids``) — для centroid state."""
+    kwargs = {"include": ["embeddings"]}
+    if ids is not None:
+        if not ids:
+            return np.zeros(0, dtype=np.float64), 0
+        kwargs["ids"] = list(ids)
+    embeddings = np.asarray(collection.get(**kwargs)["embeddings"], dtype=np.float64)
+    if embeddings.size == 0:
+        return np.zeros(0, dtype=np.float64), 0
+    return embeddings.sum(axis=0), len(embeddings)
+
+
+def update_centroid_state(
+    collection, delta_total: Optional[np.ndarray], delta_count: int
+) -> None:
+    """Применить дельту (added − removed) к сохранённому state.
+
+    Если state нет или он разошёлся с коллекцией — пересчитать с нуля.
+    Сбрасывает in-process кэш centroid.
+    """
+    count = collection.count()
+    state = load_centroid_state()
+    if state is not None and state[1] + delta_count == count:
+        total = state[0]
+        if delta_total is not None and delta_total.size:
+            total = total + delta_total if total.size else delta_total
+        logger.info(f"Domain gate: centroid state updated ({count} docs)")
+    else:
+        total, count = embedding_sum(collection)
+        logger.info(f"Domain gate: centroid state recomputed ({count} docs)")
+    save_centroid_state(total, count)
+    invalidate_corpus_centroid_cache()
+
 
 @lru_cache(maxsize=1)
 def get_corpus_centroid() -> np.ndarray:
-    """Compute mean embedding of all corpus documents. Cached per process."""
+    """Mean embedding of all corpus documents. Cached per process.
+
+    Берёт сохранённый индексатором state, если он соответствует коллекции,
+    иначе считает по всем эмбеддингам.
+    """
     vs = load_vector_store()
-    result = vs._collection.get(include=["embeddings"])
-    embeddings = np.array(result["embeddings"], dtype=np.float32)
-    centroid = embeddings.mean(axis=0)
+    state = load_centroid_state()
+    if state is not None and state[1] and state[1] == vs._collection.count():
+        total, count = state
+        source = "state"
+    else:
+        total, count = embedding_sum(vs._collection)
+        source = "collection"
+    centroid = (total / max(count, 1)).astype(np.float32)
     norm = np.linalg.norm(centroid)
     if norm > 0:
         centroid = centroid / norm
     logger.info(
-        f"Domain gate: centroid computed from {len(embeddings)} docs,"
+        f"Domain gate: centroid from {source}, {count} docs,"
         f" dim={centroid.shape[0]}"
     )
     return centroid
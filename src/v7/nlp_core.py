@@ -5,23 +5,36 @@ Lemmatization, BM25 index, RRF merge, MMR select.
 Libraries (per design 5.5 — no reinventing):
 - pymorphy3: morphological analysis / lemmatization
 - razdel: Russian tokenization
-- rank_bm25: BM25Okapi implementation
+- numpy: BM25Okapi scoring по CSR postings (формула rank_bm25, без цикла по корпусу)
 
 Source spec: docs/feature/migration-v7 (lines 350-779).
 """
 
 from __future__ import annotations
 
+import hashlib
+import json
+import logging
+import os
 import re
+import shutil
+import tempfile
+import threading
 from collections import Counter
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
 
+import numpy as np
 import pymorphy3
 from razdel import tokenize as razdel_tokenize
-from rank_bm25 import BM25Okapi
 
 from src.v7.config import v7_config
 
+logger = logging.getLogger(__name__)
+
 # ─── Singleton morph analyzer ──────────────────────────────────────────────
 
 _morph = pymorphy3.MorphAnalyzer()
@@ -91,41 +104,114 @@ STOP_WORDS: frozenset[str] = frozenset(
 )
 
 
+# ─── Lemmatization (shared, LRU-cached) ───────────────────────────────────
+
+# Фильтры токенов: keywords — только слова от 3 символов,
+# BM25 — слова и числа от 2 символов.
+_KEYWORD_TOKEN_RE = re.compile(r"[а-яёa-z]")
+_BM25_TOKEN_RE = re.compile(r"[а-яёa-z0-9]")
+
+
+@lru_cache(maxsize=v7_config.LEMMA_CACHE_SIZE)
+def lemmatize_word(word: str) -> str:
+    """Нормальная форма словоформы (pymorphy3) с LRU кэшем word→lemma.
+
+    Словарь нормативных текстов мал и повторяется, поэтому почти все
+    вызовы на горячем пути попадают в кэш. word — уже в lower case.
+    """
+    parsed = _morph.parse(word)
+    return parsed[0].normal_form if parsed else word
+
+
+def _tokens(text: str, min_len: int, pattern: re.Pattern) -> List[str]:
+    """razdel-токены в lower case, прошедшие фильтр длины и паттерна."""
+    words = []
+    for token in razdel_tokenize(text):
+        word = token.text.lower()
+        if len(word) >= min_len and pattern.match(word):
+            words.append(word)
+    return words
+
+
+def lemmatize_batch(
+    texts: List[str],
+    min_len: int = 2,
+    pattern: re.Pattern = _BM25_TOKEN_RE,
+) -> List[List[str]]:
+    """Лемматизация многих текстов за один проход.
+
+    Уникальные словоформы всего батча разбираются один раз, затем леммы
+    раскладываются обратно по текстам (порядок токенов сохраняется).
+    """
+    tokenized = [_tokens(text, min_len, pattern) for text in texts]
+    lemma_of = {w: lemmatize_word(w) for w in set(chain.from_iterable(tokenized))}
+    return [[lemma_of[w] for w in words] for words in tokenized]
+
+
+def lemma_cache_stats() -> dict:
+    """Счётчики LRU кэша лемм: hits, misses, size, maxsize, hit_rate."""
+    info = lemmatize_word.cache_info()
+    total = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hit_rate": round(info.hits / total, 4) if total else 0.0,
+    }
+
+
 # ─── extract_keywords ─────────────────────────────────────────────────────
 
 
 def extract_keywords(text: str) -> set[str]:
     """Ключевые слова для keyword overlap check.
 
-    pymorphy3 лемматизация + razdel токенизация.
+    pymorphy3 лемматизация (через LRU кэш) + razdel токенизация.
     Сохраняет номера нормативных документов (СП 1.13130, ГОСТ 12.1.004).
     """
     # Извлечь номера документов ДО лемматизации
     doc_numbers = set(re.findall(r"\d+(?:\.\d+)+(?:-\d+)?", text))
 
-    lemmas: set[str] = set()
-    for token in razdel_tokenize(text):
-        word = token.text.lower()
-        if len(word) < 3 or not re.match(r"[а-яёa-z]", word):
-            continue
-        parsed = _morph.parse(word)
-        lemma = parsed[0].normal_form if parsed else word
-        if lemma not in STOP_WORDS:
-            lemmas.add(lemma)
+    lemmas = {lemmatize_word(word) for word in set(_tokens(text, 3, _KEYWORD_TOKEN_RE))}
+    return (lemmas - STOP_WORDS) | doc_numbers
+
+
+# ─── Per-chunk keyword sets ───────────────────────────────────────────────
+
 
-    return lemmas | doc_numbers
+@lru_cache(maxsize=v7_config.KEYWORD_CACHE_SIZE)
+def keyword_set(text: str) -> frozenset[str]:
+    """extract_keywords с кэшем по тексту: chunk или запрос разбирается один раз."""
+    return frozenset(extract_keywords(text))
+
+
+def passage_keywords(passage: dict) -> frozenset[str]:
+    """Keyword-леммы passage: готовое поле "keywords" или кэш keyword_set по тексту.
+
+    Passage не мутируется — результаты поиска это копии, так что кэш держится
+    на тексте chunk-а: одинаковый chunk из vector search, BM25 и section fetch
+    разбирается один раз.
+    """
+    keywords = passage.get("keywords")
+    if keywords is None:
+        keywords = keyword_set(passage.get("text", ""))
+    return keywords
 
 
 # ─── compute_keyword_overlap ──────────────────────────────────────────────
 
 
 def compute_keyword_overlap(query: str, passages: List[dict]) -> float:
-    """Доля ключевых слов запроса, найденных в passages (0.0–1.0)."""
-    query_kw = extract_keywords(query)
+    """Доля ключевых слов запроса, найденных в passages (0.0–1.0).
+
+    Без NLP на горячем пути: union предвычисленных keyword-множеств
+    passages + intersection с keywords запроса.
+    """
+    query_kw = keyword_set(query)
     if not query_kw:
         return 1.0
-    passage_text = " ".join(p.get("text", "") for p in passages)
-    passage_kw = extract_keywords(passage_text)
+    passage_kw = frozenset().union(*(passage_keywords(p) for p in passages))
     return len(query_kw & passage_kw) / len(query_kw)
 
 
@@ -143,32 +229,230 @@ def compute_doc_diversity(passages: List[dict]) -> tuple[int, float]:
 
 # ─── BM25 ─────────────────────────────────────────────────────────────────
 
+# Версия формата BM25-снапшота и правил лемматизации: при изменении
+# _lemmatize_for_bm25 или раскладки файлов — увеличить, снапшоты пересоберутся.
+BM25_SNAPSHOT_VERSION = f"bm25-csr-v1:pymorphy3-{pymorphy3.__version__}"
+_SNAPSHOT_ARRAYS = ("indptr", "indices", "tf", "doc_len")
+
+# Параметры BM25Okapi — совпадают с дефолтами rank_bm25, чтобы скоры
+# векторизованного движка были идентичны прежней реализации.
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_EPSILON = 0.25
+
 
 def _lemmatize_for_bm25(text: str) -> List[str]:
     """Токенизация + лемматизация для BM25 индекса и запросов."""
-    tokens = []
-    for token in razdel_tokenize(text):
-        word = token.text.lower()
-        if len(word) < 2 or not re.match(r"[а-яёa-z0-9]", word):
-            continue
-        parsed = _morph.parse(word)
-        lemma = parsed[0].normal_form if parsed else word
-        tokens.append(lemma)
-    return tokens
+    return [lemmatize_word(w) for w in _tokens(text, 2, _BM25_TOKEN_RE)]
+
+
+def _build_postings(corpus: List[List[str]]) -> dict:
+    """Лемматизированный корпус → CSR postings (term-major) + длины документов."""
+    vocab: dict[str, int] = {}
+    postings_docs: List[List[int]] = []
+    postings_tf: List[List[int]] = []
+    doc_len = np.zeros(len(corpus), dtype=np.int32)
+
+    for doc_idx, tokens in enumerate(corpus):
+        doc_len[doc_idx] = len(tokens)
+        for token, tf in Counter(tokens).items():
+            tid = vocab.setdefault(token, len(vocab))
+            if tid == len(postings_docs):
+                postings_docs.append([])
+                postings_tf.append([])
+            postings_docs[tid].append(doc_idx)
+            postings_tf[tid].append(tf)
+
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum([len(d) for d in postings_docs], out=indptr[1:])
+    nnz = int(indptr[-1])
+    return {
+        "vocab": list(vocab),
+        "indptr": indptr,
+        "indices": np.fromiter(
+            chain.from_iterable(postings_docs), dtype=np.int32, count=nnz
+        ),
+        "tf": np.fromiter(chain.from_iterable(postings_tf), dtype=np.int32, count=nnz),
+        "doc_len": doc_len,
+    }
+
+
+class FilterBitmaps:
+    """Boolean masks документов по metadata-фильтрам (BM25 и vector mirror).
+
+    Поле ищется top-level, затем в ``metadata``. Значение-скаляр — равенство,
+    list/tuple/set — любое из, None — не фильтр. Колонки кодируются в int32
+    лениво, bitmaps кэшируются: filters приходят из whitelist
+    ALLOWED_FILTER_KEYS, так что различных bitmaps немного.
+    """
+
+    def __init__(self, records: List[dict]) -> None:
+        self._records = records
+        self._count = len(records)
+        # key → (value→code, int32 codes)
+        self._columns: dict[str, tuple[dict, np.ndarray]] = {}
+        # (key, values) → bitmap
+        self._bitmaps: dict[tuple, np.ndarray] = {}
+
+    def _column(self, key: str) -> tuple[dict, np.ndarray]:
+        if key not in self._columns:
+            lookup: dict = {}
+            codes = np.empty(self._count, dtype=np.int32)
+            for i, p in enumerate(self._records):
+                value = p.get(key, (p.get("metadata") or {}).get(key))
+                try:
+                    codes[i] = lookup.setdefault(value, len(lookup))
+                except TypeError:  # unhashable value — never matches
+                    codes[i] = -1
+            self._columns[key] = (lookup, codes)
+        return self._columns[key]
+
+    def bitmap(self, key: str, value) -> np.ndarray:
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        try:
+            cache_key = (key, frozenset(values))
+        except TypeError:
+            return np.zeros(self._count, dtype=bool)
+        bitmap = self._bitmaps.get(cache_key)
+        if bitmap is None:
+            lookup, codes = self._column(key)
+            wanted = []
+            for v in values:
+                try:
+                    wanted.append(lookup.get(v, -2))
+                except TypeError:
+                    continue
+            bitmap = np.isin(codes, wanted)
+            self._bitmaps[cache_key] = bitmap
+        return bitmap
+
+    def mask(self, filters: dict) -> np.ndarray:
+        """Документы, у которых совпадают все filters."""
+        mask = np.ones(self._count, dtype=bool)
+        for key, value in filters.items():
+            if value is not None:
+                mask &= self.bitmap(key, value)
+        return mask
 
 
 class BM25Index:
-    """BM25 индекс поверх rank_bm25.BM25Okapi с pymorphy3 лемматизацией.
+    """Векторизованный BM25 (Okapi) поверх разреженной term→doc матрицы.
+
+    Postings хранятся в CSR (term-major): ``indptr[t]:indptr[t + 1]`` —
+    срез doc ids и term frequencies для леммы ``t``. IDF и нормировки длины
+    документов предвычисляются при построении, поэтому search() трогает
+    только документы, содержащие леммы запроса. Формула и сглаживание
+    отрицательных IDF совпадают с rank_bm25.BM25Okapi.
 
     Usage:
         index = BM25Index(passages)  # build once
         results = index.search(query, top_k=12)
     """
 
-    def __init__(self, passages: List[dict]) -> None:
+    def __init__(self, passages: List[dict], postings: Optional[dict] = None) -> None:
         self._passages = passages
-        corpus = [_lemmatize_for_bm25(p.get("text", "")) for p in passages]
-        self._bm25 = BM25Okapi(corpus)
+        if postings is None:
+            corpus = lemmatize_batch([p.get("text", "") for p in passages])
+            postings = _build_postings(corpus)
+        self._set_postings(postings)
+        self._filters = FilterBitmaps(passages)
+
+    def _set_postings(self, postings: dict) -> None:
+        self._vocab = {token: tid for tid, token in enumerate(postings["vocab"])}
+        self._indptr = postings["indptr"]
+        self._indices = postings["indices"]
+        self._tf = postings["tf"]
+        self._doc_len = postings["doc_len"]
+        self._doc_count = len(self._doc_len)
+
+        # IDF: log((N - n + 0.5) / (n + 0.5)); отрицательные (n > N/2)
+        # заменяются на epsilon * mean(idf) — как в rank_bm25.
+        n = float(self._doc_count)
+        df = np.diff(self._indptr)
+        idf = np.log(n - df + 0.5) - np.log(df + 0.5)
+        if idf.size:
+            idf[idf < 0] = BM25_EPSILON * idf.mean()
+        self._idf = idf
+
+        # k1 * (1 - b + b * |d| / avgdl) — знаменатель TF-насыщения
+        doc_len = np.asarray(self._doc_len, dtype=np.float64)
+        avgdl = doc_len.mean() if doc_len.size else 0.0
+        if avgdl > 0:
+            self._len_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / avgdl)
+        else:
+            self._len_norm = np.full_like(doc_len, BM25_K1 * (1 - BM25_B))
+
+    # ── Snapshot (on-disk, memory-mapped) ──────────────────────────────────
+
+    def save_snapshot(self, path: str, fingerprint: str) -> None:
+        """Сохранить postings на диск (tmp-dir + rename).
+
+        Старый снапшот сначала отодвигается rename'ом и удаляется уже после
+        подмены: читатель не застаёт полуудалённый каталог. Если параллельный
+        save успел поставить свой снапшот, наш tmp просто выбрасывается.
+        """
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # уникальные имена: параллельные save не делят tmp/old даже в одном pid
+        tmp = Path(tempfile.mkdtemp(dir=target.parent, prefix=f"{target.name}.tmp-"))
+        for name in _SNAPSHOT_ARRAYS:
+            np.save(tmp / f"{name}.npy", np.asarray(getattr(self, f"_{name}")))
+        with open(tmp / "vocab.json", "w", encoding="utf-8") as f:
+            json.dump(list(self._vocab), f, ensure_ascii=False)
+        meta = {
+            "version": BM25_SNAPSHOT_VERSION,
+            "fingerprint": fingerprint,
+            "doc_count": self._doc_count,
+            "vocab_size": len(self._vocab),
+        }
+        with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        old = Path(tempfile.mkdtemp(dir=target.parent, prefix=f"{target.name}.old-"))
+        try:
+            os.replace(target, old)
+        except FileNotFoundError:
+            pass
+        try:
+            os.replace(tmp, target)
+        except OSError:
+            # target уже занят снапшотом соседнего процесса (ENOTEMPTY)
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not target.exists():
+                raise
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load_snapshot(
+        cls, path: str, passages: List[dict], fingerprint: str
+    ) -> Optional["BM25Index"]:
+        """Загрузить postings (mmap). None — снапшота нет или он устарел."""
+        target = Path(path)
+        try:
+            with open(target / "meta.json", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (
+            meta.get("version") != BM25_SNAPSHOT_VERSION
+            or meta.get("fingerprint") != fingerprint
+            or meta.get("doc_count") != len(passages)
+        ):
+            return None
+        try:
+            with open(target / "vocab.json", encoding="utf-8") as f:
+                postings: dict = {"vocab": json.load(f)}
+            for name in _SNAPSHOT_ARRAYS:
+                postings[name] = np.load(target / f"{name}.npy", mmap_mode="r")
+        except (OSError, ValueError) as exc:
+            logger.warning("BM25 snapshot %s unreadable: %s", path, exc)
+            return None
+        return cls(passages, postings=postings)
+
+    def _filter_bitmap(self, key: str, value) -> np.ndarray:
+        return self._filters.bitmap(key, value)
+
+    def _filter_mask(self, filters: dict) -> np.ndarray:
+        return self._filters.mask(filters)
 
     def search(
         self,
@@ -177,26 +461,49 @@ class BM25Index:
         filters: Optional[dict] = None,
     ) -> List[dict]:
         tokens = _lemmatize_for_bm25(query)
-        if not tokens:
+        term_ids = [self._vocab[t] for t in tokens if t in self._vocab]
+        if not term_ids or top_k <= 0:
             return []
-        scores = self._bm25.get_scores(tokens)
-
-        candidates = []
-        for i, score in enumerate(scores):
-            p = self._passages[i]
-            if filters:
-                skip = False
-                for k, v in filters.items():
-                    if p.get(k) != v:
-                        skip = True
-                        break
-                if skip:
-                    continue
-            candidates.append((i, score))
 
-        candidates.sort(key=lambda x: x[1], reverse=True)
+        # С filters postings сначала режутся bitmap-ом: скорятся только
+        # документы из нужного подмножества.
+        mask = self._filter_mask(filters) if filters else None
+        if mask is not None and not mask.any():
+            return []
+
+        # Вклад каждой леммы запроса — только по её postings.
+        doc_parts = []
+        score_parts = []
+        for tid in term_ids:
+            start, end = self._indptr[tid], self._indptr[tid + 1]
+            docs = self._indices[start:end]
+            tf = self._tf[start:end]
+            if mask is not None:
+                keep = mask[docs]
+                docs, tf = docs[keep], tf[keep]
+            doc_parts.append(docs)
+            score_parts.append(
+                self._idf[tid] * tf * (BM25_K1 + 1) / (tf + self._len_norm[docs])
+            )
+        candidates, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(
+            inverse, weights=np.concatenate(score_parts), minlength=candidates.size
+        )
+        if candidates.size == 0:
+            return []
+
+        if candidates.size > top_k:
+            # k-й по величине скор через argpartition; равные ему на границе
+            # добираются в порядке корпуса, как при стабильной полной сортировке.
+            kth = scores[np.argpartition(-scores, top_k - 1)[top_k - 1]]
+            top = np.flatnonzero(scores >= kth)
+        else:
+            top = np.arange(candidates.size)
+        # score desc, при равенстве — порядок корпуса (стабильно)
+        top = top[np.lexsort((candidates[top], -scores[top]))][:top_k]
+
         results = []
-        for idx, score in candidates[:top_k]:
+        for idx, score in zip(candidates[top], scores[top]):
             p = dict(self._passages[idx])
             p["bm25_score"] = round(float(score), 4)
             if "score" not in p:
@@ -210,10 +517,32 @@ class BM25Index:
 _bm25_index: Optional[BM25Index] = None
 
 
-def init_bm25_index(passages: List[dict]) -> None:
-    """Initialize global BM25 index. Call once at startup with full corpus."""
+def init_bm25_index(
+    passages: List[dict],
+    snapshot_dir: Optional[str] = None,
+    fingerprint: Optional[str] = None,
+) -> None:
+    """Initialize global BM25 index. Call once at startup with full corpus.
+
+    С snapshot_dir + fingerprint: postings берутся из снапшота на диске, если
+    fingerprint совпадает; иначе корпус лемматизируется и снапшот перезаписывается.
+    """
     global _bm25_index
-    _bm25_index = BM25Index(passages)
+    if not snapshot_dir or not fingerprint:
+        _bm25_index = BM25Index(passages)
+        return
+
+    index = BM25Index.load_snapshot(snapshot_dir, passages, fingerprint)
+    if index is not None:
+        logger.info("BM25 index loaded from snapshot %s", snapshot_dir)
+    else:
+        index = BM25Index(passages)
+        try:
+            index.save_snapshot(snapshot_dir, fingerprint)
+            logger.info("BM25 snapshot rebuilt: %s", snapshot_dir)
+        except OSError as exc:
+            logger.warning("BM25 snapshot save failed: %s", exc)
+    _bm25_index = index
 
 
 def bm25_search(
@@ -230,32 +559,120 @@ def bm25_search(
     return []
 
 
+# ─── Parallel retrieval fan-out ───────────────────────────────────────────
+
+_retrieval_pool: Optional[ThreadPoolExecutor] = None
+_retrieval_pool_lock = threading.Lock()
+
+
+def _get_retrieval_pool() -> ThreadPoolExecutor:
+    """Process-wide пул для retriever-вызовов (embedding HTTP, Chroma, BM25)."""
+    global _retrieval_pool
+    if _retrieval_pool is None:
+        with _retrieval_pool_lock:
+            if _retrieval_pool is None:
+                _retrieval_pool = ThreadPoolExecutor(
+                    max_workers=v7_config.RETRIEVAL_MAX_WORKERS,
+                    thread_name_prefix="v7-retrieval",
+                )
+    return _retrieval_pool
+
+
+def parallel_retrieve(
+    calls: List[Callable[[], List[dict]]],
+    timeout_ms: Optional[int] = None,
+    required: int = 1,
+) -> List[Optional[List[dict]]]:
+    """Запустить retriever-вызовы параллельно; результаты в порядке calls.
+
+    timeout_ms — реальный дедлайн: не успевшие к нему вызовы отбрасываются
+    (None); None — ждать все. Первые `required` вызовов ждём всегда — без
+    них нечего мержить; их исключения пробрасываются. Ошибки остальных →
+    warning + None.
+    """
+    pool = _get_retrieval_pool()
+    futures = [pool.submit(call) for call in calls]
+    wait(futures, timeout=None if timeout_ms is None else max(timeout_ms, 0) / 1000)
+
+    results: List[Optional[List[dict]]] = []
+    for i, future in enumerate(futures):
+        if i < required:
+            results.append(future.result())
+        elif not future.done():
+            future.cancel()
+            results.append(None)
+        elif future.exception() is not None:
+            logger.warning("parallel retrieval call failed: %s", future.exception())
+            results.append(None)
+        else:
+            results.append(future.result())
+
+    dropped = sum(r is None for r in results)
+    if dropped:
+        logger.info(
+            "parallel retrieval: %d/%d calls dropped (deadline %s ms)",
+            dropped,
+            len(calls),
+            timeout_ms,
+        )
+    return results
+
+
 # ─── RRF merge ────────────────────────────────────────────────────────────
 
 
+def passage_key(p: dict) -> str:
+    """Стабильная identity пассажа для дедупа и слияния списков.
+
+    Порядок: Chroma id (``id``, его проставляют все retriever-ы bridge) →
+    source + chunk_id + child_idx (top-level или в metadata) → digest текста.
+    """
+    pid = p.get("id")
+    if pid:
+        return f"id:{pid}"
+    meta = p.get("metadata") or {}
+    chunk_id = p.get("chunk_id", meta.get("chunk_id"))
+    if chunk_id is not None and chunk_id != "":
+        source = p.get("source", meta.get("source", ""))
+        child_idx = p.get("child_idx", meta.get("child_idx", ""))
+        return f"chunk:{source}#{chunk_id}#{child_idx}"
+    digest = hashlib.blake2b(p.get("text", "").encode("utf-8"), digest_size=16)
+    return f"text:{digest.hexdigest()}"
+
+
 def rrf_merge(
     *result_lists: List[dict],
     top_k: int = 12,
     k: int | None = None,
+    weights: Optional[Sequence[float]] = None,
 ) -> List[dict]:
     """Reciprocal Rank Fusion — объединяет results из нескольких retriever-ов.
 
-    RRF score = Σ 1 / (k + rank_i) по всем спискам.
+    RRF score = Σ w_i / (k + rank_i) по всем спискам (w_i = 1 без weights).
     k=60 — стандартное значение (Cormack et al.).
-    Дедуп по chunk_id.
+    Дедуп по passage_key: один чанк из разных списков сливается в один
+    пассаж (поля первого вхождения, недостающие — например bm25_score —
+    добираются из остальных).
     """
     if k is None:
         k = v7_config.RRF_K
+    if weights is None:
+        weights = [1.0] * len(result_lists)
+    elif len(weights) != len(result_lists):
+        raise ValueError(
+            f"rrf_merge: {len(weights)} weights for {len(result_lists)} lists"
+        )
 
     chunk_scores: dict[str, float] = {}
     chunk_map: dict[str, dict] = {}
 
-    for results in result_lists:
+    for results, weight in zip(result_lists, weights):
         for rank, p in enumerate(results):
-            cid = p.get("chunk_id", f"unknown_{rank}")
-            rrf_score = 1.0 / (k + rank + 1)
-            chunk_scores[cid] = chunk_scores.get(cid, 0.0) + rrf_score
-            if cid not in chunk_map:
+            cid = passage_key(p)
+            chunk_scores[cid] = chunk_scores.get(cid, 0.0) + weight / (k + rank + 1)
+            if cid in chunk_map:
+                chunk_map[cid] = {**p, **chunk_map[cid]}
+            else:
                 chunk_map[cid] = p
 
     ranked = sorted(chunk_scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
@@ -268,6 +685,21 @@ def rrf_merge(
     return result
 
 
+def hybrid_rrf_merge(
+    vector_lists: Sequence[List[dict]],
+    bm25_lists: Sequence[List[dict]],
+    top_k: int = 12,
+) -> List[dict]:
+    """rrf_merge vector- и BM25-списков с весами RRF_VECTOR_WEIGHT / RRF_BM25_WEIGHT."""
+    return rrf_merge(
+        *vector_lists,
+        *bm25_lists,
+        top_k=top_k,
+        weights=[v7_config.RRF_VECTOR_WEIGHT] * len(vector_lists)
+        + [v7_config.RRF_BM25_WEIGHT] * len(bm25_lists),
+    )
+
+
 # ─── MMR select (fallback only) ──────────────────────────────────────────
 
 
@@ -332,7 +764,7 @@ def merge_all_passages(
     """Merge уникальных passages из ВСЕХ retrieval attempts.
 
     1. Собрать все passages из всех attempts.
-    2. Дедуп по chunk_id.
+    2. Дедуп по passage_key.
     3. MMR-select top_k для diversity.
     """
     if mmr_lambda is None:
@@ -343,8 +775,8 @@ def merge_all_passages(
 
     for attempt in attempts:
         for p in attempt.get("passages", []):
-            cid = p.get("chunk_id", "")
-            if cid and cid in seen_chunks:
+            cid = passage_key(p)
+            if cid in seen_chunks:
                 continue
             seen_chunks.add(cid)
             all_passages.append(p)
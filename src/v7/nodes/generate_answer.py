@@ -9,6 +9,13 @@ from src.v7.state_types import RAGState
 # ─── Generate interface (stub by default, inject production LLM) ──────────
 
 
+class FallbackAnswer(str):
+    """Answer assembled from raw passages without the LLM (stub / LLM failure).
+
+    generate_answer marks it as answer_degraded so it is not cached.
+    """
+
+
 def _stub_generate(
     query: str,
     active_query: str,
@@ -18,7 +25,7 @@ def _stub_generate(
     if not passages:
         return ""
     texts = "\n\n".join(p.get("text", "") for p in passages[:10])
-    return texts
+    return FallbackAnswer(texts)
 
 
 _generate_fn: Optional[Callable[[str, str, List[dict]], str]] = None
@@ -37,7 +44,7 @@ def generate_answer(state: RAGState) -> RAGState:
     """Synthesise final answer from retrieved passages.
 
     Reads:  query, active_query, final_passages.
-    Writes: answer.
+    Writes: answer, answer_degraded.
     """
     query = state.get("query", "")
     active_query = state.get("active_query", query)
@@ -46,4 +53,7 @@ def generate_answer(state: RAGState) -> RAGState:
     fn = _generate_fn if _generate_fn is not None else _stub_generate
     answer = fn(query, active_query, passages)
 
-    return {"answer": answer}
+    return {
+        "answer": str(answer),
+        "answer_degraded": isinstance(answer, FallbackAnswer),
+    }
@@ -3,11 +3,12 @@
 from __future__ import annotations
 
 import logging
+from functools import partial
 from typing import Callable, List, Optional
 
 from src.v7.config import v7_config
 from src.v7.hard_gates import compute_attempt_metrics, validate_filters
-from src.v7.nlp_core import bm25_search, rrf_merge
+from src.v7.nlp_core import bm25_search, hybrid_rrf_merge, parallel_retrieve
 from src.v7.state_types import RAGState, RetrievalAttempt
 
 logger = logging.getLogger(__name__)
@@ -21,6 +22,7 @@ def _default_vector_search(**kwargs) -> List[dict]:
 
 
 _vector_search: Callable[..., List[dict]] = _default_vector_search
+_batch_vector_search: Optional[Callable[..., List[List[dict]]]] = None
 _reranker_fn: Optional[Callable] = None
 _expand_fn: Optional[Callable] = None
 
@@ -31,6 +33,12 @@ def set_vector_search(fn: Callable[..., List[dict]]) -> None:
     _vector_search = fn
 
 
+def set_batch_vector_search(fn: Optional[Callable[..., List[List[dict]]]]) -> None:
+    """Inject multi-query vector search. Signature: fn(queries, filters, top_k) -> list per query."""
+    global _batch_vector_search
+    _batch_vector_search = fn
+
+
 def set_reranker(fn: Callable) -> None:
     """Inject reranker for V8 evidence assess light rerank. Signature: fn(query, passages, top_k) -> passages."""
     global _reranker_fn
@@ -47,7 +55,7 @@ def set_expand_fn(fn: Optional[Callable]) -> None:
 
 
 def rag_simple(state: RAGState) -> RAGState:
-    """Fast hybrid retrieval: vector + BM25 → RRF merge."""
+    """Fast hybrid retrieval: vector + BM25 (parallel fan-out) → RRF merge."""
     plan = state["plan"]
     rid = state["retrieval_id"]
     active_q = state.get("active_query", state["query"])
@@ -72,15 +80,40 @@ def rag_simple(state: RAGState) -> RAGState:
 
     all_queries = [active_q] + extra_queries
 
-    # Run vector + BM25 for each query; collect per-query result lists for RRF
-    all_vector_lists: List[List[dict]] = []
-    all_bm25_lists: List[List[dict]] = []
-
-    for q in all_queries:
-        v_res = _vector_search(query=q, filters=safe_filters, top_k=plan["top_k"])
-        b_res = bm25_search(query=q, filters=safe_filters, top_k=plan["top_k"])
-        all_vector_lists.append(v_res)
-        all_bm25_lists.append(b_res)
+    # Run vector + BM25 for every query concurrently (embedding round-trips
+    # overlap). plan["timeout_ms"] is the deadline: late expanded-query results
+    # are dropped; the active query's vector + BM25 pair is always awaited.
+    # With a batch vector search, all queries share one embedding call and
+    # one Chroma round-trip.
+    timeout_ms = plan.get("timeout_ms")
+    bm25_calls = [
+        partial(bm25_search, query=q, filters=safe_filters, top_k=plan["top_k"])
+        for q in all_queries
+    ]
+    if _batch_vector_search is not None and len(all_queries) > 1:
+        batch_call = partial(
+            _batch_vector_search,
+            queries=all_queries,
+            filters=safe_filters,
+            top_k=plan["top_k"],
+        )
+        results = parallel_retrieve(
+            [batch_call, *bm25_calls], timeout_ms=timeout_ms, required=2
+        )
+        all_vector_lists: List[List[dict]] = results[0]
+        all_bm25_lists: List[List[dict]] = [r for r in results[1:] if r is not None]
+    else:
+        calls = []
+        for q, bm25_call in zip(all_queries, bm25_calls):
+            calls.append(
+                partial(
+                    _vector_search, query=q, filters=safe_filters, top_k=plan["top_k"]
+                )
+            )
+            calls.append(bm25_call)
+        results = parallel_retrieve(calls, timeout_ms=timeout_ms, required=2)
+        all_vector_lists = [r for r in results[0::2] if r is not None]
+        all_bm25_lists = [r for r in results[1::2] if r is not None]
 
     # top_score anchored to original query only (threshold gate must not be
     # inflated by low-relevance passages from expanded queries)
@@ -88,7 +121,7 @@ def rag_simple(state: RAGState) -> RAGState:
     top_score = max((p.get("score", 0.0) for p in vector_results), default=0.0)
 
     # RRF merge across all query result lists
-    passages = rrf_merge(*all_vector_lists, *all_bm25_lists, top_k=plan["top_k"])
+    passages = hybrid_rrf_merge(all_vector_lists, all_bm25_lists, top_k=plan["top_k"])
     if not passages:
         passages = sorted(
             vector_results, key=lambda x: x.get("score", 0.0), reverse=True
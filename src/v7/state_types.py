@@ -193,6 +193,8 @@ class RAGState(TypedDict, total=False):
     abstain_reason: str
     sufficiency_details: SufficiencyResult
     answer: str  # synthesised LLM answer (set by generate_answer node)
+    answer_degraded: bool  # answer is raw passages (LLM stub / generation failure)
     evidence_report: EvidenceReport  # V8 evidence assessment; populated only when V8_ENABLE_EVIDENCE_ASSESS=True
+    answer_cache_hit: bool  # set by CachedGraph when the answer came from cache
     # UX
     status_message: str
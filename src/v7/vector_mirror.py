@@ -0,0 +1,221 @@
+"""In-process mirror of the Chroma collection for dense retrieval.
+
+The whole collection (embeddings, documents, metadatas) is loaded once into a
+contiguous float32 matrix. A query is then a single matmul plus an
+``argpartition`` top-k, with no Chroma client round-trip or JSON conversion.
+Metadata filters become boolean masks (nlp_core.FilterBitmaps), so a
+filtered query only scores its own subset.
+
+Distances match the collection's ``hnsw:space`` — squared L2 (Chroma default),
+cosine or ip — so scores equal Chroma's. The mirror re-reads the collection
+fingerprint every V7_VECTOR_MIRROR_CHECK_SEC seconds. After a re-index it
+reloads in a background thread and keeps serving the old snapshot meanwhile.
+
+Enabled with V7_VECTOR_MIRROR=true (see bridge.init_v7_from_chroma).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.chroma_helpers import collection_fingerprint, vector_store_fingerprint
+from src.v7.config import v7_config
+from src.v7.nlp_core import FilterBitmaps
+
+logger = logging.getLogger(__name__)
+
+# Rows per collection.get() page while loading
+_LOAD_PAGE = 5000
+_SPACES = ("l2", "cosine", "ip")
+
+# (chroma id, document, metadata, distance)
+Hit = Tuple[str, str, dict, float]
+
+
+def _collection_space(vector_store) -> str:
+    metadata = getattr(vector_store._collection, "metadata", None) or {}
+    space = metadata.get("hnsw:space", "l2") if isinstance(metadata, dict) else "l2"
+    return space if space in _SPACES else "l2"
+
+
+class _Snapshot:
+    """Immutable copy of the collection; swapped whole on reload."""
+
+    def __init__(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[dict],
+        matrix: np.ndarray,
+        space: str,
+    ) -> None:
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.space = space
+        self.fingerprint = collection_fingerprint(ids)
+        if space == "cosine" and len(matrix):
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1.0, norms)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        self.filters = FilterBitmaps([{"metadata": m} for m in metadatas])
+
+    def distances(self, queries: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if self.space == "cosine":
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries = queries / np.where(norms == 0, 1.0, norms)
+        dots = queries @ matrix.T
+        if self.space == "l2":
+            sq_norms = self.sq_norms if rows is None else self.sq_norms[rows]
+            q_sq = np.einsum("ij,ij->i", queries, queries)[:, np.newaxis]
+            return np.maximum(q_sq + sq_norms - 2.0 * dots, 0.0)
+        return 1.0 - dots
+
+
+class VectorMirror:
+    """Dense top-k over an in-memory copy of a LangChain Chroma store."""
+
+    def __init__(self, vector_store, check_sec: Optional[float] = None) -> None:
+        self.vector_store = vector_store
+        self.check_sec = (
+            v7_config.VECTOR_MIRROR_CHECK_SEC if check_sec is None else check_sec
+        )
+        self._snapshot = self._load()
+        self._checked_at = time.monotonic()
+        self._refreshing = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._snapshot.ids)
+
+    @property
+    def fingerprint(self) -> str:
+        return self._snapshot.fingerprint
+
+    # ─── Sync ───
+
+    def _load(self) -> _Snapshot:
+        t0 = time.perf_counter()
+        ids: List[str] = []
+        documents: List[str] = []
+        metadatas: List[dict] = []
+        blocks: List[np.ndarray] = []
+        offset = 0
+        while True:
+            page = self.vector_store.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=_LOAD_PAGE,
+                offset=offset,
+            )
+            page_ids = page.get("ids") or []
+            if not page_ids:
+                break
+            ids.extend(page_ids)
+            documents.extend(page["documents"])
+            metadatas.extend(dict(m or {}) for m in page["metadatas"])
+            blocks.append(np.asarray(page["embeddings"], dtype=np.float32))
+            offset += len(page_ids)
+            if len(page_ids) < _LOAD_PAGE:
+                break
+        matrix = np.concatenate(blocks) if blocks else np.zeros((0, 0), np.float32)
+        snapshot = _Snapshot(
+            ids, documents, metadatas, matrix, _collection_space(self.vector_store)
+        )
+        logger.info(
+            "vector_mirror: %d vectors (dim %d, %s) loaded in %.2fs",
+            len(ids),
+            matrix.shape[1] if matrix.ndim == 2 else 0,
+            snapshot.space,
+            time.perf_counter() - t0,
+        )
+        return snapshot
+
+    def refresh(self) -> bool:
+        """Reload if the collection fingerprint changed. True if reloaded."""
+        with self._refreshing:
+            self._checked_at = time.monotonic()
+            try:
+                if vector_store_fingerprint(self.vector_store) == self.fingerprint:
+                    return False
+                self._snapshot = self._load()
+                return True
+            except Exception as exc:
+                logger.warning("vector_mirror: refresh failed: %s", exc)
+                return False
+
+    def _maybe_refresh(self) -> None:
+        if time.monotonic() - self._checked_at < self.check_sec:
+            return
+        if self._refreshing.locked():
+            return
+        self._checked_at = time.monotonic()
+        threading.Thread(
+            target=self.refresh, name="vector-mirror-refresh", daemon=True
+        ).start()
+
+    # ─── Search ───
+
+    def query(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        top_k: int = 12,
+        filters: Optional[dict] = None,
+    ) -> List[List[Hit]]:
+        """Top-k hits per query embedding, nearest first (Chroma distances)."""
+        self._maybe_refresh()
+        snapshot = self._snapshot
+        queries = np.asarray(embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis]
+        if not snapshot.ids or top_k <= 0:
+            return [[] for _ in range(len(queries))]
+        if queries.shape[1] != snapshot.matrix.shape[1]:
+            raise ValueError(
+                f"query dim {queries.shape[1]} != mirror dim {snapshot.matrix.shape[1]}"
+            )
+
+        rows = None
+        if filters:
+            rows = np.flatnonzero(snapshot.filters.mask(filters))
+            if rows.size == 0:
+                return [[] for _ in range(len(queries))]
+
+        distances = snapshot.distances(queries, rows)
+        k = min(top_k, distances.shape[1])
+        results: List[List[Hit]] = []
+        for dist in distances:
+            if k < dist.size:
+                top = np.argpartition(dist, k - 1)[:k]
+            else:
+                top = np.arange(dist.size)
+            top = top[np.lexsort((top, dist[top]))]  # distance asc, then row
+            hits = []
+            for pos in top:
+                row = int(pos) if rows is None else int(rows[pos])
+                hits.append(
+                    (
+                        snapshot.ids[row],
+                        snapshot.documents[row],
+                        snapshot.metadatas[row],
+                        float(dist[pos]),
+                    )
+                )
+            results.append(hits)
+        return results
+
+
+def load_vector_mirror(vector_store) -> Optional[VectorMirror]:
+    """VectorMirror if V7_VECTOR_MIRROR is on and the collection loads; else None."""
+    if not v7_config.VECTOR_MIRROR:
+        return None
+    try:
+        return VectorMirror(vector_store)
+    except Exception as exc:
+        logger.warning("vector_mirror: disabled, using Chroma queries: %s", exc)
+        return None
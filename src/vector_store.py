@@ -3,14 +3,22 @@ from __future__ import annotations
 import datetime
 import json
 import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
-from typing import Any, Iterable, List
+from typing import Any, Callable, Iterable, List, Optional
 
 from langchain_core.documents import Document
 from langchain_chroma import Chroma
 
 from config.settings import settings
+from src.embedding_cache import DocumentEmbeddingStore, embed_documents_cached
 from src.llm_factory import get_embedding_model
+from src.parent_store import ParentStore, get_parent_store, parent_id_for
 from utils.logging import logger
 
 try:
@@ -48,6 +56,17 @@ def _sanitize_metadata(meta: dict[str, Any]) -> dict[str, Any]:
     return out
 
 
+def _split_parent(meta: dict[str, Any], parents: dict[str, str]) -> dict[str, Any]:
+    """Вынести parent_text в ``parents`` (id → текст), оставив в meta parent_id."""
+    if not isinstance(meta.get("parent_text"), str):
+        return meta
+    meta = dict(meta)
+    text = meta.pop("parent_text")
+    pid = meta.setdefault("parent_id", parent_id_for(text))
+    parents[pid] = text
+    return meta
+
+
 def _batches_by_tokens(
     docs: List[Document],
     max_tokens_per_batch: int = 280_000,
@@ -79,31 +98,209 @@ def _create_chroma_instance(embeddings) -> Chroma:
     )
 
 
-def create_vector_store(chunks: List[Document]) -> Chroma:
-    logger.info("Создание новой векторной базы данных...")
+@lru_cache(maxsize=None)
+def _document_embedding_store(path: str) -> DocumentEmbeddingStore:
+    return DocumentEmbeddingStore(path)
+
+
+def get_document_embedding_store() -> Optional[DocumentEmbeddingStore]:
+    """Store векторов чанков из settings.DOC_EMBEDDING_CACHE_PATH (None = выключен)."""
+    path = settings.DOC_EMBEDDING_CACHE_PATH
+    if not path:
+        return None
+    try:
+        return _document_embedding_store(path)
+    except Exception as e:
+        logger.warning(f"Document embedding cache disabled ({path}): {e}")
+        return None
+
+
+def open_vector_store() -> Chroma:
+    """Open (or create) the persistent collection without the non-empty check."""
     os.makedirs(settings.CHROMA_DB_PATH, exist_ok=True)
+    return _create_chroma_instance(get_embedding_model())
 
-    embeddings = get_embedding_model()
-    is_openai = embeddings.__class__.__name__ in {
+
+# ─── Embedding pipeline ───
+# Батчи эмбеддятся параллельно (до EMBEDDING_MAX_INFLIGHT запросов), а пишутся
+# в Chroma в исходном порядке из основного потока. На 429 лимит in-flight
+# режется вдвое (AIMD) и запрос повторяется с экспоненциальной паузой.
+
+
+def _is_rate_limited(exc: BaseException) -> bool:
+    if getattr(exc, "status_code", None) == 429:
+        return True
+    if "ratelimit" in type(exc).__name__.lower():
+        return True
+    msg = str(exc).lower()
+    return "429" in msg or "rate limit" in msg
+
+
+class _AdaptiveLimiter:
+    """In-flight лимит: /2 на 429, +1 после `limit` успехов подряд."""
+
+    def __init__(self, limit: int) -> None:
+        self.max_limit = max(1, limit)
+        self.limit = self.max_limit
+        self._active = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self) -> "_AdaptiveLimiter":
+        with self._cond:
+            self._cond.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def on_success(self) -> None:
+        with self._cond:
+            self._successes += 1
+            if self.limit < self.max_limit and self._successes >= self.limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def on_rate_limit(self) -> None:
+        with self._cond:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+
+
+def _embed_with_backoff(
+    embed: Callable[[List[str]], List[List[float]]],
+    texts: List[str],
+    limiter: _AdaptiveLimiter,
+) -> List[List[float]]:
+    retries = max(0, settings.EMBEDDING_MAX_RETRIES)
+    attempt = 0
+    while True:
+        with limiter:
+            try:
+                vectors = embed(texts)
+            except Exception as e:
+                if not _is_rate_limited(e) or attempt >= retries:
+                    raise
+                limiter.on_rate_limit()
+            else:
+                limiter.on_success()
+                return vectors
+        delay = min(60.0, 2.0**attempt) * (1 + random.random())
+        logger.warning(f"Embedding 429: limit→{limiter.limit}, retry in {delay:.1f}s")
+        time.sleep(delay)
+        attempt += 1
+
+
+def add_chunks(
+    vector_store: Chroma,
+    chunks: List[Document],
+    ids: Optional[List[str]] = None,
+    parent_store: Optional[ParentStore] = None,
+) -> None:
+    """Embed and add chunks in token-bounded batches (ids optional, 1:1 с chunks).
+
+    Эмбеддинг идёт в пуле потоков, запись — upsert'ом с готовыми embeddings
+    в порядке батчей; между ними не больше EMBEDDING_WRITE_QUEUE готовых
+    батчей. С включённым document embedding cache провайдеру уходят только
+    промахи. parent_text не пишется в метаданные Chroma: он уходит в
+    ``parent_store`` (по умолчанию — в CHROMA_DB_PATH) до upsert'а child'ов.
+    """
+    embeddings = vector_store.embeddings
+    store = get_document_embedding_store()
+    is_openai = getattr(embeddings, "inner", embeddings).__class__.__name__ in {
         "OpenAIEmbeddings",
         "AzureOpenAIEmbeddings",
     }
+    if store is None:
+        embed = embeddings.embed_documents
+    else:
+
+        def embed(texts: List[str]) -> List[List[float]]:
+            return embed_documents_cached(embeddings, texts, store)
 
-    vector_store = _create_chroma_instance(embeddings)
-
-    total, done = len(chunks), 0
-    for batch in _batches_by_tokens(
-        chunks,
-        max_tokens_per_batch=280_000,
-        hard_batch_cap=128,
-        is_openai=is_openai,
-    ):
-        texts = [d.page_content for d in batch]
-        metas = [_sanitize_metadata(d.metadata or {}) for d in batch]  # ✅ тут
-        vector_store.add_texts(texts=texts, metadatas=metas)
-        done += len(batch)
-        logger.info(f"Chroma add: прогресс {done}/{total}")
+    inflight = max(1, settings.EMBEDDING_MAX_INFLIGHT)
+    window = inflight + max(0, settings.EMBEDDING_WRITE_QUEUE)
+    limiter = _AdaptiveLimiter(inflight)
 
+    total, done, offset = len(chunks), 0, 0
+    t0 = time.perf_counter()
+
+    def _write(item) -> None:
+        nonlocal done
+        future, texts, metas, batch_ids = item
+        vector_store._collection.upsert(
+            ids=batch_ids,
+            embeddings=future.result(),
+            documents=texts,
+            # Chroma отвергает пустой dict, но принимает None
+            metadatas=[m or None for m in metas],
+        )
+        done += len(texts)
+        rate = done / max(time.perf_counter() - t0, 1e-9)
+        logger.info(f"Chroma add: прогресс {done}/{total} ({rate:.1f} chunks/s)")
+
+    pending: deque = deque()
+    with ThreadPoolExecutor(max_workers=inflight, thread_name_prefix="embed") as pool:
+        try:
+            for batch in _batches_by_tokens(
+                chunks,
+                max_tokens_per_batch=280_000,
+                hard_batch_cap=128,
+                is_openai=is_openai,
+            ):
+                if not batch:
+                    continue
+                texts = [d.page_content for d in batch]
+                parents: dict[str, str] = {}
+                metas = [
+                    _sanitize_metadata(_split_parent(d.metadata or {}, parents))
+                    for d in batch
+                ]
+                if parents and parent_store is None:
+                    parent_store = get_parent_store()
+                if parents and parent_store is not None:
+                    # родители пишутся раньше child'ов, ссылающихся на них
+                    parent_store.put_many(parents)
+                elif parents:
+                    # без store родителя негде хранить — оставляем в метаданных
+                    metas = [_sanitize_metadata(d.metadata or {}) for d in batch]
+                # батчи идут подряд — ids режутся тем же окном
+                batch_ids = (
+                    ids[offset : offset + len(batch)]
+                    if ids is not None
+                    else [str(uuid.uuid4()) for _ in batch]
+                )
+                offset += len(batch)
+                future = pool.submit(_embed_with_backoff, embed, texts, limiter)
+                pending.append((future, texts, metas, batch_ids))
+                while len(pending) >= window:
+                    _write(pending.popleft())
+            while pending:
+                _write(pending.popleft())
+        except BaseException:
+            for future, *_ in pending:
+                future.cancel()
+            raise
+
+    elapsed = time.perf_counter() - t0
+    logger.info(
+        f"Chroma add: {total} chunks за {elapsed:.1f}s "
+        f"({total / max(elapsed, 1e-9):.1f} chunks/s, in-flight {limiter.limit})"
+    )
+    if store is not None:
+        logger.info(f"Document embedding cache: {store.cache_stats()}")
+
+
+def create_vector_store(
+    chunks: List[Document], ids: Optional[List[str]] = None
+) -> Chroma:
+    logger.info("Создание новой векторной базы данных...")
+    vector_store = open_vector_store()
+    add_chunks(vector_store, chunks, ids=ids)
     logger.info(f"Векторная БД сохранена: {settings.CHROMA_DB_PATH}")
     return vector_store
 
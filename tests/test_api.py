@@ -0,0 +1,191 @@
+"""Tests for api.py — async /query and SSE /query/stream over a fake graph."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from config.settings import settings
+
+PASSAGE = {
+    "text": "Высота ограждения 1.1 м",
+    "metadata": {"source": "СП 1"},
+    "score": 0.9,
+}
+
+
+class FakeGraph:
+    """Минимальный compiled graph: astream(stream_mode=["updates", "values"])."""
+
+    def __init__(self, steps, fail_after=None):
+        self.steps = steps
+        self.fail_after = fail_after
+        self.closed = False
+
+    async def astream(self, state, stream_mode):
+        assert stream_mode == ["updates", "values"]
+        values = dict(state)
+        try:
+            for i, (node, update) in enumerate(self.steps):
+                if self.fail_after is not None and i == self.fail_after:
+                    raise RuntimeError("boom")
+                values.update(update)
+                yield "updates", {node: update}
+                yield "values", dict(values)
+        finally:
+            self.closed = True
+
+
+STEPS = [
+    ("intent_gate", {"status_message": "Анализ запроса"}),
+    (
+        "rag_simple",
+        {"final_passages": [PASSAGE], "status_message": "Найдено 1 фрагментов"},
+    ),
+    ("generate_answer", {"answer": "1.1 м"}),
+]
+
+
+def _events(body: str) -> list[tuple[str, object]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(api._pipeline, "app", FakeGraph(STEPS))
+    return TestClient(api.app)
+
+
+@pytest.mark.unit
+class TestQuery:
+    def test_returns_final_state(self, client):
+        resp = client.post("/query", json={"question": "высота ограждения"})
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["answer"] == "1.1 м"
+        assert body["passages"][0]["source"] == "СП 1"
+
+    def test_empty_question_rejected(self, client):
+        assert client.post("/query", json={"question": "  "}).status_code == 400
+
+    def test_pipeline_error_is_500(self, monkeypatch):
+        monkeypatch.setitem(api._pipeline, "app", FakeGraph(STEPS, fail_after=1))
+        resp = TestClient(api.app).post("/query", json={"question": "q"})
+        assert resp.status_code == 500
+
+
+@pytest.mark.unit
+class TestQueryStream:
+    def test_streams_status_passages_answer(self, client):
+        resp = client.post("/query/stream", json={"question": "высота ограждения"})
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/event-stream")
+
+        events = _events(resp.text)
+        kinds = [kind for kind, _ in events]
+        assert kinds == ["status", "status", "passages", "status", "answer"]
+        assert events[0][1] == {"node": "intent_gate", "message": "Анализ запроса"}
+        assert events[2][1][0]["source"] == "СП 1"
+        assert events[-1][1]["answer"] == "1.1 м"
+
+    def test_error_event_on_failure(self, monkeypatch):
+        graph = FakeGraph(STEPS, fail_after=1)
+        monkeypatch.setitem(api._pipeline, "app", graph)
+        resp = TestClient(api.app).post("/query/stream", json={"question": "q"})
+        kinds = [kind for kind, _ in _events(resp.text)]
+        assert kinds == ["status", "error"]
+        assert graph.closed
+
+    def test_not_initialized_is_503(self, monkeypatch):
+        monkeypatch.delitem(api._pipeline, "app", raising=False)
+        resp = TestClient(api.app).post("/query/stream", json={"question": "q"})
+        assert resp.status_code == 503
+
+
+@pytest.mark.unit
+class TestQueryBatch:
+    def test_dedupes_and_preserves_order(self, monkeypatch):
+        calls = []
+
+        class CountingGraph(FakeGraph):
+            async def astream(self, state, stream_mode):
+                calls.append(state["query"])
+                async for item in super().astream(state, stream_mode):
+                    yield item
+
+        monkeypatch.setitem(api._pipeline, "app", CountingGraph(STEPS))
+        questions = ["высота ограждения", "другой вопрос", "высота  ограждения "]
+        resp = TestClient(api.app).post("/query/batch", json={"questions": questions})
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["unique_questions"] == 2
+        assert sorted(calls) == ["высота ограждения", "другой вопрос"]
+        assert [r["question"] for r in body["results"]] == questions
+        assert all(r["answer"] == "1.1 м" for r in body["results"])
+
+    def test_empty_and_failing_items_reported(self, monkeypatch):
+        monkeypatch.setitem(api._pipeline, "app", FakeGraph(STEPS, fail_after=0))
+        resp = TestClient(api.app).post("/query/batch", json={"questions": ["q", " "]})
+        results = resp.json()["results"]
+        assert results[0]["error"].startswith("pipeline error")
+        assert results[1]["error"] == "question must not be empty"
+
+    def test_warms_embedding_cache_once(self, client, monkeypatch):
+        from unittest.mock import MagicMock
+
+        from src.embedding_cache import CachedEmbeddings
+
+        inner = MagicMock()
+        inner.embed_documents.side_effect = lambda ts: [[1.0] for _ in ts]
+        embeddings = CachedEmbeddings(inner, provider="openai", model="m")
+        monkeypatch.setitem(api._pipeline, "embeddings", embeddings)
+
+        client.post("/query/batch", json={"questions": ["a", "b", "a"]})
+        inner.embed_documents.assert_called_once_with(["a", "b"])
+
+    def test_too_many_questions_rejected(self, client, monkeypatch):
+        monkeypatch.setattr(settings, "API_BATCH_MAX_QUESTIONS", 1)
+        resp = client.post("/query/batch", json={"questions": ["a", "b"]})
+        assert resp.status_code == 413
+
+
+@pytest.mark.unit
+class TestAnswerCache:
+    @pytest.fixture
+    def cached_client(self, tmp_path, monkeypatch):
+        from src.semantic_cache import SemanticCache
+        from src.v7.answer_cache import CachedGraph
+
+        cache = SemanticCache(
+            cache_file=str(tmp_path / "answers.bin"),
+            model_name="fake",
+            encoder=lambda text: [1.0, 0.0],
+        )
+        graph = FakeGraph(STEPS)
+        monkeypatch.setitem(api._pipeline, "app", CachedGraph(graph, cache))
+        return TestClient(api.app), graph
+
+    def test_repeat_query_served_from_cache(self, cached_client):
+        client, graph = cached_client
+        first = client.post("/query", json={"question": "высота ограждения"}).json()
+        graph.steps = []  # граф больше не должен понадобиться
+        second = client.post("/query", json={"question": "высота ограждения?"}).json()
+        assert second["answer"] == first["answer"] == "1.1 м"
+        assert second["path"] == "answer_cache → END"
+        assert second["passages"] == first["passages"]
+
+    def test_stream_hit_events(self, cached_client):
+        client, graph = cached_client
+        client.post("/query", json={"question": "высота ограждения"})
+        resp = client.post("/query/stream", json={"question": "высота ограждения"})
+        events = _events(resp.text)
+        assert [kind for kind, _ in events] == ["status", "passages", "answer"]
+        assert events[0][1]["node"] == "answer_cache"
+        assert events[-1][1]["answer"] == "1.1 м"
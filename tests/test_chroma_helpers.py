@@ -1,6 +1,10 @@
 from unittest.mock import MagicMock
 
-from src.chroma_helpers import query_chunks_by_range, chroma_results_to_documents
+from src.chroma_helpers import (
+    chroma_results_to_documents,
+    collection_fingerprint,
+    query_chunks_by_range,
+)
 
 
 class TestChromaResultsToDocuments:
@@ -47,3 +51,15 @@ class TestQueryChunksByRange:
         mock_vs = MagicMock()
         mock_vs.get.side_effect = Exception("DB error")
         assert query_chunks_by_range(mock_vs, "a.pdf", 1, 5) == []
+
+
+class TestCollectionFingerprint:
+    def test_stable_for_same_ids(self):
+        assert collection_fingerprint(["a", "b"]) == collection_fingerprint(["a", "b"])
+
+    def test_changes_with_ids(self):
+        assert collection_fingerprint(["a", "b"]) != collection_fingerprint(["a", "c"])
+        assert collection_fingerprint(["a"]) != collection_fingerprint(["a", "b"])
+
+    def test_includes_count(self):
+        assert collection_fingerprint(["a", "b", "c"]).startswith("3:")
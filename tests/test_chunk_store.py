@@ -0,0 +1,102 @@
+"""Tests for src/chunk_store.py — columnar Docling chunk cache."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from langchain_core.documents import Document
+
+from src import chunk_store
+from src.chunk_store import iter_chunks, read_chunks, write_chunks
+
+PARENT = "Пункт 4.1. Ограждения должны иметь высоту не менее 1,1 м. " * 25
+
+
+def _grouped(i, **extra):
+    meta = {
+        "source": "СП 1.pdf",
+        "type": "grouped_text",
+        "chunk_id": i,
+        "parent_section": "4 Требования",
+        "bbox": json.dumps([10.0, 20.5, 300.0, 40.25]),
+        "page_no": 3,
+    }
+    meta.update(extra)
+    return Document(page_content=f"текст {i}", metadata=meta)
+
+
+@pytest.mark.unit
+class TestChunkStore:
+    def test_roundtrip_exact(self, tmp_path):
+        docs = [
+            _grouped(0),
+            Document(
+                page_content="4 Требования",
+                metadata={
+                    "source": "СП 1.pdf",
+                    "type": "header",
+                    "chunk_id": 7,
+                    "parent_section": "4 Требования",
+                    "bbox": None,
+                    "page_no": None,
+                },
+            ),
+            Document(page_content="без метаданных", metadata={}),
+        ]
+        path = tmp_path / "c.arrow"
+        write_chunks(path, docs)
+        assert read_chunks(path) == docs
+
+    def test_missing_keys_stay_missing(self, tmp_path):
+        doc = Document(page_content="x", metadata={"source": "a", "chunk_id": 1})
+        write_chunks(tmp_path / "c.arrow", [doc])
+        assert read_chunks(tmp_path / "c.arrow")[0].metadata == doc.metadata
+
+    def test_unknown_and_mistyped_values_go_to_extra(self, tmp_path):
+        doc = _grouped(0, chunk_id="7a", bbox="[1, 2, 3, 4]", custom={"k": [1, 2]})
+        write_chunks(tmp_path / "c.arrow", [doc])
+        assert read_chunks(tmp_path / "c.arrow")[0].metadata == doc.metadata
+
+    def test_parent_text_stored_once(self, tmp_path):
+        docs = [_grouped(i, parent_text=PARENT, child_idx=i) for i in range(40)]
+        write_chunks(tmp_path / "one.arrow", docs[:1])
+        write_chunks(tmp_path / "c.arrow", docs)
+
+        assert read_chunks(tmp_path / "c.arrow") == docs
+        arrow_size = (tmp_path / "c.arrow").stat().st_size
+        # 39 дополнительных child-чанков не повторяют parent_text
+        growth = arrow_size - (tmp_path / "one.arrow").stat().st_size
+        assert growth < 39 * len(PARENT.encode("utf-8")) / 20
+
+    def test_batches_read_lazily(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(chunk_store, "CHUNK_BATCH_ROWS", 4)
+        docs = [_grouped(i, parent_text=PARENT, child_idx=i) for i in range(10)]
+        write_chunks(tmp_path / "c.arrow", docs)
+
+        decoded = []
+        real = chunk_store._batch_documents
+        monkeypatch.setattr(
+            chunk_store,
+            "_batch_documents",
+            lambda batch: decoded.append(batch.num_rows) or real(batch),
+        )
+        it = iter_chunks(tmp_path / "c.arrow")
+        assert next(it) == docs[0]
+        assert decoded == [4]  # остальные batch'и ещё не трогали
+        assert [docs[0], *it] == docs
+        assert decoded == [4, 4, 2]
+
+    def test_empty(self, tmp_path):
+        write_chunks(tmp_path / "c.arrow", [])
+        assert read_chunks(tmp_path / "c.arrow") == []
+
+    def test_foreign_file_rejected(self, tmp_path):
+        import pyarrow as pa
+
+        table = pa.table({"text": ["a"]})
+        with pa.OSFile(str(tmp_path / "c.arrow"), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        with pytest.raises(ValueError):
+            read_chunks(tmp_path / "c.arrow")
@@ -167,3 +167,22 @@ class TestGetCorpusCentroid:
             get_corpus_centroid.cache_clear()
 
         assert centroid.shape == (dim,)
+
+    @pytest.mark.unit
+    def test_centroid_uses_saved_state_when_counts_match(self, tmp_path, monkeypatch):
+        """Сохранённый индексатором state заменяет вычитку всех эмбеддингов."""
+        from config.settings import settings
+        from src.v7.domain_gate import get_corpus_centroid, save_centroid_state
+
+        monkeypatch.setattr(settings, "CHROMA_DB_PATH", str(tmp_path))
+        save_centroid_state(np.array([3.0, 4.0]), 2)
+        mock_vs = MagicMock()
+        mock_vs._collection.count.return_value = 2
+
+        with patch("src.v7.domain_gate.load_vector_store", return_value=mock_vs):
+            get_corpus_centroid.cache_clear()
+            centroid = get_corpus_centroid()
+            get_corpus_centroid.cache_clear()
+
+        mock_vs._collection.get.assert_not_called()
+        np.testing.assert_allclose(centroid, [0.6, 0.8], rtol=1e-6)
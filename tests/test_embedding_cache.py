@@ -0,0 +1,144 @@
+"""Tests for src/embedding_cache.py — process-wide query-embedding cache."""
+
+from __future__ import annotations
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.embedding_cache import (
+    CachedEmbeddings,
+    DocumentEmbeddingStore,
+    embed_documents_cached,
+    embed_queries,
+)
+
+
+def _inner():
+    inner = MagicMock()
+    inner.embed_query.side_effect = lambda t: [float(len(t)), 1.0]
+    inner.embed_documents.side_effect = lambda ts: [[float(len(t)), 2.0] for t in ts]
+    return inner
+
+
+class TestCachedEmbeddings:
+    def test_repeated_query_hits_cache(self):
+        inner = _inner()
+        emb = CachedEmbeddings(inner, provider="openai", model="m")
+        first = emb.embed_query("высота ограждения")
+        second = emb.embed_query("высота ограждения")
+        assert first == second
+        inner.embed_query.assert_called_once()
+        assert emb.cache_stats()["hits"] == 1
+
+    def test_whitespace_normalized(self):
+        inner = _inner()
+        emb = CachedEmbeddings(inner, provider="openai", model="m")
+        emb.embed_query("высота  ограждения ")
+        emb.embed_query("высота ограждения")
+        inner.embed_query.assert_called_once()
+
+    def test_key_includes_model(self):
+        inner = _inner()
+        a = CachedEmbeddings(inner, provider="openai", model="m1")
+        b = CachedEmbeddings(inner, provider="openai", model="m2")
+        assert a._key("q") != b._key("q")
+
+    def test_lru_eviction(self):
+        inner = _inner()
+        emb = CachedEmbeddings(inner, provider="openai", model="m", maxsize=2)
+        emb.embed_query("a")
+        emb.embed_query("b")
+        emb.embed_query("c")  # evicts "a"
+        emb.embed_query("a")
+        assert inner.embed_query.call_count == 4
+        assert emb.cache_stats()["size"] == 2
+
+    def test_embed_queries_batches_only_misses(self):
+        inner = _inner()
+        emb = CachedEmbeddings(inner, provider="openai", model="m")
+        emb.embed_query("cached")
+        vectors = emb.embed_queries(["cached", "new one", "new two"])
+        assert len(vectors) == 3
+        inner.embed_documents.assert_called_once_with(["new one", "new two"])
+
+    def test_embed_documents_not_cached(self):
+        inner = _inner()
+        emb = CachedEmbeddings(inner, provider="openai", model="m")
+        emb.embed_documents(["chunk"])
+        emb.embed_documents(["chunk"])
+        assert inner.embed_documents.call_count == 2
+        assert emb.cache_stats()["size"] == 0
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        path = str(tmp_path / "emb.sqlite")
+        CachedEmbeddings(_inner(), provider="openai", model="m", disk_path=path)
+        first = CachedEmbeddings(_inner(), provider="openai", model="m", disk_path=path)
+        vector = first.embed_query("запрос")
+
+        inner = _inner()
+        second = CachedEmbeddings(inner, provider="openai", model="m", disk_path=path)
+        assert second.embed_query("запрос") == pytest.approx(vector)
+        inner.embed_query.assert_not_called()
+
+
+class TestEmbedQueries:
+    def test_plain_embeddings_use_embed_documents(self):
+        inner = _inner()
+        embed_queries(inner, ["a", "b"])
+        inner.embed_documents.assert_called_once_with(["a", "b"])
+
+
+class TestGetEmbeddingModel:
+    def test_returns_shared_cached_instance(self):
+        from src import llm_factory
+
+        factory = MagicMock(side_effect=lambda: _inner())
+        llm_factory._cached_embedding_model.cache_clear()
+        with patch.dict(llm_factory._EMBEDDING_PROVIDERS, {"openai": factory}):
+            with patch.object(llm_factory.settings, "EMBEDDING_PROVIDER", "openai"):
+                a = llm_factory.get_embedding_model()
+                b = llm_factory.get_embedding_model()
+        llm_factory._cached_embedding_model.cache_clear()
+        assert a is b
+        assert isinstance(a, CachedEmbeddings)
+        factory.assert_called_once()
+
+
+class TestDocumentEmbeddingStore:
+    def test_only_misses_go_to_provider(self, tmp_path):
+        store = DocumentEmbeddingStore(str(tmp_path / "docs.sqlite"))
+        inner = _inner()
+        emb = CachedEmbeddings(inner, provider="openai", model="m")
+
+        first = embed_documents_cached(emb, ["a", "bb"], store)
+        second = embed_documents_cached(emb, ["bb", "ccc", "a"], store)
+
+        assert [c.args[0] for c in inner.embed_documents.call_args_list] == [
+            ["a", "bb"],
+            ["ccc"],
+        ]
+        assert second[0] == pytest.approx(first[1])
+        assert second[2] == pytest.approx(first[0])
+        assert store.cache_stats()["hits"] == 2
+
+    def test_duplicate_texts_embedded_once(self, tmp_path):
+        store = DocumentEmbeddingStore(str(tmp_path / "docs.sqlite"))
+        inner = _inner()
+        vectors = embed_documents_cached(inner, ["x", "x", "y"], store)
+        inner.embed_documents.assert_called_once_with(["x", "y"])
+        assert vectors[0] == vectors[1]
+
+    def test_key_includes_model(self, tmp_path):
+        store = DocumentEmbeddingStore(str(tmp_path / "docs.sqlite"))
+        inner = _inner()
+        embed_documents_cached(CachedEmbeddings(inner, "openai", "m1"), ["a"], store)
+        embed_documents_cached(CachedEmbeddings(inner, "openai", "m2"), ["a"], store)
+        assert inner.embed_documents.call_count == 2
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "docs.sqlite")
+        embed_documents_cached(_inner(), ["a"], DocumentEmbeddingStore(path))
+        inner = _inner()
+        embed_documents_cached(inner, ["a"], DocumentEmbeddingStore(path))
+        inner.embed_documents.assert_not_called()
@@ -0,0 +1,159 @@
+"""DocumentProcessor: порядок, кэш и пул воркеров при параллельной конвертации."""
+
+from __future__ import annotations
+
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("docling")
+
+from langchain_core.documents import Document  # noqa: E402
+
+from config.settings import settings  # noqa: E402
+from src import file_handler  # noqa: E402
+from src.file_handler import DocumentProcessor  # noqa: E402
+
+
+_REAL_CONVERT = DocumentProcessor._convert_and_extract
+
+
+class _ThreadPool(ThreadPoolExecutor):
+    """ProcessPoolExecutor-совместимая подмена: mp_context игнорируется."""
+
+    def __init__(self, max_workers=None, mp_context=None):
+        super().__init__(max_workers=max_workers)
+
+
+def _fake_convert(self, source, source_name, file_hash):
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            source = f.read()
+    return [Document(page_content=source.decode(), metadata={"source": source_name})]
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(DocumentProcessor, "_convert_and_extract", _fake_convert)
+    monkeypatch.setattr(file_handler, "ProcessPoolExecutor", _ThreadPool)
+    monkeypatch.setattr(file_handler, "_worker_processor", None)
+    paths = []
+    for i in range(5):
+        p = tmp_path / f"doc{i}.pdf"
+        p.write_text(f"text {i}")
+        paths.append(str(p))
+    return paths
+
+
+@pytest.mark.unit
+class TestParallelProcess:
+    def test_results_in_file_order(self, sources):
+        chunks = DocumentProcessor(workers=3).process(sources)
+        assert [c.page_content for c in chunks] == [f"text {i}" for i in range(5)]
+
+    def test_parallel_matches_serial(self, sources):
+        serial = DocumentProcessor(workers=1).process(sources)
+        parallel = DocumentProcessor(workers=4).process(sources)
+        assert [c.page_content for c in serial] == [c.page_content for c in parallel]
+
+    def test_cache_written_and_reused(self, sources, monkeypatch):
+        DocumentProcessor(workers=2).process(sources)
+
+        def _boom(*args, **kwargs):
+            raise AssertionError("cache miss")
+
+        monkeypatch.setattr(file_handler, "_convert_in_worker", _boom)
+        chunks = DocumentProcessor(workers=2).process(sources)
+        assert len(chunks) == 5
+
+    def test_failed_file_skipped(self, sources, monkeypatch):
+        def _flaky(self, source, source_name, file_hash):
+            if source_name == "doc2.pdf":
+                raise RuntimeError("layout failed")
+            return _fake_convert(self, source, source_name, file_hash)
+
+        monkeypatch.setattr(DocumentProcessor, "_convert_and_extract", _flaky)
+        chunks = DocumentProcessor(workers=2).process(sources)
+        assert [c.metadata["source"] for c in chunks] == [
+            "doc0.pdf",
+            "doc1.pdf",
+            "doc3.pdf",
+            "doc4.pdf",
+        ]
+
+    def test_converter_created_lazily(self, sources):
+        processor = DocumentProcessor()
+        assert processor._docling_converter is None
+
+
+@pytest.mark.unit
+class TestChunkCache:
+    def test_cache_is_arrow(self, sources):
+        processor = DocumentProcessor()
+        processor.process(sources[:1])
+        assert [p.suffix for p in processor.cache_dir.iterdir()] == [".arrow"]
+
+    def test_legacy_pickle_migrated(self, sources, monkeypatch):
+        import pickle
+        from datetime import datetime
+
+        processor = DocumentProcessor()
+        file_hash = processor._hash_file(sources[0])
+        cache_path = processor._cache_path_for(file_hash)
+        legacy = cache_path.with_suffix(".pkl")
+        entry = file_handler.CacheEntry(
+            timestamp=datetime.now().timestamp(),
+            chunks=[Document(page_content="from pickle", metadata={"source": "x"})],
+        )
+        with open(legacy, "wb") as f:
+            pickle.dump(entry, f)
+
+        def _boom(*args, **kwargs):
+            raise AssertionError("legacy cache ignored")
+
+        monkeypatch.setattr(DocumentProcessor, "_convert_and_extract", _boom)
+        chunks = processor.process(sources[:1])
+        assert [c.page_content for c in chunks] == ["from pickle"]
+        assert cache_path.exists() and not legacy.exists()
+
+
+@pytest.mark.unit
+class TestStreamingIngestion:
+    def test_path_passed_to_docling_without_copy(self, sources, monkeypatch):
+        seen = []
+        monkeypatch.setattr(DocumentProcessor, "_convert_and_extract", _REAL_CONVERT)
+        monkeypatch.setattr(
+            DocumentProcessor,
+            "_convert_path",
+            lambda self, path, name: seen.append(path) or [],
+        )
+        DocumentProcessor().process(sources[:1])
+        assert seen == sources[:1]
+
+    def test_upload_spilled_to_temp_file(self, sources, monkeypatch):
+        seen = []
+
+        def _convert_path(self, path, name):
+            with open(path, "rb") as f:
+                seen.append((path, name, f.read()))
+            return []
+
+        monkeypatch.setattr(DocumentProcessor, "_convert_path", _convert_path)
+        monkeypatch.setattr(DocumentProcessor, "_convert_and_extract", _REAL_CONVERT)
+        upload = io.BytesIO(b"uploaded bytes")
+        upload.name = "upload.pdf"
+        DocumentProcessor().process([upload])
+        [(path, name, data)] = seen
+        assert name == "upload.pdf" and data == b"uploaded bytes"
+        assert path.endswith(".pdf") and path not in sources
+
+    def test_path_and_upload_share_cache_key(self, sources):
+        processor = DocumentProcessor()
+        with open(sources[0], "rb") as f:
+            upload = io.BytesIO(f.read())
+        upload.name = "doc0.pdf"
+        processor.process(sources[:1])
+        job = processor._prepare(upload)
+        assert job is not None and job[-1] is not None  # кэш-хит
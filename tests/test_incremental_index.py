@@ -0,0 +1,211 @@
+"""Tests for src/incremental_index.py — manifest-driven incremental sync."""
+
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from config.settings import settings
+from src.incremental_index import (
+    MANIFEST_FILE,
+    IndexManifest,
+    chunk_ids_for,
+    plan_changes,
+    sync_index,
+)
+from src.v7.domain_gate import load_centroid_state
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows: dict[str, tuple[str, list[float]]] = {}
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, ids=None, include=None):
+        keys = list(self.rows) if ids is None else [k for k in ids if k in self.rows]
+        return {"ids": keys, "embeddings": [self.rows[k][1] for k in keys]}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for doc_id, vector, text in zip(ids, embeddings, documents):
+            self.rows[doc_id] = (text, vector)
+
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+class FakeStore:
+    def __init__(self):
+        self._collection = FakeCollection()
+        self.embeddings = FakeEmbeddings()
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self._collection.rows.pop(doc_id, None)
+
+
+class FakeProcessor:
+    """Одна строка файла → один чанк; failing — пути, которые «падают» в Docling.
+
+    Как DocumentProcessor.iter_chunks: упавший файл не отдаётся вовсе.
+    """
+
+    def __init__(self, failing=()):
+        self.converted: list[str] = []
+        self.failing = set(failing)
+
+    def iter_chunks(self, paths):
+        for path in paths:
+            self.converted.append(path)
+            if path in self.failing:
+                continue
+            with open(path, encoding="utf-8") as f:
+                lines = [line for line in f.read().splitlines() if line]
+            yield path, [Document(page_content=line) for line in lines]
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    chroma = tmp_path / "chroma"
+    chroma.mkdir()
+    monkeypatch.setattr(settings, "CHROMA_DB_PATH", str(chroma))
+    monkeypatch.setattr(settings, "DOC_EMBEDDING_CACHE_PATH", "")
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for name, body in {"a.pdf": "alpha\nbeta", "b.pdf": "gamma"}.items():
+        (docs / name).write_text(body, encoding="utf-8")
+    return {
+        "docs": docs,
+        "manifest": str(chroma / MANIFEST_FILE),
+        "store": FakeStore(),
+    }
+
+
+def _paths(library):
+    return sorted(str(p) for p in library["docs"].iterdir())
+
+
+def _sync(library, processor=None):
+    processor = processor or FakeProcessor()
+    manifest = IndexManifest.load(library["manifest"], "k") or IndexManifest(key="k")
+    plan = sync_index(
+        library["store"], processor, manifest, _paths(library), library["manifest"]
+    )
+    return plan, processor
+
+
+def _assert_centroid_consistent(store):
+    total, count = load_centroid_state()
+    rows = np.array([emb for _, emb in store._collection.rows.values()])
+    assert count == len(rows)
+    np.testing.assert_allclose(total, rows.sum(axis=0))
+
+
+@pytest.mark.unit
+class TestSyncIndex:
+    def test_first_run_indexes_everything(self, library):
+        plan, _ = _sync(library)
+        assert len(plan.added) == 2
+        assert library["store"]._collection.count() == 3
+        manifest = IndexManifest.load(library["manifest"], "k")
+        assert sum(len(e.chunk_ids) for e in manifest.files.values()) == 3
+        _assert_centroid_consistent(library["store"])
+
+    def test_second_run_is_noop(self, library):
+        _sync(library)
+        plan, processor = _sync(library)
+        assert not plan.has_changes
+        assert processor.converted == []
+
+    def test_changed_file_replaces_its_chunks(self, library):
+        _sync(library)
+        (library["docs"] / "a.pdf").write_text("alpha\ndelta\nepsilon")
+        plan, processor = _sync(library)
+        assert [os.path.basename(p) for p in plan.changed] == ["a.pdf"]
+        assert [os.path.basename(p) for p in processor.converted] == ["a.pdf"]
+        texts = sorted(t for t, _ in library["store"]._collection.rows.values())
+        assert texts == ["alpha", "delta", "epsilon", "gamma"]
+        _assert_centroid_consistent(library["store"])
+
+    def test_removed_file_chunks_deleted(self, library):
+        _sync(library)
+        (library["docs"] / "b.pdf").unlink()
+        plan, _ = _sync(library)
+        assert [os.path.basename(p) for p in plan.removed] == ["b.pdf"]
+        texts = sorted(t for t, _ in library["store"]._collection.rows.values())
+        assert texts == ["alpha", "beta"]
+        _assert_centroid_consistent(library["store"])
+
+    def test_touch_without_edit_not_reconverted(self, library):
+        _sync(library)
+        path = library["docs"] / "a.pdf"
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+        plan, processor = _sync(library)
+        assert not plan.has_changes
+        assert processor.converted == []
+
+    def test_failed_conversion_keeps_old_chunks(self, library):
+        _sync(library)
+        path = library["docs"] / "a.pdf"
+        path.write_text("broken")
+        _sync(library, FakeProcessor(failing={str(path)}))
+        texts = sorted(t for t, _ in library["store"]._collection.rows.values())
+        assert texts == ["alpha", "beta", "gamma"]
+
+        # следующий запуск повторяет файл
+        plan, _ = _sync(library)
+        assert [os.path.basename(p) for p in plan.changed] == ["a.pdf"]
+
+    def test_docling_failure_with_real_processor(self, library, tmp_path, monkeypatch):
+        pytest.importorskip("docling")
+        from src.file_handler import DocumentProcessor
+
+        class BrokenConverter:
+            def convert(self, path):
+                raise RuntimeError("docling crashed")
+
+        _sync(library)
+        path = library["docs"] / "a.pdf"
+        path.write_text("broken")
+        monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "doc_cache"))
+        processor = DocumentProcessor(workers=1)
+        processor._docling_converter = BrokenConverter()
+        _sync(library, processor)
+
+        texts = sorted(t for t, _ in library["store"]._collection.rows.values())
+        assert texts == ["alpha", "beta", "gamma"]
+        assert not any(
+            (tmp_path / "doc_cache").iterdir()
+        )  # пустой результат не закэширован
+        plan, _ = _sync(library)
+        assert [os.path.basename(p) for p in plan.changed] == ["a.pdf"]
+
+
+@pytest.mark.unit
+class TestManifest:
+    def test_other_key_ignored(self, library):
+        _sync(library)
+        assert IndexManifest.load(library["manifest"], "other") is None
+
+    def test_missing_manifest_is_none(self, tmp_path):
+        assert IndexManifest.load(str(tmp_path / "nope.json"), "k") is None
+
+    def test_chunk_ids_depend_on_path_and_hash(self):
+        assert chunk_ids_for("a", "h", 2) != chunk_ids_for("b", "h", 2)
+        assert chunk_ids_for("a", "h", 2) != chunk_ids_for("a", "h2", 2)
+        assert chunk_ids_for("a", "h", 2) == chunk_ids_for("a", "h", 2)
+
+    def test_chunk_ids_depend_on_manifest_key(self):
+        # --full после смены PIPELINE_VERSION / модели → новые ids и fingerprint
+        assert chunk_ids_for("a", "h", 2, "v1|m") != chunk_ids_for("a", "h", 2, "v2|m")
+
+    def test_plan_detects_new_files(self, library):
+        plan = plan_changes(IndexManifest(key="k"), _paths(library))
+        assert len(plan.added) == 2 and not plan.removed
@@ -1,4 +1,5 @@
-"""Регрессия: index.main() должен инвалидировать BM25-cache и Docling-cache.
+"""Регрессия: полная переиндексация (index.main(full=True) или первый запуск
+без манифеста) должна инвалидировать BM25-cache и Docling-cache.
 
 Без этого после destructive reindex поиск идёт по удалённым чанкам.
 """
@@ -22,24 +23,35 @@ def fake_caches(tmp_path, monkeypatch):
     (cache_dir / "fake.pkl").write_bytes(b"stale")
     bm25 = tmp_path / ".bm25_cache.pkl"
     bm25.write_bytes(b"stale")
+    snapshot = tmp_path / ".bm25_snapshot"
+    snapshot.mkdir()
+    (snapshot / "postings.npz").write_bytes(b"stale")
 
     from config.settings import settings
+    from src.v7.config import v7_config
 
     monkeypatch.setattr(settings, "CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(v7_config, "BM25_SNAPSHOT_DIR", str(snapshot))
     monkeypatch.setattr(settings, "CHROMA_DB_PATH", str(chroma_dir))
     monkeypatch.setattr(settings, "SOURCE_DOCS_PATH", str(src_dir))
     monkeypatch.chdir(tmp_path)
-    return {"cache_dir": cache_dir, "chroma": chroma_dir, "bm25": bm25}
+    return {
+        "cache_dir": cache_dir,
+        "chroma": chroma_dir,
+        "bm25": bm25,
+        "snapshot": snapshot,
+    }
 
 
 def test_main_clears_bm25_and_docling_cache(fake_caches):
     import index
 
-    with patch.object(index, "create_vector_store"):
-        index.main()
+    with patch.object(index, "open_vector_store"):
+        index.main(full=True)
 
     assert not fake_caches["cache_dir"].exists(), "Docling cache must be removed"
     assert not fake_caches["bm25"].exists(), "BM25 cache must be removed"
+    assert not fake_caches["snapshot"].exists(), "BM25 snapshot must be removed"
 
 
 def test_main_handles_missing_caches_gracefully(tmp_path, monkeypatch):
@@ -55,5 +67,5 @@ def test_main_handles_missing_caches_gracefully(tmp_path, monkeypatch):
 
     import index
 
-    with patch.object(index, "create_vector_store"):
+    with patch.object(index, "open_vector_store"):
         index.main()  # should not raise
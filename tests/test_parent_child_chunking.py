@@ -0,0 +1,67 @@
+"""Parent/child chunking end to end: Docling items → Chroma children → parents."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("docling")
+
+from config.settings import settings  # noqa: E402
+from src import vector_store as vs_mod  # noqa: E402
+from src.file_handler import (  # noqa: E402
+    CHILD_CHUNK_SIZE,
+    DocumentProcessor,
+    pipeline_key,
+)
+from src.parent_store import ParentStore, expand_to_parents  # noqa: E402
+
+ITEMS = [
+    "4.1 Ограждения должны иметь высоту не менее 1,1 м. " * 6,
+    "4.2 Поручни выполняются без острых кромок и заусенцев. " * 6,
+]
+PARENT = "\n".join(t.strip() for t in ITEMS)
+
+
+def _chunks(tmp_path, monkeypatch, enabled):
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "PARENT_CHILD_CHUNKS", enabled)
+    doc = SimpleNamespace(texts=[SimpleNamespace(text=t, prov=[]) for t in ITEMS])
+    return DocumentProcessor()._process_docling_document(doc, "СП 1.pdf")
+
+
+@pytest.mark.unit
+class TestParentChildChunking:
+    def test_disabled_keeps_grouped_chunks(self, tmp_path, monkeypatch):
+        chunks = _chunks(tmp_path, monkeypatch, enabled=False)
+        assert [c.page_content for c in chunks] == [PARENT]
+        assert "parent_id" not in chunks[0].metadata
+
+    def test_children_indexed_and_resolved_to_parent(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "DOC_EMBEDDING_CACHE_PATH", "")
+        chunks = _chunks(tmp_path, monkeypatch, enabled=True)
+        assert len(chunks) > 1
+        assert all(len(c.page_content) <= CHILD_CHUNK_SIZE for c in chunks)
+
+        parents = ParentStore(str(tmp_path / "parents.sqlite"))
+        store = MagicMock()
+        store.embeddings.embed_documents.side_effect = lambda ts: [[1.0] for _ in ts]
+        vs_mod.add_chunks(store, chunks, parent_store=parents)
+
+        written = store._collection.upsert.call_args.kwargs
+        assert all("parent_text" not in m for m in written["metadatas"])
+        hits = [
+            {"text": text, "metadata": meta, "score": 1.0}
+            for text, meta in zip(written["documents"], written["metadatas"])
+        ][::-1]
+        resolved = expand_to_parents(hits, parents)
+        assert [p["text"] for p in resolved] == [PARENT]
+        assert resolved[0]["metadata"]["source"] == "СП 1.pdf"
+
+    def test_mode_changes_pipeline_key(self, monkeypatch):
+        monkeypatch.setattr(settings, "PARENT_CHILD_CHUNKS", False)
+        grouped = pipeline_key()
+        monkeypatch.setattr(settings, "PARENT_CHILD_CHUNKS", True)
+        assert pipeline_key() != grouped
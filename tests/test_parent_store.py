@@ -0,0 +1,85 @@
+"""Tests for src/parent_store.py — parent_id → parent_text store and resolution."""
+
+from __future__ import annotations
+
+import pytest
+
+from src.parent_store import ParentStore, expand_to_parents, parent_id_for
+
+
+def _passage(text, parent_id=None, score=0.5):
+    meta = {"source": "doc.pdf"}
+    if parent_id:
+        meta["parent_id"] = parent_id
+    return {"text": text, "metadata": meta, "score": score}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ParentStore(str(tmp_path / "parents.sqlite"))
+
+
+@pytest.mark.unit
+class TestParentStore:
+    def test_roundtrip_and_missing(self, store):
+        store.put_many({"p1": "раздел 1", "p2": "раздел 2"})
+        assert store.get_many(["p1", "p2", "nope"]) == {
+            "p1": "раздел 1",
+            "p2": "раздел 2",
+        }
+        assert store.count() == 2
+
+    def test_put_is_idempotent(self, store):
+        store.put_many({"p1": "раздел"})
+        store.put_many({"p1": "раздел"})
+        assert store.count() == 1
+
+    def test_get_many_beyond_sqlite_param_limit(self, store):
+        items = {f"p{i}": f"text {i}" for i in range(1200)}
+        store.put_many(items)
+        assert store.get_many(items) == items
+
+    def test_parent_id_is_content_addressed(self):
+        assert parent_id_for("a") == parent_id_for("a")
+        assert parent_id_for("a") != parent_id_for("b")
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "parents.sqlite")
+        ParentStore(path).put_many({"p1": "раздел"})
+        assert ParentStore(path).get_many(["p1"]) == {"p1": "раздел"}
+
+
+@pytest.mark.unit
+class TestExpandToParents:
+    def test_children_collapse_into_first_occurrence(self, store):
+        store.put_many({"p1": "полный раздел 1", "p2": "полный раздел 2"})
+        passages = [
+            _passage("child a", "p1", 0.9),
+            _passage("plain", None, 0.8),
+            _passage("child b", "p2", 0.7),
+            _passage("child c", "p1", 0.6),
+        ]
+        out = expand_to_parents(passages, store)
+        assert [p["text"] for p in out] == [
+            "полный раздел 1",
+            "plain",
+            "полный раздел 2",
+        ]
+        assert out[0]["score"] == 0.9
+
+    def test_unknown_parent_keeps_child_text(self, store):
+        passages = [_passage("child", "missing")]
+        assert expand_to_parents(passages, store) == passages
+
+    def test_no_store_is_noop(self):
+        passages = [_passage("child", "p1")]
+        assert expand_to_parents(passages, None) is passages
+
+    def test_single_batched_lookup(self, store, monkeypatch):
+        calls = []
+        original = store.get_many
+        monkeypatch.setattr(
+            store, "get_many", lambda ids: calls.append(set(ids)) or original(ids)
+        )
+        expand_to_parents([_passage("a", "p1"), _passage("b", "p2")], store)
+        assert calls == [{"p1", "p2"}]
@@ -0,0 +1,253 @@
+"""Tests for src/reranker.py — shared FlashRank rankers and batched scoring."""
+
+from __future__ import annotations
+
+import sys
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src import reranker as rr
+
+
+class FakeEncoding:
+    def __init__(self, query, text):
+        self.query, self.text = query, text
+        self.ids = [len(query), len(text)]
+        self.type_ids = [0, 1]
+        self.attention_mask = [1, 1]
+
+
+class FakeTokenizer:
+    def encode_batch(self, pairs):
+        return [FakeEncoding(q, t) for q, t in pairs]
+
+
+class FakeSession:
+    """Logit = число общих слов query и текста (по последнему encode_batch)."""
+
+    def __init__(self, tokenizer):
+        self.runs = []
+        self._tokenizer = tokenizer
+
+    def run(self, _outputs, onnx_input):
+        batch = self._tokenizer.last
+        self.runs.append(len(batch))
+        assert onnx_input["input_ids"].shape == (len(batch), 2)
+        logits = [
+            [float(len(set(e.query.split()) & set(e.text.split())))] for e in batch
+        ]
+        return [np.array(logits, dtype=np.float32)]
+
+
+class FakeRanker:
+    created = 0
+
+    def __init__(self, model_name, cache_dir):
+        FakeRanker.created += 1
+        self.model_name = model_name
+        tokenizer = FakeTokenizer()
+        encode = tokenizer.encode_batch
+
+        def _encode(pairs):
+            tokenizer.last = encode(pairs)
+            return tokenizer.last
+
+        tokenizer.encode_batch = _encode
+        self.tokenizer = tokenizer
+        self.session = FakeSession(tokenizer)
+
+
+@pytest.fixture(autouse=True)
+def fake_flashrank(monkeypatch):
+    module = types.ModuleType("flashrank")
+    module.Ranker = FakeRanker
+    module.RerankRequest = lambda query, passages: types.SimpleNamespace(
+        query=query, passages=passages
+    )
+    monkeypatch.setitem(sys.modules, "flashrank", module)
+    FakeRanker.created = 0
+    rr.clear_rankers()
+    yield module
+    rr.clear_rankers()
+
+
+@pytest.mark.unit
+class TestRegistry:
+    def test_loaded_once_across_threads(self):
+        barrier = threading.Barrier(8)
+
+        def _get(_):
+            barrier.wait()
+            return rr.get_ranker("m", "cache")
+
+        with ThreadPoolExecutor(8) as pool:
+            rankers = list(pool.map(_get, range(8)))
+        assert FakeRanker.created == 1
+        assert all(r is rankers[0] for r in rankers)
+
+    def test_defaults_from_settings(self, monkeypatch):
+        monkeypatch.setattr(rr.settings, "RERANKING_MODEL", "model-x")
+        assert rr.get_ranker().model_name == "model-x"
+        assert rr.get_ranker("model-x") is rr.get_ranker()
+
+
+@pytest.mark.unit
+class TestScoreBatch:
+    def test_one_session_run_for_several_queries(self):
+        scores = rr.score_batch(
+            [
+                ("высота ограждений", ["высота ограждений 1.1 м", "сроки"]),
+                ("сроки инструктажа", ["инструктажа сроки", "нет", "сроки"]),
+            ]
+        )
+        assert rr.get_ranker().session.runs == [5]
+        assert [len(s) for s in scores] == [2, 3]
+        # sigmoid от числа общих слов
+        assert scores[0][0] == pytest.approx(1 / (1 + np.exp(-2.0)))
+        assert scores[1][1] == pytest.approx(0.5)
+
+    def test_large_batch_split_into_runs(self, monkeypatch):
+        monkeypatch.setattr(rr, "MAX_PAIRS_PER_RUN", 4)
+        scores = rr.score_batch(
+            [("q", [f"q {i}" for i in range(5)]), ("q", [f"x {i}" for i in range(4)])]
+        )
+        assert rr.get_ranker().session.runs == [4, 4, 1]
+        assert [len(s) for s in scores] == [5, 4]
+
+    def test_feed_follows_session_inputs(self):
+        class T5Session(FakeSession):
+            """Граф без token_type_ids (rank-T5-flan)."""
+
+            def get_inputs(self):
+                return [
+                    types.SimpleNamespace(name="input_ids"),
+                    types.SimpleNamespace(name="attention_mask"),
+                ]
+
+            def run(self, outputs, onnx_input):
+                assert set(onnx_input) == {"input_ids", "attention_mask"}
+                return super().run(outputs, onnx_input)
+
+        ranker = rr.get_ranker()
+        ranker.session = T5Session(ranker.tokenizer)
+        scores = rr.score_batch([("высота ограждений", ["высота", "нет"])])
+        assert ranker.session.runs == [2]
+        assert scores[0][0] == pytest.approx(1 / (1 + np.exp(-1.0)))
+
+    @pytest.mark.parametrize("type_ids, sent", [([0, 1], True), ([0, 0], False)])
+    def test_type_ids_without_input_list(self, monkeypatch, type_ids, sent):
+        # сессия без get_inputs: как Ranker.rerank — только ненулевые type ids
+        def encode_batch(self, pairs):
+            encoded = [FakeEncoding(q, t) for q, t in pairs]
+            for e in encoded:
+                e.type_ids = type_ids
+            return encoded
+
+        feeds = []
+        run = FakeSession.run
+        monkeypatch.setattr(FakeTokenizer, "encode_batch", encode_batch)
+        monkeypatch.setattr(
+            FakeSession,
+            "run",
+            lambda self, o, feed: feeds.append(feed) or run(self, o, feed),
+        )
+        rr.score_batch([("q", ["a"])])
+        assert ("token_type_ids" in feeds[0]) is sent
+
+    def test_ranker_without_session_uses_rerank(self, fake_flashrank):
+        class ListwiseRanker:
+            def __init__(self, model_name, cache_dir):
+                self.calls = 0
+
+            def rerank(self, request):
+                self.calls += 1
+                return [
+                    {"id": p["id"], "score": float(len(p["text"]))}
+                    for p in request.passages
+                ]
+
+        fake_flashrank.Ranker = ListwiseRanker
+        scores = rr.score_batch([("q", ["aa", "a"]), ("q", ["aaa"])])
+        assert scores == [[2.0, 1.0], [3.0]]
+        assert rr.get_ranker().calls == 2
+
+
+@pytest.mark.unit
+class TestScoreCache:
+    def test_overlapping_candidates_scored_once(self):
+        first = rr.score_batch([("высота ограждений", ["a", "b", "c"])])
+        second = rr.score_batch([("  высота   ограждений ", ["c", "d", "a"])])
+        assert rr.get_ranker().session.runs == [3, 1]
+        assert second[0][0] == first[0][2] and second[0][2] == first[0][0]
+
+    def test_duplicates_within_request_scored_once(self):
+        scores = rr.score_batch([("q", ["a", "a", "b"]), ("q", ["b"])])
+        assert rr.get_ranker().session.runs == [3]  # a, b | b
+        assert scores[0][0] == scores[0][1]
+
+    def test_key_includes_query_and_model(self):
+        rr.score_batch([("q1", ["a"])])
+        rr.score_batch([("q2", ["a"])])
+        rr.score_batch([("q1", ["a"])], model_name="other")
+        assert rr.get_ranker().session.runs == [1, 1]
+        assert rr.get_ranker("other").session.runs == [1]
+
+    def test_lru_bound(self, monkeypatch):
+        monkeypatch.setattr(rr, "_score_cache", rr.ScoreCache(2))
+        rr.score_batch([("q", ["a", "b", "c"])])
+        assert len(rr._score_cache) == 2
+        rr.score_batch([("q", ["a"])])  # вытеснен
+        assert rr.get_ranker().session.runs == [3, 1]
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(rr, "_score_cache", rr.ScoreCache(0))
+        rr.score_batch([("q", ["a"])])
+        rr.score_batch([("q", ["a"])])
+        assert rr.get_ranker().session.runs == [1, 1]
+
+
+@pytest.mark.unit
+class TestRank:
+    def test_order_and_top_n(self):
+        texts = ["нет", "высота ограждений", "высота"]
+        ranked = rr.rank("высота ограждений", texts, top_n=2)
+        assert [i for i, _ in ranked] == [1, 2]
+
+    def test_empty(self):
+        assert rr.rank("q", []) == []
+        assert FakeRanker.created == 0
+
+
+@pytest.mark.unit
+class TestConsumers:
+    def test_v7_rerank_fn_shares_ranker(self):
+        from src.v7.bridge import make_rerank_fn
+
+        fn = make_rerank_fn()
+        assert FakeRanker.created == 1
+        out = fn(
+            "высота ограждений",
+            [
+                {"text": "нет", "score": 0.9},
+                {"text": "высота ограждений", "score": 0.4},
+            ],
+            1,
+        )
+        assert out[0]["text"] == "высота ограждений"
+        assert out[0]["vector_score"] == 0.4
+        assert out[0]["score"] == round(1 / (1 + np.exp(-2.0)), 4)
+
+        from src.gosts_pipeline import _rerank
+
+        passages = [
+            {"text": "нет", "vector_score": 0.9},
+            {"text": "высота ограждений", "vector_score": 0.4},
+        ]
+        reranked = _rerank("высота ограждений", passages, top_n=2)
+        assert [p["text"] for p in reranked] == ["высота ограждений", "нет"]
+        assert reranked[0]["score"] == 0.4  # gosts отдаёт vector score
+        assert FakeRanker.created == 1
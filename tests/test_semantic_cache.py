@@ -0,0 +1,475 @@
+"""Tests for src/semantic_cache.py — normalized matrix lookup and append-only log."""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from config.settings import settings
+from src import semantic_cache as sc_mod
+from src.semantic_cache import SemanticCache
+
+
+class FakeModel:
+    """Детерминированный encoder: вектор задаётся словарём, иначе — из хэша текста."""
+
+    vectors = {
+        "высота ограждений": [1.0, 0.0, 0.0],
+        "какая высота ограждений": [0.99, 0.05, 0.0],
+        "сроки инструктажа": [0.0, 1.0, 0.0],
+    }
+
+    def __init__(self, name):
+        self.name = name
+
+    def encode(self, text):
+        if text in self.vectors:
+            return np.array(self.vectors[text], dtype=np.float32) * 3.0
+        rng = np.random.default_rng(abs(hash(text)) % (2**32))
+        return rng.standard_normal(3).astype(np.float32)
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert predicate()
+
+
+@pytest.fixture
+def cache_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(sc_mod, "SentenceTransformer", FakeModel)
+    return str(tmp_path / "semantic_cache.bin")
+
+
+@pytest.mark.unit
+class TestLookup:
+    def test_similar_query_hits(self, cache_file):
+        cache = SemanticCache(cache_file=cache_file)
+        cache.add("высота ограждений", "1.2 м")
+        assert cache.get("какая высота ограждений") == "1.2 м"
+        assert cache.get("сроки инструктажа") is None
+
+    def test_rows_are_unit_vectors(self, cache_file):
+        cache = SemanticCache(cache_file=cache_file)
+        cache.add("высота ограждений", "1.2 м")
+        norms = np.linalg.norm(cache._matrix[: len(cache)], axis=1)
+        np.testing.assert_allclose(norms, 1.0, rtol=1e-6)
+
+    def test_matrix_grows_amortized(self, cache_file):
+        cache = SemanticCache(cache_file=cache_file)
+        for i in range(sc_mod._INITIAL_CAPACITY + 1):
+            cache.add(f"вопрос {i}", f"ответ {i}")
+        assert len(cache) == sc_mod._INITIAL_CAPACITY + 1
+        assert cache._matrix.shape[0] == 2 * sc_mod._INITIAL_CAPACITY
+
+    def test_exact_duplicate_not_added(self, cache_file):
+        cache = SemanticCache(cache_file=cache_file)
+        cache.add("высота ограждений", "1.2 м")
+        cache.add("высота ограждений", "другой ответ")
+        assert cache.answers == ["1.2 м"]
+
+
+@pytest.mark.unit
+class TestPersistence:
+    def test_log_is_append_only(self, cache_file):
+        cache = SemanticCache(cache_file=cache_file)
+        cache.add("высота ограждений", "1.2 м")
+        with open(cache_file, "rb") as f:
+            before = f.read()
+        cache.add("сроки инструктажа", "раз в полгода")
+        with open(cache_file, "rb") as f:
+            after = f.read()
+        # вторая запись дописана в конец, первая не переписана
+        assert len(after) > len(before) and after.startswith(before)
+
+    def test_reload_restores_entries(self, cache_file):
+        cache = SemanticCache(cache_file=cache_file)
+        cache.add("высота ограждений", "1.2 м")
+        cache.add("сроки инструктажа", "раз в полгода")
+        cache.close()
+
+        reloaded = SemanticCache(cache_file=cache_file)
+        assert reloaded.sentences == ["высота ограждений", "сроки инструктажа"]
+        assert reloaded.get("какая высота ограждений") == "1.2 м"
+
+    def test_torn_tail_is_dropped(self, cache_file):
+        cache = SemanticCache(cache_file=cache_file)
+        cache.add("высота ограждений", "1.2 м")
+        cache.close()
+        good_size = os.path.getsize(cache_file)
+        with open(cache_file, "ab") as f:
+            f.write(b"\x01\x00\x00")  # оборванная запись
+
+        reloaded = SemanticCache(cache_file=cache_file)
+        assert len(reloaded) == 1
+        assert os.path.getsize(cache_file) == good_size
+
+    def test_compact_drops_dead_records(self, cache_file):
+        cache = SemanticCache(cache_file=cache_file)
+        cache.add("высота ограждений", "1.2 м")
+        cache.add("сроки инструктажа", "раз в полгода")
+        cache._remove_row(0)
+        cache.compact()
+        reloaded = SemanticCache(cache_file=cache_file)
+        assert reloaded.sentences == ["сроки инструктажа"]
+
+    def test_legacy_json_migrated(self, cache_file, tmp_path):
+        legacy = tmp_path / "semantic_cache.json"
+        legacy.write_text(
+            json.dumps(
+                {
+                    "sentences": ["высота ограждений"],
+                    "embeddings": [[2.0, 0.0, 0.0]],
+                    "answers": ["1.2 м"],
+                }
+            ),
+            encoding="utf-8",
+        )
+        cache = SemanticCache(cache_file=cache_file)
+        assert cache.get("какая высота ограждений") == "1.2 м"
+        assert not legacy.exists() and os.path.exists(cache_file)
+
+    def test_other_model_entries_ignored(self, cache_file):
+        cache = SemanticCache(cache_file=cache_file)
+        cache.add("высота ограждений", "1.2 м")
+        cache.close()
+        other = SemanticCache(model_name="other-model", cache_file=cache_file)
+        assert len(other) == 0
+
+
+def _worker_adds(cache_file, worker, count):
+    cache = SemanticCache(cache_file=cache_file, encoder=FakeModel("fake").encode)
+    for i in range(count):
+        cache.add(f"w{worker} вопрос {i}", i)
+        if i % 7 == 6:
+            cache.compact()  # подменяет файл под открытыми логами соседей
+    cache.close()
+
+
+@pytest.mark.unit
+class TestSharedLog:
+    """Один лог на несколько процессов (uvicorn --workers N)."""
+
+    def test_writer_replays_other_writers_records(self, cache_file):
+        first = SemanticCache(cache_file=cache_file)
+        second = SemanticCache(cache_file=cache_file)
+        first.add("высота ограждений", "1.2 м")
+        second.add("сроки инструктажа", "раз в полгода")
+        assert second.get("какая высота ограждений") == "1.2 м"
+        first.add("третий вопрос", "ответ")
+        assert set(first.sentences) == set(second.sentences) | {"третий вопрос"}
+        entry_ids = first._entry_ids
+        assert len(set(entry_ids)) == len(entry_ids)
+
+    def test_compaction_by_other_writer_not_lost(self, cache_file):
+        first = SemanticCache(cache_file=cache_file)
+        second = SemanticCache(cache_file=cache_file)
+        first.add("высота ограждений", "1.2 м")
+        second.add("сроки инструктажа", "раз в полгода")
+        first.compact()  # os.replace: у second открыт старый inode
+        second.add("третий вопрос", "ответ")
+        first.close()
+        second.close()
+        reloaded = SemanticCache(cache_file=cache_file)
+        assert set(reloaded.sentences) == {
+            "высота ограждений",
+            "сроки инструктажа",
+            "третий вопрос",
+        }
+
+    @pytest.mark.skipif(sc_mod.fcntl is None, reason="needs fcntl.flock")
+    def test_concurrent_processes(self, cache_file):
+        ctx = multiprocessing.get_context("fork")
+        workers = [
+            ctx.Process(target=_worker_adds, args=(cache_file, w, 20)) for w in range(4)
+        ]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join(30)
+            assert p.exitcode == 0
+        reloaded = SemanticCache(cache_file=cache_file)
+        assert len(reloaded) == 80
+
+
+@pytest.mark.unit
+class TestBounds:
+    def test_lru_evicts_least_recently_used(self, cache_file, monkeypatch):
+        clock = iter(range(100))
+        monkeypatch.setattr(sc_mod.time, "time", lambda: float(next(clock)))
+        cache = SemanticCache(cache_file=cache_file, max_entries=2)
+        cache.add("высота ограждений", "1.2 м")
+        cache.add("сроки инструктажа", "раз в полгода")
+        assert cache.get("высота ограждений") == "1.2 м"  # свежее использование
+        cache.add("третий вопрос", "ответ")
+        assert sorted(cache.sentences) == ["высота ограждений", "третий вопрос"]
+        assert cache.evictions == 1
+
+    def test_lfu_evicts_least_hit(self, cache_file):
+        cache = SemanticCache(cache_file=cache_file, max_entries=2, eviction="lfu")
+        cache.add("высота ограждений", "1.2 м")
+        cache.add("сроки инструктажа", "раз в полгода")
+        cache.get("сроки инструктажа")
+        cache.get("сроки инструктажа")
+        cache.get("высота ограждений")
+        cache.add("третий вопрос", "ответ")
+        assert sorted(cache.sentences) == ["сроки инструктажа", "третий вопрос"]
+
+    def test_unknown_policy_rejected(self, cache_file):
+        with pytest.raises(ValueError):
+            SemanticCache(cache_file=cache_file, eviction="fifo")
+
+    def test_expired_entry_not_served_and_purged(self, cache_file, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(sc_mod.time, "time", lambda: now[0])
+        cache = SemanticCache(cache_file=cache_file, ttl_sec=60)
+        cache.add("высота ограждений", "1.2 м")
+        now[0] += 61
+        assert cache.get("высота ограждений") is None
+        cache.add("сроки инструктажа", "раз в полгода")
+        assert cache.sentences == ["сроки инструктажа"]
+
+    def test_expired_entries_dropped_on_load(self, cache_file, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(sc_mod.time, "time", lambda: now[0])
+        cache = SemanticCache(cache_file=cache_file, ttl_sec=60)
+        cache.add("высота ограждений", "1.2 м")
+        cache.close()
+        now[0] += 61
+        assert len(SemanticCache(cache_file=cache_file, ttl_sec=60)) == 0
+
+    def test_corpus_change_invalidates_entries(self, cache_file, monkeypatch):
+        monkeypatch.setattr(settings, "SEMANTIC_CACHE_FINGERPRINT_CHECK_SEC", 0.0)
+        corpus = ["v1"]
+        cache = SemanticCache(
+            cache_file=cache_file, corpus_fingerprint=lambda: corpus[0]
+        )
+        cache.add("высота ограждений", "1.2 м")
+        assert cache.get("высота ограждений") == "1.2 м"
+
+        corpus[0] = "v2"  # index.py пересобрал коллекцию
+        cache.get("высота ограждений")  # запускает фоновую сверку
+        _wait_for(lambda: len(cache) == 0)
+        assert cache.get("высота ограждений") is None
+        cache.add("высота ограждений", "1.5 м")
+        cache.close()
+
+        reloaded = SemanticCache(
+            cache_file=cache_file, corpus_fingerprint=lambda: corpus[0]
+        )
+        assert reloaded.get("высота ограждений") == "1.5 м"
+
+    def test_fingerprint_check_does_not_block_lookups(self, cache_file, monkeypatch):
+        monkeypatch.setattr(settings, "SEMANTIC_CACHE_FINGERPRINT_CHECK_SEC", 0.0)
+        release = threading.Event()
+        state = {"slow": False}
+
+        def fingerprint():
+            if state["slow"]:
+                release.wait(5)  # полный скан коллекции
+            return "v1"
+
+        cache = SemanticCache(cache_file=cache_file, corpus_fingerprint=fingerprint)
+        cache.add("высота ограждений", "1.2 м")
+        state["slow"] = True
+        try:
+            t0 = time.monotonic()
+            for _ in range(3):
+                assert cache.get("высота ограждений") == "1.2 м"
+            assert time.monotonic() - t0 < 1.0
+        finally:
+            release.set()
+
+    def test_stale_corpus_dropped_on_load(self, cache_file):
+        cache = SemanticCache(cache_file=cache_file, corpus_fingerprint=lambda: "v1")
+        cache.add("высота ограждений", "1.2 м")
+        cache.close()
+        reloaded = SemanticCache(cache_file=cache_file, corpus_fingerprint=lambda: "v2")
+        assert len(reloaded) == 0
+
+    def test_fingerprint_failure_keeps_entries(self, cache_file, monkeypatch):
+        monkeypatch.setattr(settings, "SEMANTIC_CACHE_FINGERPRINT_CHECK_SEC", 0.0)
+        state = {"fail": False}
+
+        def fingerprint():
+            if state["fail"]:
+                raise RuntimeError("chroma down")
+            return "v1"
+
+        cache = SemanticCache(cache_file=cache_file, corpus_fingerprint=fingerprint)
+        cache.add("высота ограждений", "1.2 м")
+        state["fail"] = True
+        assert cache.get("высота ограждений") == "1.2 м"
+
+    def test_deletions_compacted(self, cache_file, monkeypatch):
+        monkeypatch.setattr(sc_mod, "_COMPACT_MIN_DEAD", 0)
+        cache = SemanticCache(cache_file=cache_file, max_entries=1)
+        for i in range(5):
+            cache.add(f"вопрос {i}", f"ответ {i}")
+        cache.close()
+        reloaded = SemanticCache(cache_file=cache_file, max_entries=1)
+        assert reloaded.sentences == ["вопрос 4"]
+        assert reloaded._dead == 0
+
+
+class FakeHnswIndex:
+    """Перебор с интерфейсом hnswlib.Index (hnswlib в CI не ставится)."""
+
+    loads = 0
+    queries = 0
+
+    def __init__(self, space, dim):
+        assert space == "ip"
+        self.dim = dim
+        self.vectors = {}
+        self.deleted = set()
+        self.max_elements = 0
+
+    def init_index(self, max_elements, ef_construction, M):
+        self.max_elements = max_elements
+
+    def set_ef(self, ef):
+        pass
+
+    def get_current_count(self):
+        return len(self.vectors)
+
+    def get_max_elements(self):
+        return self.max_elements
+
+    def resize_index(self, size):
+        self.max_elements = size
+
+    def add_items(self, data, ids):
+        assert len(self.vectors) + len(ids) <= self.max_elements
+        for vec, label in zip(np.atleast_2d(data), ids):
+            self.vectors[int(label)] = np.array(vec)
+            self.deleted.discard(int(label))
+
+    def mark_deleted(self, label):
+        if label not in self.vectors or label in self.deleted:
+            raise RuntimeError("label not found")
+        self.deleted.add(label)
+
+    def knn_query(self, data, k):
+        FakeHnswIndex.queries += 1
+        live = [label for label in self.vectors if label not in self.deleted]
+        if k > len(live):
+            raise RuntimeError("contiguous 2D array")
+        sims = np.array([self.vectors[label] @ np.ravel(data) for label in live])
+        top = np.argsort(-sims)[:k]
+        return np.array([[live[i] for i in top]]), np.array([1.0 - sims[top]])
+
+    def save_index(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "vectors": {str(k): v.tolist() for k, v in self.vectors.items()},
+                    "deleted": sorted(self.deleted),
+                    "max_elements": self.max_elements,
+                },
+                f,
+            )
+
+    def load_index(self, path):
+        FakeHnswIndex.loads += 1
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.vectors = {int(k): np.array(v) for k, v in data["vectors"].items()}
+        self.deleted = set(data["deleted"])
+        self.max_elements = data["max_elements"]
+
+
+@pytest.fixture
+def fake_hnswlib(monkeypatch):
+    monkeypatch.setattr(
+        sc_mod, "hnswlib", type("hnswlib", (), {"Index": FakeHnswIndex})
+    )
+    FakeHnswIndex.loads = FakeHnswIndex.queries = 0
+    return FakeHnswIndex
+
+
+def _encode(text):
+    """Вектор из FakeModel; "вопрос i" далеко от всех вопросов словаря."""
+    if text.startswith("вопрос "):
+        i = int(text.split()[1])
+        return np.array([-1.0, np.sin(i), np.cos(i)], dtype=np.float32)
+    return FakeModel("fake").encode(text)
+
+
+def _ann_cache(cache_file, **kwargs):
+    kwargs.setdefault("ann", True)
+    return SemanticCache(
+        cache_file=cache_file, ann_min_entries=4, encoder=_encode, **kwargs
+    )
+
+
+def _fill(cache, n):
+    for i in range(n):
+        cache.add(f"вопрос {i}", f"ответ {i}")
+
+
+@pytest.mark.unit
+class TestAnnIndex:
+    def test_exact_search_below_min_entries(self, cache_file, fake_hnswlib):
+        cache = _ann_cache(cache_file)
+        cache.add("высота ограждений", "1.2 м")
+        assert cache._ann is None
+        assert cache.get("какая высота ограждений") == "1.2 м"
+        assert fake_hnswlib.queries == 0
+
+    def test_lookup_goes_through_ann(self, cache_file, fake_hnswlib):
+        cache = _ann_cache(cache_file)
+        _fill(cache, 4)
+        cache.add("высота ограждений", "1.2 м")
+        assert len(cache._ann) == 5
+        assert cache.get("какая высота ограждений") == "1.2 м"
+        assert cache.get("сроки инструктажа") is None
+        assert fake_hnswlib.queries == 2
+
+    def test_deleted_entries_leave_index(self, cache_file, fake_hnswlib):
+        cache = _ann_cache(cache_file, max_entries=5)
+        cache.add("высота ограждений", "1.2 м")
+        _fill(cache, 5)  # вытесняет "высота ограждений"
+        assert cache.evictions == 1
+        assert cache._ann.labels == set(cache._entry_ids)
+        assert cache.get("какая высота ограждений") is None
+
+    def test_index_persisted_and_reconciled(self, cache_file, fake_hnswlib):
+        cache = _ann_cache(cache_file)
+        _fill(cache, 4)
+        cache.close()
+        assert os.path.exists(os.path.splitext(cache_file)[0] + ".hnsw")
+
+        # запись после сохранения индекса есть только в логе
+        writer = _ann_cache(cache_file, ann=False)
+        writer.add("высота ограждений", "1.2 м")
+        writer.close()
+
+        reloaded = _ann_cache(cache_file)
+        assert fake_hnswlib.loads == 1
+        assert reloaded._ann.labels == set(reloaded._entry_ids)
+        assert reloaded.get("какая высота ограждений") == "1.2 м"
+
+    def test_compact_rebuilds_mostly_deleted_index(self, cache_file, fake_hnswlib):
+        cache = _ann_cache(cache_file)
+        _fill(cache, 10)
+        cache._delete_rows(range(8))
+        assert cache._ann.deleted == 8
+        cache.compact()
+        assert cache._ann.deleted == 0 and len(cache._ann) == 2
+
+    def test_without_hnswlib_exact_search(self, cache_file, monkeypatch):
+        monkeypatch.setattr(sc_mod, "hnswlib", None)
+        cache = _ann_cache(cache_file)
+        _fill(cache, 4)
+        cache.add("высота ограждений", "1.2 м")
+        assert cache._ann is None
+        assert cache.get("какая высота ограждений") == "1.2 м"
@@ -0,0 +1,152 @@
+"""Tests for src/vector_store.add_chunks — batching and document embedding cache."""
+
+from __future__ import annotations
+
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.documents import Document
+
+from config.settings import settings
+from src import vector_store as vs_mod
+from src.parent_store import ParentStore, parent_id_for
+from src.vector_store import _AdaptiveLimiter, _embed_with_backoff
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def _store():
+    store = MagicMock()
+    store.embeddings.embed_documents.side_effect = lambda ts: [[1.0, 0.0] for _ in ts]
+    return store
+
+
+def _chunks(n):
+    return [
+        Document(page_content=f"chunk {i}", metadata={"source": "a"}) for i in range(n)
+    ]
+
+
+@pytest.mark.unit
+class TestAddChunks:
+    def test_reindex_reuses_cached_vectors(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(
+            settings, "DOC_EMBEDDING_CACHE_PATH", str(tmp_path / "docs.sqlite")
+        )
+        first = _store()
+        vs_mod.add_chunks(first, _chunks(3), ids=["a", "b", "c"])
+        first._collection.upsert.assert_called_once()
+        assert first._collection.upsert.call_args.kwargs["ids"] == ["a", "b", "c"]
+
+        second = _store()
+        vs_mod.add_chunks(second, _chunks(4))
+        second.embeddings.embed_documents.assert_called_once_with(["chunk 3"])
+        assert len(second._collection.upsert.call_args.kwargs["ids"]) == 4
+        second.add_texts.assert_not_called()
+
+    def test_disabled_cache_embeds_everything(self, monkeypatch):
+        monkeypatch.setattr(settings, "DOC_EMBEDDING_CACHE_PATH", "")
+        store = _store()
+        vs_mod.add_chunks(store, _chunks(2), ids=["x", "y"])
+        store.embeddings.embed_documents.assert_called_once_with(["chunk 0", "chunk 1"])
+        assert store._collection.upsert.call_args.kwargs["ids"] == ["x", "y"]
+
+    def test_empty_metadata_sent_as_none(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(
+            settings, "DOC_EMBEDDING_CACHE_PATH", str(tmp_path / "docs.sqlite")
+        )
+        store = _store()
+        vs_mod.add_chunks(store, [Document(page_content="bare")])
+        assert store._collection.upsert.call_args.kwargs["metadatas"] == [None]
+
+    def test_batches_written_in_order_with_concurrency(self, monkeypatch):
+        monkeypatch.setattr(settings, "DOC_EMBEDDING_CACHE_PATH", "")
+        monkeypatch.setattr(settings, "EMBEDDING_MAX_INFLIGHT", 4)
+        monkeypatch.setattr(settings, "EMBEDDING_WRITE_QUEUE", 1)
+        monkeypatch.setattr(vs_mod, "_batches_by_tokens", _batches_of(2))
+        store = _store()
+        chunks = _chunks(9)
+        vs_mod.add_chunks(store, chunks, ids=[f"id{i}" for i in range(9)])
+
+        written = [
+            doc_id
+            for call in store._collection.upsert.call_args_list
+            for doc_id in call.kwargs["ids"]
+        ]
+        assert written == [f"id{i}" for i in range(9)]
+
+    def test_non_rate_limit_error_propagates(self, monkeypatch):
+        monkeypatch.setattr(settings, "DOC_EMBEDDING_CACHE_PATH", "")
+        store = _store()
+        store.embeddings.embed_documents.side_effect = ValueError("bad input")
+        with pytest.raises(ValueError):
+            vs_mod.add_chunks(store, _chunks(2))
+        store._collection.upsert.assert_not_called()
+
+    def test_parent_text_moved_to_parent_store(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "DOC_EMBEDDING_CACHE_PATH", "")
+        parents = ParentStore(str(tmp_path / "parents.sqlite"))
+        parent = "родительский раздел " * 100
+        chunks = [
+            Document(
+                page_content=f"child {i}",
+                metadata={"source": "a", "parent_text": parent, "child_idx": i},
+            )
+            for i in range(3)
+        ]
+        store = _store()
+        vs_mod.add_chunks(store, chunks, parent_store=parents)
+
+        metas = store._collection.upsert.call_args.kwargs["metadatas"]
+        assert all("parent_text" not in m for m in metas)
+        assert {m["parent_id"] for m in metas} == {parent_id_for(parent)}
+        assert parents.get_many([parent_id_for(parent)]) == {
+            parent_id_for(parent): parent
+        }
+        assert chunks[0].metadata["parent_text"] == parent  # вход не мутирован
+
+
+def _batches_of(size):
+    def _batches(docs, **kwargs):
+        for i in range(0, len(docs), size):
+            yield docs[i : i + size]
+
+    return _batches
+
+
+@pytest.mark.unit
+class TestEmbedBackoff:
+    def test_retries_on_429_and_halves_limit(self, monkeypatch):
+        monkeypatch.setattr(vs_mod.time, "sleep", lambda s: None)
+        calls = []
+
+        def embed(texts):
+            calls.append(texts)
+            if len(calls) < 3:
+                raise RateLimitError("Too Many Requests")
+            return [[1.0]]
+
+        limiter = _AdaptiveLimiter(8)
+        assert _embed_with_backoff(embed, ["a"], limiter) == [[1.0]]
+        assert len(calls) == 3
+        assert limiter.limit == 2
+
+    def test_gives_up_after_max_retries(self, monkeypatch):
+        monkeypatch.setattr(vs_mod.time, "sleep", lambda s: None)
+        monkeypatch.setattr(settings, "EMBEDDING_MAX_RETRIES", 1)
+
+        def embed(texts):
+            raise RateLimitError("429")
+
+        with pytest.raises(RateLimitError):
+            _embed_with_backoff(embed, ["a"], _AdaptiveLimiter(2))
+
+    def test_limit_recovers_after_successes(self):
+        limiter = _AdaptiveLimiter(4)
+        limiter.on_rate_limit()
+        assert limiter.limit == 2
+        for _ in range(2):
+            limiter.on_success()
+        assert limiter.limit == 3
@@ -0,0 +1,165 @@
+"""Tests for src/v7/answer_cache.py — semantic answer cache around the v7 graph."""
+
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.semantic_cache import SemanticCache
+from src.v7.answer_cache import CACHE_NODE, CachedGraph
+
+PASSAGE = {
+    "text": "Ограждения не ниже 1.1 м",
+    "metadata": {"source": "СП 1"},
+    "score": 0.8,
+}
+
+VECTORS = {
+    "высота ограждений": [1.0, 0.0, 0.0],
+    "какая высота ограждений": [0.99, 0.05, 0.0],
+    "привет": [0.0, 1.0, 0.0],
+}
+
+
+class FakeGraph:
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def invoke(self, state, config=None):
+        self.calls += 1
+        return {**state, **self.result}
+
+    async def astream(self, state, stream_mode):
+        self.calls += 1
+        values = {**state, **self.result}
+        yield "updates", {"generate_answer": self.result}
+        yield "values", values
+
+
+ANSWERED = {"answer": "1.1 м", "final_passages": [PASSAGE], "final_score": 0.8}
+
+
+@pytest.fixture
+def encoder():
+    calls = []
+
+    def encode(text):
+        calls.append(text)
+        return np.array(VECTORS.get(text, [0.0, 0.0, 1.0]), dtype=np.float32)
+
+    encode.calls = calls
+    return encode
+
+
+@pytest.fixture
+def cache(tmp_path, encoder):
+    return SemanticCache(
+        threshold=0.95,
+        model_name="fake:emb",
+        cache_file=str(tmp_path / "answers.bin"),
+        encoder=encoder,
+    )
+
+
+@pytest.mark.unit
+class TestCachedGraph:
+    def test_paraphrase_served_from_cache(self, cache):
+        graph = FakeGraph(ANSWERED)
+        cached = CachedGraph(graph, cache)
+        first = cached.invoke({"query": "высота ограждений"})
+        second = cached.invoke({"query": "какая высота ограждений"})
+        assert graph.calls == 1
+        assert first["answer"] == second["answer"] == "1.1 м"
+        assert second["answer_cache_hit"] is True
+        assert second["final_passages"][0]["metadata"]["source"] == "СП 1"
+        assert second["query"] == "какая высота ограждений"
+
+    def test_exact_match_skips_embedding(self, cache, encoder):
+        cached = CachedGraph(FakeGraph(ANSWERED), cache)
+        cached.invoke({"query": "высота ограждений"})
+        embedded = len(encoder.calls)
+        hit = cached.invoke({"query": "  высота   ограждений "})
+        assert hit["answer_cache_hit"] is True
+        assert len(encoder.calls) == embedded
+
+    @pytest.mark.parametrize(
+        "result",
+        [
+            {"clarify_message": "Уточните вопрос"},
+            {"abstain_reason": "нет данных", "answer": ""},
+            {"answer": ""},
+            {**ANSWERED, "answer_degraded": True},  # LLM упал — склейка passages
+        ],
+    )
+    def test_clarify_and_abstain_not_stored(self, cache, result):
+        graph = FakeGraph(result)
+        cached = CachedGraph(graph, cache)
+        cached.invoke({"query": "привет"})
+        cached.invoke({"query": "привет"})
+        assert graph.calls == 2
+        assert len(cache) == 0
+
+    def test_workers_share_one_log(self, tmp_path, encoder):
+        def _worker():
+            return CachedGraph(
+                FakeGraph(ANSWERED),
+                SemanticCache(
+                    threshold=0.95,
+                    model_name="fake:emb",
+                    cache_file=str(tmp_path / "answers.bin"),
+                    encoder=encoder,
+                ),
+            )
+
+        first, second = _worker(), _worker()  # uvicorn --workers 2
+        first.invoke({"query": "высота ограждений"})
+        second.invoke({"query": "привет"})  # запись подтягивает лог соседа
+        assert second.invoke({"query": "какая высота ограждений"})["answer_cache_hit"]
+
+        first.cache.compact()
+        second.invoke({"query": "сроки"})
+        assert len(_worker().cache) == 3
+
+    def test_filtered_request_bypasses_cache(self, cache):
+        graph = FakeGraph(ANSWERED)
+        cached = CachedGraph(graph, cache)
+        state = {"query": "высота ограждений", "filters": {"source": "СП 1"}}
+        cached.invoke(state)
+        cached.invoke(state)
+        assert graph.calls == 2 and len(cache) == 0
+
+    def test_astream_hit_emits_cache_node(self, cache):
+        graph = FakeGraph(ANSWERED)
+        cached = CachedGraph(graph, cache)
+
+        async def _collect(query):
+            return [
+                item
+                async for item in cached.astream(
+                    {"query": query}, stream_mode=["updates", "values"]
+                )
+            ]
+
+        miss = asyncio.run(_collect("высота ограждений"))
+        assert [mode for mode, _ in miss] == ["updates", "values"]
+        hit = asyncio.run(_collect("какая высота ограждений"))
+        assert graph.calls == 1
+        assert list(hit[0][1]) == [CACHE_NODE]
+        assert hit[-1][1]["answer"] == "1.1 м"
+
+    def test_astream_values_only_mode(self, cache):
+        cached = CachedGraph(FakeGraph(ANSWERED), cache)
+
+        async def _collect():
+            return [
+                item
+                async for item in cached.astream(
+                    {"query": "высота ограждений"}, stream_mode="values"
+                )
+            ]
+
+        assert asyncio.run(_collect())[-1]["answer"] == "1.1 м"
+        assert len(cache) == 1
@@ -5,15 +5,20 @@ from __future__ import annotations
 import json
 
 import pytest
+from langchain_core.documents import Document
 from unittest.mock import MagicMock, patch
 
 from src.v7.bridge import (
+    MATCH_NOTHING,
+    filters_to_where,
     init_v7_from_chroma,
+    make_batch_vector_search_fn,
     make_generate_fn,
     make_rewrite_fn,
     make_vector_search_fn,
     make_verify_fn,
 )
+from src.v7.nodes.generate_answer import FallbackAnswer
 
 
 class TestMakeVectorSearchFn:
@@ -47,6 +52,14 @@ class TestMakeVectorSearchFn:
         # L2 distance 0.3 → similarity = 1/(1+0.3) ≈ 0.7692
         assert result[0]["score"] == pytest.approx(1.0 / 1.3, abs=0.01)
 
+    @pytest.mark.unit
+    def test_chroma_id_propagated(self):
+        mock_store = MagicMock()
+        doc = Document(page_content="text", metadata={"source": "a.pdf"}, id="id-1")
+        mock_store.similarity_search_with_score.return_value = [(doc, 0.3)]
+        fn = make_vector_search_fn(mock_store)
+        assert fn(query="q")[0]["id"] == "id-1"
+
     @pytest.mark.unit
     def test_respects_top_k(self):
         mock_store = MagicMock()
@@ -57,12 +70,123 @@ class TestMakeVectorSearchFn:
         assert call_kwargs[1].get("k") == 20 or call_kwargs[0] == ("test",)
 
     @pytest.mark.unit
-    def test_filters_ignored_gracefully(self):
+    def test_filters_pushed_down_as_where(self):
         mock_store = MagicMock()
         mock_store.similarity_search_with_score.return_value = []
         fn = make_vector_search_fn(mock_store)
         result = fn(query="test", top_k=5, filters={"doc_type": "gost"})
         assert result == []
+        call_kwargs = mock_store.similarity_search_with_score.call_args[1]
+        assert call_kwargs["filter"] == {"doc_type": {"$eq": "gost"}}
+
+    @pytest.mark.unit
+    def test_no_filter_kwarg_without_filters(self):
+        mock_store = MagicMock()
+        mock_store.similarity_search_with_score.return_value = []
+        fn = make_vector_search_fn(mock_store)
+        fn(query="test", top_k=5, filters={"not_allowed": "x"})
+        assert "filter" not in mock_store.similarity_search_with_score.call_args[1]
+
+
+class TestFiltersToWhere:
+    @pytest.mark.unit
+    def test_translation(self):
+        assert filters_to_where(None) is None
+        assert filters_to_where({}) is None
+        assert filters_to_where({"doc_id": "d1"}) == {"doc_id": {"$eq": "d1"}}
+        assert filters_to_where({"year": [2020, 2019]}) == {
+            "year": {"$in": [2019, 2020]}
+        }
+        assert filters_to_where({"doc_type": "gost", "year": 2020}) == {
+            "$and": [{"doc_type": {"$eq": "gost"}}, {"year": {"$eq": 2020}}]
+        }
+
+    @pytest.mark.unit
+    def test_mixed_type_list_split_by_type(self):
+        assert filters_to_where({"year": [2020, "2019", 2018]}) == {
+            "$or": [
+                {"year": {"$in": [2018, 2020]}},
+                {"year": {"$in": ["2019"]}},
+            ]
+        }
+
+    @pytest.mark.unit
+    def test_empty_list_matches_nothing(self):
+        assert filters_to_where({"doc_type": []}) is MATCH_NOTHING
+        assert filters_to_where({"doc_type": "gost", "year": ()}) is MATCH_NOTHING
+
+    @pytest.mark.unit
+    def test_empty_list_skips_chroma(self):
+        mock_store = MagicMock()
+        assert make_vector_search_fn(mock_store)(query="q", filters={"year": []}) == []
+        mock_store.similarity_search_with_score.assert_not_called()
+        batch = make_batch_vector_search_fn(mock_store)
+        assert batch(queries=["a", "b"], filters={"year": []}) == [[], []]
+        mock_store._collection.query.assert_not_called()
+
+    @pytest.mark.unit
+    def test_whitelist_and_none(self):
+        where = filters_to_where({"$or": [], "source": "x", "category": None})
+        assert where is None
+
+
+class TestMakeBatchVectorSearchFn:
+    @pytest.mark.unit
+    def test_single_embedding_call_and_single_query(self):
+        mock_store = MagicMock()
+        mock_store.embeddings.embed_documents.return_value = [[0.1], [0.2]]
+        mock_store._collection.query.return_value = {
+            "documents": [["text a"], ["text b"]],
+            "metadatas": [[{"source": "a.pdf"}], [{"source": "b.pdf"}]],
+            "distances": [[0.3], [1.0]],
+        }
+        fn = make_batch_vector_search_fn(mock_store)
+        result = fn(queries=["q1", "q2"], top_k=7)
+
+        mock_store.embeddings.embed_documents.assert_called_once_with(["q1", "q2"])
+        mock_store._collection.query.assert_called_once()
+        call_kwargs = mock_store._collection.query.call_args[1]
+        assert call_kwargs["query_embeddings"] == [[0.1], [0.2]]
+        assert call_kwargs["n_results"] == 7
+        assert len(result) == 2
+        assert result[0][0]["text"] == "text a"
+        assert result[1][0]["metadata"]["source"] == "b.pdf"
+        assert result[0][0]["score"] == pytest.approx(1.0 / 1.3, abs=0.01)
+        assert result[1][0]["score"] == 0.5
+
+    @pytest.mark.unit
+    def test_chroma_ids_propagated(self):
+        mock_store = MagicMock()
+        mock_store.embeddings.embed_documents.return_value = [[0.1]]
+        mock_store._collection.query.return_value = {
+            "ids": [["id-a"]],
+            "documents": [["text a"]],
+            "metadatas": [[{"source": "a.pdf"}]],
+            "distances": [[0.3]],
+        }
+        fn = make_batch_vector_search_fn(mock_store)
+        assert fn(queries=["q1"])[0][0]["id"] == "id-a"
+
+    @pytest.mark.unit
+    def test_empty_queries(self):
+        mock_store = MagicMock()
+        fn = make_batch_vector_search_fn(mock_store)
+        assert fn(queries=[]) == []
+        mock_store.embeddings.embed_documents.assert_not_called()
+
+    @pytest.mark.unit
+    def test_filters_pushed_down_as_where(self):
+        mock_store = MagicMock()
+        mock_store.embeddings.embed_documents.return_value = [[0.1]]
+        mock_store._collection.query.return_value = {
+            "documents": [[]],
+            "metadatas": [[]],
+            "distances": [[]],
+        }
+        fn = make_batch_vector_search_fn(mock_store)
+        fn(queries=["q1"], filters={"doc_id": "d1"})
+        call_kwargs = mock_store._collection.query.call_args[1]
+        assert call_kwargs["where"] == {"doc_id": {"$eq": "d1"}}
 
 
 class TestMakeVerifyFn:
@@ -237,6 +361,7 @@ class TestMakeGenerateFn:
         passages = [{"text": "текст фрагмента", "score": 0.7}]
         result = fn(query="вопрос", active_query="вопрос", passages=passages)
         assert "текст фрагмента" in result
+        assert isinstance(result, FallbackAnswer)  # не попадёт в answer cache
 
     @pytest.mark.unit
     def test_handles_gemini_style_content(self):
@@ -270,6 +395,26 @@ class TestMakeGenerateFn:
         prompt = mock_llm.invoke.call_args[0][0][0].content
         assert "УНИКАЛЬНЫЙ_МАРКЕР_ОТВЕТА" in prompt
 
+    @pytest.mark.unit
+    def test_resolves_parent_text_from_store(self, tmp_path):
+        from src.parent_store import ParentStore
+
+        store = ParentStore(str(tmp_path / "parents.sqlite"))
+        store.put_many({"p1": "ПОЛНЫЙ_ТЕКСТ_РАЗДЕЛА"})
+        mock_llm = MagicMock()
+        mock_llm.invoke.return_value.content = "ответ"
+        fn = make_generate_fn(mock_llm, parent_store=store)
+        passages = [
+            {"text": "кусок 1", "score": 0.8, "metadata": {"parent_id": "p1"}},
+            {"text": "кусок 2", "score": 0.7, "metadata": {"parent_id": "p1"}},
+        ]
+
+        fn(query="вопрос", active_query="вопрос", passages=passages)
+
+        prompt = mock_llm.invoke.call_args[0][0][0].content
+        assert prompt.count("ПОЛНЫЙ_ТЕКСТ_РАЗДЕЛА") == 1
+        assert "кусок" not in prompt
+
 
 class TestInitV7FromChroma:
     @pytest.mark.unit
@@ -303,6 +448,30 @@ class TestInitV7FromChroma:
         assert corpus[0]["text"] == "text A"
         assert corpus[1]["metadata"]["source"] == "b.pdf"
 
+    @pytest.mark.unit
+    @patch("src.v7.bridge.init_bm25_index")
+    @patch("src.v7.bridge.rag_simple_mod")
+    @patch("src.v7.bridge.rag_complex_mod")
+    def test_bm25_snapshot_keyed_by_collection_ids(
+        self, mock_complex, mock_simple, mock_bm25
+    ):
+        mock_store = MagicMock()
+        mock_store.get.return_value = {
+            "ids": ["id-1", "id-2"],
+            "documents": ["text A", "text B"],
+            "metadatas": [{"source": "a.pdf"}, {"source": "b.pdf"}],
+        }
+        init_v7_from_chroma(mock_store, llm_provider=None)
+        kwargs = mock_bm25.call_args[1]
+        assert kwargs["fingerprint"].startswith("2:")
+        # BM25 и vector-результаты делят Chroma id — сливаются в RRF
+        assert [p["id"] for p in mock_bm25.call_args[0][0]] == ["id-1", "id-2"]
+        first = kwargs["fingerprint"]
+
+        mock_store.get.return_value["ids"] = ["id-1", "id-3"]
+        init_v7_from_chroma(mock_store, llm_provider=None)
+        assert mock_bm25.call_args[1]["fingerprint"] != first
+
     @pytest.mark.unit
     @patch("src.v7.bridge.get_gemini_llm")
     @patch("src.v7.bridge.generate_answer_mod")
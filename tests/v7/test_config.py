@@ -115,6 +115,19 @@ class TestV7ConfigEnvOverride:
         cfg = V7Config()
         assert not hasattr(cfg, "UNKNOWN_SETTING")
 
+    def test_bm25_snapshot_dir_anchored_at_chroma(self, monkeypatch, tmp_path):
+        from config.settings import settings
+        from src.v7.config import V7Config
+
+        monkeypatch.setattr(settings, "CHROMA_DB_PATH", str(tmp_path / "chroma"))
+        monkeypatch.chdir(tmp_path / "..")
+        assert V7Config().bm25_snapshot_dir() == str(
+            tmp_path / "chroma" / "bm25_snapshot"
+        )
+        absolute = str(tmp_path / "snap")
+        assert V7Config(BM25_SNAPSHOT_DIR=absolute).bm25_snapshot_dir() == absolute
+        assert V7Config(BM25_SNAPSHOT_DIR="").bm25_snapshot_dir() == ""
+
 
 class TestV7ConfigType:
     """Verify the config is a pydantic BaseSettings instance."""
@@ -2,6 +2,10 @@
 
 from __future__ import annotations
 
+import logging
+import os
+from unittest.mock import patch
+
 import pytest
 
 from src.v7.nlp_core import (
@@ -9,8 +13,10 @@ from src.v7.nlp_core import (
     compute_doc_diversity,
     compute_keyword_overlap,
     extract_keywords,
+    hybrid_rrf_merge,
     merge_all_passages,
     mmr_select,
+    passage_key,
     rrf_merge,
 )
 
@@ -68,6 +74,37 @@ class TestExtractKeywords:
         assert "быть" not in keywords
 
 
+# ─── Lemmatization cache ───────────────────────────────────────────────────
+
+
+class TestLemmaCache:
+    @pytest.mark.unit
+    def test_repeated_words_hit_cache(self):
+        from src.v7.nlp_core import lemma_cache_stats, lemmatize_word
+
+        lemmatize_word("ограждениями")
+        before = lemma_cache_stats()
+        assert lemmatize_word("ограждениями") == "ограждение"
+        after = lemma_cache_stats()
+        assert after["hits"] == before["hits"] + 1
+        assert after["misses"] == before["misses"]
+        assert 0.0 < after["hit_rate"] <= 1.0
+
+    @pytest.mark.unit
+    def test_batch_matches_per_text(self):
+        from src.v7.nlp_core import _lemmatize_for_bm25, lemmatize_batch
+
+        texts = ["Ограждения лестниц", "Высота ограждения 1200 мм", ""]
+        assert lemmatize_batch(texts) == [_lemmatize_for_bm25(t) for t in texts]
+
+    @pytest.mark.unit
+    def test_stats_fields(self):
+        from src.v7.nlp_core import lemma_cache_stats
+
+        stats = lemma_cache_stats()
+        assert set(stats) == {"hits", "misses", "size", "maxsize", "hit_rate"}
+
+
 # ─── BM25Index ─────────────────────────────────────────────────────────────
 
 
@@ -144,6 +181,269 @@ class TestBM25Index:
         for r in results:
             assert r["score"] == r["bm25_score"]
 
+    @pytest.mark.unit
+    def test_scores_match_bm25okapi(self, corpus):
+        """Векторизованный скоринг совпадает с rank_bm25.BM25Okapi."""
+        from rank_bm25 import BM25Okapi
+
+        from src.v7.nlp_core import _lemmatize_for_bm25
+
+        index = BM25Index(corpus)
+        query = "ограждения зданий пожарная"
+        reference = BM25Okapi([_lemmatize_for_bm25(p["text"]) for p in corpus])
+        expected = reference.get_scores(_lemmatize_for_bm25(query))
+        results = index.search(query, top_k=4)
+        by_id = {r["chunk_id"]: r["bm25_score"] for r in results}
+        for p, score in zip(corpus, expected):
+            if score > 0:
+                assert by_id[p["chunk_id"]] == pytest.approx(round(score, 4))
+
+    @pytest.mark.unit
+    def test_only_matching_documents_returned(self, corpus):
+        """Документы без лемм запроса не попадают в выдачу."""
+        index = BM25Index(corpus)
+        results = index.search("балконов", top_k=4)
+        assert [r["chunk_id"] for r in results] == ["c3"]
+
+    @pytest.mark.unit
+    def test_unknown_terms_return_empty(self, corpus):
+        index = BM25Index(corpus)
+        assert index.search("электробезопасность", top_k=4) == []
+
+    @pytest.mark.unit
+    def test_top_k_partition_keeps_best(self):
+        """argpartition top-k отдаёт те же документы, что и полная сортировка."""
+        corpus = [
+            {"chunk_id": f"c{i}", "text": "ограждение " * (i % 5 + 1) + "лестница"}
+            for i in range(50)
+        ]
+        index = BM25Index(corpus)
+        top = index.search("ограждение", top_k=5)
+        full = index.search("ограждение", top_k=50)
+        assert [r["chunk_id"] for r in top] == [r["chunk_id"] for r in full[:5]]
+
+    @pytest.mark.unit
+    def test_filter_on_metadata_field(self):
+        """Chroma-корпус держит поля в metadata — фильтр их видит."""
+        corpus = [
+            {"text": "ограждение лестницы", "metadata": {"doc_type": "gost"}},
+            {"text": "ограждение балкона", "metadata": {"doc_type": "tk"}},
+            {"text": "ограждение кровли", "metadata": {"doc_type": "snip"}},
+        ]
+        index = BM25Index(corpus)
+        results = index.search("ограждение", top_k=5, filters={"doc_type": "tk"})
+        assert [r["text"] for r in results] == ["ограждение балкона"]
+        results = index.search(
+            "ограждение", top_k=5, filters={"doc_type": ["gost", "snip"]}
+        )
+        assert {r["metadata"]["doc_type"] for r in results} == {"gost", "snip"}
+
+    @pytest.mark.unit
+    def test_filtered_scores_match_unfiltered(self, corpus):
+        """Pre-filter по postings не меняет BM25-скоры оставшихся документов."""
+        index = BM25Index(corpus)
+        full = {r["chunk_id"]: r["bm25_score"] for r in index.search("ограждения", 4)}
+        for r in index.search("ограждения", top_k=4, filters={"doc_id": "d1"}):
+            assert r["bm25_score"] == full[r["chunk_id"]]
+
+    @pytest.mark.unit
+    def test_filter_bitmap_cached(self, corpus):
+        index = BM25Index(corpus)
+        index.search("ограждения", top_k=4, filters={"doc_id": "d1"})
+        bitmap = index._filter_bitmap("doc_id", "d1")
+        index.search("зданий", top_k=4, filters={"doc_id": "d1"})
+        assert index._filter_bitmap("doc_id", "d1") is bitmap
+
+    @pytest.mark.unit
+    def test_filter_without_matches(self, corpus):
+        index = BM25Index(corpus)
+        assert index.search("ограждения", top_k=4, filters={"doc_id": "zz"}) == []
+
+    @pytest.mark.unit
+    def test_empty_corpus(self):
+        index = BM25Index([])
+        assert index.search("ограждения", top_k=4) == []
+
+
+# ─── BM25 snapshot ─────────────────────────────────────────────────────────
+
+
+class TestBM25Snapshot:
+    @pytest.fixture
+    def corpus(self):
+        return [
+            {"chunk_id": "c1", "text": "Требования к ограждениям лестничных клеток"},
+            {"chunk_id": "c2", "text": "Пожарная безопасность зданий и сооружений"},
+            {"chunk_id": "c3", "text": "Высота ограждения балконов не менее 1200 мм"},
+        ]
+
+    @pytest.mark.unit
+    def test_roundtrip_preserves_results(self, corpus, tmp_path):
+        index = BM25Index(corpus)
+        index.save_snapshot(str(tmp_path / "snap"), "fp-1")
+        loaded = BM25Index.load_snapshot(str(tmp_path / "snap"), corpus, "fp-1")
+        assert loaded is not None
+        assert loaded.search("ограждения", top_k=3) == index.search(
+            "ограждения", top_k=3
+        )
+
+    @pytest.mark.unit
+    def test_stale_fingerprint_rejected(self, corpus, tmp_path):
+        BM25Index(corpus).save_snapshot(str(tmp_path / "snap"), "fp-1")
+        assert BM25Index.load_snapshot(str(tmp_path / "snap"), corpus, "fp-2") is None
+
+    @pytest.mark.unit
+    def test_missing_snapshot_returns_none(self, corpus, tmp_path):
+        assert BM25Index.load_snapshot(str(tmp_path / "nope"), corpus, "fp") is None
+
+    @pytest.mark.unit
+    def test_resave_swaps_old_snapshot_out(self, corpus, tmp_path, monkeypatch):
+        from src.v7 import nlp_core
+
+        snap = tmp_path / "snap"
+        BM25Index(corpus).save_snapshot(str(snap), "fp-1")
+        seen = []
+        real_replace = os.replace
+
+        def _replace(src, dst):
+            # в момент подмены старый каталог цел (отодвинут, а не удалён)
+            seen.append(sorted(p.name for p in tmp_path.iterdir()))
+            real_replace(src, dst)
+
+        monkeypatch.setattr(nlp_core.os, "replace", _replace)
+        BM25Index(corpus).save_snapshot(str(snap), "fp-2")
+
+        assert any(n.startswith("snap.old-") for n in seen[-1])
+        assert [p.name for p in tmp_path.iterdir()] == ["snap"]
+        assert BM25Index.load_snapshot(str(snap), corpus, "fp-2") is not None
+
+    @pytest.mark.unit
+    def test_concurrent_save_keeps_winner(self, corpus, tmp_path, monkeypatch):
+        """Соседний процесс поставил снапшот между нашими rename'ами."""
+        from src.v7 import nlp_core
+
+        snap = tmp_path / "snap"
+        real_replace = os.replace
+
+        def _replace(src, dst):
+            real_replace(src, dst)
+            if str(dst).startswith(str(snap) + ".old-"):
+                monkeypatch.setattr(nlp_core.os, "replace", real_replace)
+                BM25Index(corpus).save_snapshot(str(snap), "fp-other")
+
+        BM25Index(corpus).save_snapshot(str(snap), "fp-1")
+        monkeypatch.setattr(nlp_core.os, "replace", _replace)
+        BM25Index(corpus).save_snapshot(str(snap), "fp-2")
+
+        assert BM25Index.load_snapshot(str(snap), corpus, "fp-other") is not None
+        assert [p.name for p in tmp_path.iterdir()] == ["snap"]
+
+    @pytest.mark.unit
+    def test_init_reuses_snapshot_without_lemmatizing_corpus(
+        self, corpus, tmp_path, monkeypatch
+    ):
+        """Второй старт с тем же fingerprint не строит postings заново."""
+        from src.v7 import nlp_core
+
+        monkeypatch.setattr(nlp_core, "_bm25_index", None)
+
+        snap = str(tmp_path / "snap")
+        nlp_core.init_bm25_index(corpus, snapshot_dir=snap, fingerprint="fp-1")
+        with patch.object(
+            nlp_core, "_build_postings", side_effect=AssertionError("rebuilt")
+        ):
+            nlp_core.init_bm25_index(corpus, snapshot_dir=snap, fingerprint="fp-1")
+            results = nlp_core.bm25_search("балконов", top_k=3)
+        assert [r["chunk_id"] for r in results] == ["c3"]
+
+    @pytest.mark.unit
+    def test_init_rebuilds_on_fingerprint_change(self, corpus, tmp_path, monkeypatch):
+        from src.v7 import nlp_core
+
+        monkeypatch.setattr(nlp_core, "_bm25_index", None)
+
+        snap = str(tmp_path / "snap")
+        nlp_core.init_bm25_index(corpus, snapshot_dir=snap, fingerprint="fp-1")
+        nlp_core.init_bm25_index(corpus[:2], snapshot_dir=snap, fingerprint="fp-2")
+        assert nlp_core.bm25_search("балконов", top_k=3) == []
+        assert BM25Index.load_snapshot(snap, corpus[:2], "fp-2") is not None
+
+
+# ─── parallel_retrieve ─────────────────────────────────────────────────────
+
+
+class TestParallelRetrieve:
+    @pytest.mark.unit
+    def test_results_in_call_order(self):
+        from src.v7.nlp_core import parallel_retrieve
+
+        calls = [lambda i=i: [{"chunk_id": f"c{i}"}] for i in range(4)]
+        results = parallel_retrieve(calls, timeout_ms=1000)
+        assert [r[0]["chunk_id"] for r in results] == ["c0", "c1", "c2", "c3"]
+
+    @pytest.mark.unit
+    def test_runs_concurrently(self):
+        import time
+
+        from src.v7.nlp_core import parallel_retrieve
+
+        def _slow():
+            time.sleep(0.1)
+            return []
+
+        t0 = time.perf_counter()
+        parallel_retrieve([_slow] * 4, timeout_ms=1000, required=4)
+        assert time.perf_counter() - t0 < 0.35
+
+    @pytest.mark.unit
+    def test_late_optional_results_dropped(self):
+        import time
+
+        from src.v7.nlp_core import parallel_retrieve
+
+        def _late():
+            time.sleep(0.3)
+            return [{"chunk_id": "late"}]
+
+        results = parallel_retrieve(
+            [lambda: [{"chunk_id": "fast"}], _late], timeout_ms=20, required=1
+        )
+        assert results == [[{"chunk_id": "fast"}], None]
+
+    @pytest.mark.unit
+    def test_required_awaited_past_deadline(self):
+        import time
+
+        from src.v7.nlp_core import parallel_retrieve
+
+        def _slow_required():
+            time.sleep(0.05)
+            return [{"chunk_id": "req"}]
+
+        results = parallel_retrieve([_slow_required], timeout_ms=1, required=1)
+        assert results == [[{"chunk_id": "req"}]]
+
+    @pytest.mark.unit
+    def test_optional_failure_dropped(self):
+        from src.v7.nlp_core import parallel_retrieve
+
+        def _boom():
+            raise RuntimeError("embedding API down")
+
+        results = parallel_retrieve([lambda: [], _boom], timeout_ms=1000)
+        assert results == [[], None]
+
+    @pytest.mark.unit
+    def test_failure_without_deadline_logs(self, caplog):
+        from src.v7.nlp_core import parallel_retrieve
+
+        def _boom():
+            raise RuntimeError("embedding API down")
+
+        caplog.set_level(logging.INFO, logger="src.v7.nlp_core")
+        assert parallel_retrieve([lambda: [], _boom]) == [[], None]
+        assert "1/2 calls dropped (deadline None ms)" in caplog.text
+
 
 # ─── rrf_merge ─────────────────────────────────────────────────────────────
 
@@ -194,6 +494,75 @@ class TestRRFMerge:
         # Score should be 1/(RRF_K + 1) = 1/61 ≈ 0.01639
         assert merged[0]["rrf_score"] > 0
 
+    @pytest.mark.unit
+    def test_fuses_chunk_id_from_metadata(self):
+        """Retriever-ы держат chunk_id в metadata — один чанк сливается."""
+        vec = [
+            {"text": "a", "metadata": {"source": "x.pdf", "chunk_id": 1}, "score": 0.8},
+            {"text": "b", "metadata": {"source": "x.pdf", "chunk_id": 2}, "score": 0.7},
+        ]
+        bm25 = [
+            {
+                "text": "b",
+                "metadata": {"source": "x.pdf", "chunk_id": 2},
+                "bm25_score": 3.1,
+            },
+        ]
+        merged = rrf_merge(vec, bm25, top_k=5, k=60)
+        assert [p["text"] for p in merged] == ["b", "a"]
+        # поля первого вхождения + недостающие из других списков
+        assert merged[0]["score"] == 0.7 and merged[0]["bm25_score"] == 3.1
+
+    @pytest.mark.unit
+    def test_unrelated_chunks_at_equal_rank_not_collapsed(self):
+        list1 = [{"text": "первый"}]
+        list2 = [{"text": "второй"}]
+        assert len(rrf_merge(list1, list2, top_k=5, k=60)) == 2
+
+    @pytest.mark.unit
+    def test_weights_scale_contributions(self):
+        vec = [{"id": "v"}]
+        bm25 = [{"id": "b"}]
+        merged = rrf_merge(vec, bm25, top_k=2, k=60, weights=[0.5, 1.0])
+        assert [p["id"] for p in merged] == ["b", "v"]
+        assert merged[1]["rrf_score"] == round(0.5 / 61, 5)
+        with pytest.raises(ValueError):
+            rrf_merge(vec, bm25, weights=[1.0])
+
+    @pytest.mark.unit
+    def test_hybrid_uses_config_weights(self):
+        vec = [{"id": "v"}]
+        bm25 = [{"id": "b"}]
+        with patch("src.v7.nlp_core.v7_config") as cfg:
+            cfg.RRF_K = 60
+            cfg.RRF_VECTOR_WEIGHT = 2.0
+            cfg.RRF_BM25_WEIGHT = 1.0
+            merged = hybrid_rrf_merge([vec], [bm25], top_k=2)
+        assert [p["id"] for p in merged] == ["v", "b"]
+
+
+class TestPassageKey:
+    @pytest.mark.unit
+    def test_chroma_id_wins(self):
+        a = {"id": "c-1", "text": "x", "metadata": {"chunk_id": 1}}
+        b = {"id": "c-1", "text": "y"}
+        assert passage_key(a) == passage_key(b)
+
+    @pytest.mark.unit
+    def test_source_chunk_child(self):
+        meta = {"source": "x.pdf", "chunk_id": 3, "child_idx": 0}
+        same = {"text": "t", "metadata": dict(meta)}
+        other_child = {"text": "t", "metadata": {**meta, "child_idx": 1}}
+        other_source = {"text": "t", "metadata": {**meta, "source": "y.pdf"}}
+        assert passage_key({"text": "t", "metadata": meta}) == passage_key(same)
+        assert passage_key(same) != passage_key(other_child)
+        assert passage_key(same) != passage_key(other_source)
+
+    @pytest.mark.unit
+    def test_text_fallback(self):
+        assert passage_key({"text": "a"}) == passage_key({"text": "a", "score": 1})
+        assert passage_key({"text": "a"}) != passage_key({"text": "b"})
+
 
 # ─── mmr_select ────────────────────────────────────────────────────────────
 
@@ -247,6 +616,23 @@ class TestComputeKeywordOverlap:
         score = compute_keyword_overlap("", [{"text": "test"}])
         assert score == 1.0
 
+    @pytest.mark.unit
+    def test_keywords_cached_by_text(self):
+        """Keyword-множество chunk-а считается один раз — для любой копии passage."""
+        passages = [{"text": "Высота ограждения лестниц"}]
+        compute_keyword_overlap("ограждение", passages)
+        assert "keywords" not in passages[0]
+        with patch(
+            "src.v7.nlp_core.extract_keywords", side_effect=AssertionError("NLP")
+        ):
+            copies = [dict(passages[0], score=0.5)]
+            assert compute_keyword_overlap("ограждение", copies) == 1.0
+
+    @pytest.mark.unit
+    def test_uses_precomputed_keywords(self):
+        passages = [{"text": "", "keywords": frozenset({"ограждение"})}]
+        assert compute_keyword_overlap("ограждение лестница", passages) == 0.5
+
 
 # ─── compute_doc_diversity ────────────────────────────────────────────────
 
@@ -295,6 +681,12 @@ class TestMergeAllPassages:
         result = merge_all_passages(attempts, top_k=5, mmr_lambda=0.7)
         assert len(result) == 2
 
+    @pytest.mark.unit
+    def test_dedup_by_metadata_identity(self):
+        p = {"text": "t", "metadata": {"source": "x.pdf", "chunk_id": 4}, "score": 0.5}
+        attempts = [{"passages": [p]}, {"passages": [dict(p)]}]
+        assert len(merge_all_passages(attempts, top_k=5, mmr_lambda=0.7)) == 1
+
     @pytest.mark.unit
     def test_empty_attempts(self):
         assert merge_all_passages([], top_k=5) == []
@@ -59,6 +59,7 @@ class TestGenerateAnswer:
         }
         result = generate_answer(state)
         assert "АБВГД" in result["answer"]
+        assert result["answer_degraded"] is True
 
     @pytest.mark.unit
     def test_injectable_generate_fn(self):
@@ -79,6 +80,7 @@ class TestGenerateAnswer:
             }
             result = generate_answer(state)
             assert result["answer"] == "custom answer"
+            assert result["answer_degraded"] is False
             assert called_with["query"] == "тест"
         finally:
             set_generate_fn(None)  # restore stub
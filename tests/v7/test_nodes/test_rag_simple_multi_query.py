@@ -41,6 +41,7 @@ def _make_state(active_query: str = "требования к ограждени
 def _restore_rag_simple():
     """Reset module-level injected functions to defaults."""
     rag_simple_mod.set_vector_search(rag_simple_mod._default_vector_search)
+    rag_simple_mod.set_batch_vector_search(None)
     rag_simple_mod.set_expand_fn(None)
 
 
@@ -267,13 +268,11 @@ class TestMultiQueryExpand:
             "косвенный фрагмент низкий score", score=0.1, chunk_id="exp"
         )
 
-        call_count = [0]
-
+        # Searches run concurrently — key on the query text, not on call order.
         def _vector_search(
             query: str, filters=None, top_k: int = 5, **kwargs
         ) -> list[dict]:
-            call_count[0] += 1
-            if call_count[0] == 1:
+            if query != "косвенная формулировка":
                 return [original_passage]  # original query
             return [expanded_passage]  # expanded query
 
@@ -310,3 +309,80 @@ class TestMultiQueryExpand:
         # No expand_fn injected (None by default after restore)
         result = rag_simple(_make_state())
         assert "retrieval_attempts" in result
+
+    @pytest.mark.unit
+    def test_late_expanded_results_dropped_at_deadline(self, monkeypatch):
+        """plan.timeout_ms is a real deadline: slow expanded-query searches are dropped."""
+        import time
+
+        monkeypatch.setattr(
+            "src.v7.nodes.rag_simple.v7_config",
+            type(
+                "cfg",
+                (),
+                {
+                    "V8_ENABLE_MULTI_QUERY": True,
+                    "V8_EXPAND_N": 1,
+                    "V8_ENABLE_EVIDENCE_ASSESS": False,
+                    "V8_SIMPLE_RERANK_TOP_K": 5,
+                    "RRF_K": 60,
+                },
+            )(),
+        )
+        fast = _make_passage("ограждение лестницы", score=0.6, chunk_id="fast")
+        late = _make_passage("поздний фрагмент", score=0.9, chunk_id="late")
+
+        def _vector_search(
+            query: str, filters=None, top_k: int = 5, **kwargs
+        ) -> list[dict]:
+            if query == "медленная формулировка":
+                time.sleep(0.3)
+                return [late]
+            return [fast]
+
+        rag_simple_mod.set_vector_search(_vector_search)
+        rag_simple_mod.set_expand_fn(lambda query, n: ["медленная формулировка"])
+
+        state = _make_state()
+        state["plan"]["timeout_ms"] = 20
+        result = rag_simple(state)
+        chunk_ids = {p["chunk_id"] for p in result["retrieval_attempts"][0]["passages"]}
+        assert chunk_ids == {"fast"}
+
+    @pytest.mark.unit
+    def test_batch_vector_search_used_for_all_queries(self, monkeypatch):
+        """With a batch search injected, all query variants go in one call."""
+        monkeypatch.setattr(
+            "src.v7.nodes.rag_simple.v7_config",
+            type(
+                "cfg",
+                (),
+                {
+                    "V8_ENABLE_MULTI_QUERY": True,
+                    "V8_EXPAND_N": 2,
+                    "V8_ENABLE_EVIDENCE_ASSESS": False,
+                    "V8_SIMPLE_RERANK_TOP_K": 5,
+                    "RRF_K": 60,
+                },
+            )(),
+        )
+        passage_a = _make_passage("ограждение лестницы", score=0.7, chunk_id="a")
+        passage_b = _make_passage("защитный барьер", score=0.4, chunk_id="b")
+        batch_calls = []
+
+        def _batch(queries, filters=None, top_k=5, **kwargs):
+            batch_calls.append(list(queries))
+            return [[passage_a], [passage_b], []]
+
+        def _single(**kwargs):
+            raise AssertionError("single-query search must not be used")
+
+        rag_simple_mod.set_vector_search(_single)
+        rag_simple_mod.set_batch_vector_search(_batch)
+        rag_simple_mod.set_expand_fn(lambda query, n: ["alt 1", "alt 2"])
+
+        result = rag_simple(_make_state(active_query="ограждение лестница"))
+        attempt = result["retrieval_attempts"][0]
+        assert batch_calls == [["ограждение лестница", "alt 1", "alt 2"]]
+        assert {p["chunk_id"] for p in attempt["passages"]} == {"a", "b"}
+        assert abs(attempt["top_score"] - 0.7) < 0.01
@@ -0,0 +1,157 @@
+"""Tests for src/v7/vector_mirror.py — in-process dense retrieval mirror."""
+
+from __future__ import annotations
+
+import time
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from src.v7 import vector_mirror as vm_mod
+from src.v7.bridge import make_batch_vector_search_fn, make_vector_search_fn
+from src.v7.vector_mirror import VectorMirror
+
+
+class FakeStore:
+    """LangChain Chroma surface used by the mirror: get(limit, offset) + _collection."""
+
+    def __init__(self, vectors, metadatas=None, space="l2"):
+        self.set_rows(vectors, metadatas)
+        self._collection = MagicMock()
+        self._collection.metadata = {"hnsw:space": space}
+        self.embeddings = MagicMock()
+        self.pages = 0
+
+    def set_rows(self, vectors, metadatas=None):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        n = len(self.vectors)
+        self.ids = [f"id-{i}" for i in range(n)]
+        self.documents = [f"doc {i}" for i in range(n)]
+        self.metadatas = metadatas or [{"i": i} for i in range(n)]
+
+    def get(self, include=None, limit=None, offset=0):
+        if include == []:
+            return {"ids": list(self.ids)}
+        self.pages += 1
+        end = len(self.ids) if limit is None else offset + limit
+        return {
+            "ids": self.ids[offset:end],
+            "documents": self.documents[offset:end],
+            "metadatas": self.metadatas[offset:end],
+            "embeddings": self.vectors[offset:end],
+        }
+
+
+def _reference(vectors, query, space):
+    vectors = np.asarray(vectors, dtype=np.float64)
+    query = np.asarray(query, dtype=np.float64)
+    if space == "l2":
+        return ((vectors - query) ** 2).sum(axis=1)
+    if space == "ip":
+        return 1.0 - vectors @ query
+    cos = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    return 1.0 - cos
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((50, 8)).astype(np.float32)
+
+
+@pytest.mark.unit
+class TestQuery:
+    @pytest.mark.parametrize("space", ["l2", "cosine", "ip"])
+    def test_matches_brute_force_distances(self, vectors, space):
+        mirror = VectorMirror(FakeStore(vectors, space=space), check_sec=1e9)
+        query = np.random.default_rng(1).standard_normal(8)
+        (hits,) = mirror.query([query], top_k=5)
+        expected = _reference(vectors, query, space)
+        order = np.argsort(expected)[:5]
+        assert [h[0] for h in hits] == [f"id-{i}" for i in order]
+        np.testing.assert_allclose(
+            [h[3] for h in hits], expected[order], rtol=1e-4, atol=1e-4
+        )
+
+    def test_batch_queries_in_one_call(self, vectors):
+        mirror = VectorMirror(FakeStore(vectors), check_sec=1e9)
+        results = mirror.query(vectors[:3], top_k=2)
+        assert [hits[0][0] for hits in results] == ["id-0", "id-1", "id-2"]
+        assert all(hits[0][3] == pytest.approx(0.0, abs=1e-3) for hits in results)
+
+    def test_filters_restrict_to_subset(self, vectors):
+        metas = [{"doc_type": "gost" if i % 5 == 0 else "tk"} for i in range(50)]
+        mirror = VectorMirror(FakeStore(vectors, metas), check_sec=1e9)
+        (hits,) = mirror.query([vectors[1]], top_k=20, filters={"doc_type": "gost"})
+        assert len(hits) == 10
+        assert all(h[2]["doc_type"] == "gost" for h in hits)
+        (none,) = mirror.query([vectors[1]], top_k=5, filters={"doc_type": "snip"})
+        assert none == []
+
+    def test_paged_load(self, vectors, monkeypatch):
+        monkeypatch.setattr(vm_mod, "_LOAD_PAGE", 20)
+        store = FakeStore(vectors)
+        mirror = VectorMirror(store, check_sec=1e9)
+        assert len(mirror) == 50 and store.pages == 3
+
+    def test_empty_collection_and_dim_mismatch(self, vectors):
+        empty = VectorMirror(FakeStore(np.zeros((0, 8))), check_sec=1e9)
+        assert empty.query([[0.0] * 8], top_k=3) == [[]]
+        mirror = VectorMirror(FakeStore(vectors), check_sec=1e9)
+        with pytest.raises(ValueError):
+            mirror.query([[0.0] * 4], top_k=3)
+
+
+@pytest.mark.unit
+class TestSync:
+    def test_refresh_reloads_on_fingerprint_change(self, vectors):
+        store = FakeStore(vectors)
+        mirror = VectorMirror(store, check_sec=1e9)
+        assert mirror.refresh() is False
+
+        store.set_rows(vectors[:10])  # переиндексация
+        assert mirror.refresh() is True
+        assert len(mirror) == 10
+
+    def test_stale_check_runs_in_background(self, vectors):
+        store = FakeStore(vectors)
+        mirror = VectorMirror(store, check_sec=0.0)
+        store.set_rows(vectors[:10])
+        mirror.query([vectors[0]], top_k=1)  # отдаёт старый snapshot, стартует reload
+        for _ in range(200):
+            if len(mirror) == 10:
+                break
+            time.sleep(0.01)
+        assert len(mirror) == 10
+
+
+@pytest.mark.unit
+class TestBridgeContract:
+    def test_search_fn_uses_mirror(self, vectors):
+        store = FakeStore(vectors, [{"source": f"s{i}.pdf"} for i in range(50)])
+        store.embeddings.embed_query.return_value = vectors[7].tolist()
+        fn = make_vector_search_fn(store, VectorMirror(store, check_sec=1e9))
+        result = fn(query="q", top_k=3)
+        assert result[0]["id"] == "id-7"
+        assert result[0]["metadata"]["source"] == "s7.pdf"
+        assert result[0]["score"] == pytest.approx(1.0, abs=1e-3)
+        store._collection.query.assert_not_called()
+
+    def test_mirror_failure_falls_back_to_chroma(self, vectors):
+        store = FakeStore(vectors)
+        store.embeddings.embed_query.return_value = [0.0] * 3  # wrong dim
+        store.similarity_search_with_score = MagicMock(return_value=[])
+        fn = make_vector_search_fn(store, VectorMirror(store, check_sec=1e9))
+        assert fn(query="q", top_k=3) == []
+        store.similarity_search_with_score.assert_called_once()
+
+    def test_batch_fn_uses_mirror(self, vectors):
+        store = FakeStore(vectors)
+        store.embeddings.embed_documents.return_value = vectors[[2, 4]].tolist()
+        fn = make_batch_vector_search_fn(store, VectorMirror(store, check_sec=1e9))
+        results = fn(queries=["a", "b"], top_k=2)
+        assert [r[0]["id"] for r in results] == ["id-2", "id-4"]
+        store._collection.query.assert_not_called()
+
+    def test_disabled_by_default(self, vectors):
+        assert vm_mod.load_vector_mirror(FakeStore(vectors)) is None